@@ -0,0 +1,138 @@
+"""
+Schema setup and migrations for existing deployments (create_all only indexes brand new tables).
+
+    python -m app.database.migrations
+
+The app runs create_schema() from its startup hook unless MIGRATE_ON_STARTUP=false, in
+which case run this command before starting it.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .setup import Base, engine
+
+
+USER_DATA_FIXES = [
+    # Emails are stored normalized so lower(email) lookups and the unique index agree
+    """
+    UPDATE public.users SET email = lower(trim(email))
+    WHERE email IS NOT NULL AND email <> lower(trim(email))
+    """,
+    # Duplicate accounts per email: keep the most recently active row, detach the rest
+    # (their alias_id and chat history stay in place, they just stop matching logins)
+    """
+    UPDATE public.users u SET email = NULL, session_id = NULL
+    FROM (
+        SELECT alias_id, row_number() OVER (
+            PARTITION BY email ORDER BY coalesce(updated_at, created_at) DESC NULLS LAST) AS rank
+        FROM public.users WHERE email IS NOT NULL
+    ) ranked
+    WHERE u.alias_id = ranked.alias_id AND ranked.rank > 1
+    """,
+    # A session belongs to one row: prefer an account over an anonymous row, then recency
+    """
+    UPDATE public.users u SET session_id = NULL
+    FROM (
+        SELECT alias_id, row_number() OVER (
+            PARTITION BY session_id
+            ORDER BY (email IS NULL), coalesce(updated_at, created_at) DESC NULLS LAST) AS rank
+        FROM public.users WHERE session_id IS NOT NULL
+    ) ranked
+    WHERE u.alias_id = ranked.alias_id AND ranked.rank > 1
+    """,
+]
+
+# CONCURRENTLY keeps the users table writable while the indexes build
+USER_INDEXES = [
+    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_users_email_lower ON public.users (lower(email))",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_session_id ON public.users (session_id)",
+    "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_users_anon_session_id "
+    "ON public.users (session_id) WHERE email IS NULL",
+]
+
+
+def create_schema(bind: Engine = engine):
+    """Create any missing tables, including LangChain's message_store."""
+    # Imported here: memory_manager pulls in LangChain, which the user index migration
+    # doesn't need. schema is imported for its side effect of registering the models
+    # on Base.metadata
+    from . import schema  # noqa: F401
+    from app.services.memory_manager import create_message_store
+
+    Base.metadata.create_all(bind=bind)
+    create_message_store(bind)
+    print("[migrate] Schema is up to date")
+
+
+def migrate_user_indexes(bind: Engine = engine):
+    """Normalize existing user rows, then build the lookup/upsert indexes on users."""
+    with bind.begin() as conn:
+        for statement in USER_DATA_FIXES:
+            result = conn.execute(text(statement))
+            print(f"[migrate] {statement.split()[0]} ... {result.rowcount} row(s)")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in USER_INDEXES:
+            conn.execute(text(statement))
+            print(f"[migrate] {statement}")
+
+
+MESSAGE_STORE_COLUMNS = [
+    # Existing rows all get the migration time, so they count as idle from then on
+    "ALTER TABLE message_store ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()",
+]
+
+MESSAGE_STORE_INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_message_store_session_id_id ON message_store (session_id, id)",
+]
+
+
+def migrate_message_store(bind: Engine = engine):
+    """
+    Add the created_at column and the (session_id, id) index to an existing message_store.
+
+    message_store never recorded when a row was written, so every existing row gets the
+    time this migration runs. History retention therefore treats all pre-existing sessions
+    as active until then: nothing is archived for HISTORY_ARCHIVE_AFTER_DAYS after the
+    migration. Compaction of summarized turns is unaffected, it doesn't look at created_at.
+    """
+    # now() is non-volatile, so Postgres 11+ stores the default in the catalog instead of rewriting the table
+    with bind.begin() as conn:
+        for statement in MESSAGE_STORE_COLUMNS:
+            conn.execute(text(statement))
+            print(f"[migrate] {statement}")
+
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in MESSAGE_STORE_INDEXES:
+            conn.execute(text(statement))
+            print(f"[migrate] {statement}")
+
+
+# Sessions that linked a video before session_video existed. The pattern is looser than
+# the app's URL parsing; a false match only sends that session's turns to the agent
+SESSION_VIDEO_BACKFILL = r"""
+    INSERT INTO public.session_video (session_id)
+    SELECT session_id FROM message_store WHERE message ~* '(youtube\.com|youtu\.be)/'
+    UNION
+    SELECT session_id FROM public.message_summary WHERE summary ~* '(youtube\.com|youtu\.be)/'
+    ON CONFLICT (session_id) DO NOTHING
+"""
+
+
+def migrate_session_videos(bind: Engine = engine):
+    """Flag existing sessions that have linked a video (new turns are flagged as they are written)."""
+    with bind.begin() as conn:
+        result = conn.execute(text(SESSION_VIDEO_BACKFILL))
+        print(f"[migrate] Flagged {result.rowcount} session(s) with a video")
+
+
+def run_migrations(bind: Engine = engine):
+    create_schema(bind)
+    migrate_user_indexes(bind)
+    migrate_message_store(bind)
+    migrate_session_videos(bind)
+
+
+if __name__ == "__main__":
+    run_migrations()
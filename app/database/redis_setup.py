@@ -0,0 +1,44 @@
+from dotenv import load_dotenv
+import os
+import redis
+import redis.asyncio
+
+from app.services.circuit_breaker import CircuitBreaker
+
+load_dotenv()
+
+REDIS_URL = os.getenv('YT_REDIS_URL', 'redis://localhost:6379/1')
+
+# Short timeouts: a slow or dead Redis should cost milliseconds, not the request
+REDIS_CONNECT_TIMEOUT = float(os.getenv('YT_REDIS_CONNECT_TIMEOUT', '0.2'))
+REDIS_SOCKET_TIMEOUT = float(os.getenv('YT_REDIS_SOCKET_TIMEOUT', '0.25'))
+
+# Shared sync client; redis-py keeps its own connection pool per client
+redis_client = redis.Redis.from_url(
+    REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+)
+
+# Same settings for coroutines on the event loop (async request path)
+async_redis_client = redis.asyncio.Redis.from_url(
+    REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+)
+
+# Long-lived pub/sub connections block on reads by design, so no socket timeout here
+redis_pubsub_client = redis.Redis.from_url(
+    REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+)
+
+# Shared by everything that talks to redis_client so one outage is detected once
+redis_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=int(os.getenv('YT_REDIS_BREAKER_FAILURES', '3')),
+    reset_timeout=float(os.getenv('YT_REDIS_BREAKER_RESET_SECONDS', '10')),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Integer, Text, Index, ForeignKey
 from sqlalchemy.sql import func
 
 from .setup import Base  # Import Base from setup.py
@@ -6,17 +6,97 @@ from .setup import Base  # Import Base from setup.py
 
 class User(Base):
     __tablename__ = "users"
-    __table_args__ = {'schema': 'public'}  # Explicitly specify schema
 
     name = Column(String(200), nullable=True)
-    email = Column(String(100), nullable=True)
+    email = Column(String(100), nullable=True)  # stored normalized (trimmed, lowercase)
     alias_id = Column(String(100), primary_key=True, nullable=False)
     session_id = Column(String(100), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # One account per email regardless of case; also the ON CONFLICT target for logins
+        Index("uq_users_email_lower", func.lower(email), unique=True),
+        Index("ix_users_session_id", session_id),
+        # At most one anonymous row per browser session; ON CONFLICT target for first visits
+        Index("uq_users_anon_session_id", session_id, unique=True, postgresql_where=email.is_(None)),
+        {'schema': 'public'},  # Explicitly specify schema
+    )
+
     def __repr__(self):
         return f"<User(email='{self.email}', name='{self.name}')>"
 
 
+class ChatSummary(Base):
+    """Running summary of the turns that have slid out of a session's history window."""
+    __tablename__ = "message_summary"
+    __table_args__ = {'schema': 'public'}
+
+    session_id = Column(String(100), primary_key=True)
+    summary = Column(Text, nullable=False)
+    last_message_id = Column(Integer, nullable=False)  # newest message_store.id folded into the summary
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<ChatSummary(session_id='{self.session_id}', last_message_id={self.last_message_id})>"
+
+
+class SessionVideo(Base):
+    """
+    Marks a session that has linked a YouTube video. Routing reads this instead of the
+    history window, which only holds the latest turns.
+    """
+    __tablename__ = "session_video"
+    __table_args__ = {'schema': 'public'}
+
+    session_id = Column(String(100), primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<SessionVideo(session_id='{self.session_id}')>"
+
 
+class BatchJob(Base):
+    """A bulk generation request: one output (article, summary, ...) per video URL."""
+    __tablename__ = "batch_jobs"
+    __table_args__ = {'schema': 'public'}
+
+    id = Column(String(36), primary_key=True)
+    output_type = Column(String(20), nullable=False)
+    instructions = Column(Text, nullable=True)
+    status = Column(String(20), nullable=False)  # pending | running | completed | cancelled
+    total_items = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<BatchJob(id='{self.id}', status='{self.status}', total_items={self.total_items})>"
+
+
+class BatchJobItem(Base):
+    """
+    One video of a batch job. Doubles as the work queue: workers claim pending items (or
+    running items whose lease expired, i.e. their worker died) with FOR UPDATE SKIP LOCKED.
+    """
+    __tablename__ = "batch_job_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), ForeignKey("public.batch_jobs.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    youtube_url = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False)  # pending | running | done | failed | cancelled
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_batch_job_items_job_position", job_id, position),
+        # Keeps the claim query cheap however many finished items accumulate
+        Index("ix_batch_job_items_open", id, postgresql_where=status.in_(["pending", "running"])),
+        {'schema': 'public'},
+    )
+
+    def __repr__(self):
+        return f"<BatchJobItem(job_id='{self.job_id}', position={self.position}, status='{self.status}')>"
@@ -1,14 +1,37 @@
 from dotenv import load_dotenv
 import os
+from functools import lru_cache
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 load_dotenv()
 
 DATABASE_URL = os.getenv('YT_DATABASE_URL')
+# Same database through asyncpg unless configured separately
+ASYNC_DATABASE_URL = os.getenv('YT_ASYNC_DATABASE_URL') or (
+    make_url(DATABASE_URL).set(drivername='postgresql+asyncpg').render_as_string(hide_password=False)
+    if DATABASE_URL else None
+)
+
+# Connection pool settings, shared by the ORM sessions and the chat history layer
+DB_POOL_SIZE = int(os.getenv('YT_DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('YT_DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = int(os.getenv('YT_DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('YT_DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('YT_DB_POOL_PRE_PING', 'true') == 'true'
 
-# Create sync engine
-engine = create_engine(DATABASE_URL, echo=False)
+# Create sync engine (one pool per process)
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 
 # Create sync session maker
 SessionLocal = sessionmaker(
@@ -31,3 +54,56 @@ def get_db():
         db.close()
 
 
+# Async engine for the request path; built on first use so sync-only scripts
+# (migrations, benchmarks) don't need the async driver
+@lru_cache(maxsize=None)
+def get_async_engine() -> AsyncEngine:
+    return create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=False,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_async_session_factory() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind=get_async_engine(),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+# Async dependency for FastAPI
+async def get_async_db():
+    db = get_async_session_factory()()
+    try:
+        yield db
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+def _pool_stats(pool, max_overflow: int) -> dict:
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": max_overflow,
+        "status": pool.status(),
+    }
+
+
+def get_pool_stats() -> dict:
+    """Connection pool usage for monitoring."""
+    stats = _pool_stats(engine.pool, DB_MAX_OVERFLOW)
+    if get_async_engine.cache_info().currsize:
+        stats["async"] = _pool_stats(get_async_engine().pool, DB_MAX_OVERFLOW)
+    return stats
@@ -0,0 +1,32 @@
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+BATCH_MAX_ITEMS = 500
+
+OutputType = Literal["article", "blog", "summary", "tldr", "key_points", "debate"]
+
+
+class BatchJobRequest(BaseModel):
+    urls: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS, description="YouTube video URLs")
+    output_type: OutputType = Field("article", description="What to generate for every video")
+    instructions: Optional[str] = Field(None, max_length=2000, description="Extra instructions applied to every item")
+
+
+class BatchItemStatus(BaseModel):
+    position: int
+    youtube_url: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+
+
+class BatchJobStatus(BaseModel):
+    job_id: str
+    status: str
+    output_type: str
+    total_items: int
+    counts: Dict[str, int]
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    items: Optional[List[BatchItemStatus]] = None
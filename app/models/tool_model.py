@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -11,10 +12,64 @@ class TranscriptSuccessResponse(BaseModel):
     next_action: str = "use this transcript to generate response as per the user's query"
 
 
+class TranscriptCondensedResponse(BaseModel):
+    status: str = "success"
+    transcript_text: str
+    transcript_tokens: int
+    next_action: str = ("the transcript is too long to read whole, so these are notes covering all of it in order; "
+                        "use them to generate the response as per the user's query, and search the transcript "
+                        "if an exact quote or detail is needed")
+
+
 class TranscriptErrorResponse(BaseModel):
     status: str = "error"
     reason: str
+    retryable: bool = False
     transcript_text: str = "not generated, because of the error"
     next_action: str = "Tell the user that there is an error while fetching the data from youtube"
 
 
+class TranscriptChunk(BaseModel):
+    index: int
+    score: float
+    text: str
+
+
+class TranscriptChunksResponse(BaseModel):
+    status: str = "success"
+    outline: List[str]
+    chunks: List[TranscriptChunk]
+    total_chunks: int
+    next_action: str = ("answer from these transcript excerpts; if they don't cover the question, "
+                        "search again with different keywords")
+
+
+class TranscriptWindowResponse(BaseModel):
+    status: str = "success"
+    window: str
+    video_duration: str
+    excerpt: str
+    truncated: bool = False
+    next_action: str = ("answer from these timestamped lines and cite the timestamps; if the excerpt is empty "
+                        "the range is past the end of the video, and if truncated, ask for a narrower range "
+                        "to see the rest")
+
+
+class VideoTranscriptResult(BaseModel):
+    youtube_url: str
+    status: str = "success"
+    transcript_text: Optional[str] = None
+    tokens: int = 0
+    condensed: bool = False
+    truncated: bool = False
+    reason: Optional[str] = None
+    retryable: bool = False
+
+
+class MultiTranscriptResponse(BaseModel):
+    status: str = "success"
+    videos: List[VideoTranscriptResult]
+    token_budget: int
+    next_action: str = ("use these transcripts together to answer the user's query, e.g. to compare the videos; "
+                        "condensed ones are notes covering the whole video, and for any video with an error, tell "
+                        "the user it couldn't be fetched")
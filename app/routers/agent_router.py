@@ -1,31 +1,36 @@
+import json
+from functools import lru_cache
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from app.models.agent_model import ChatPayload
 from fastapi import Request
-from app.services.agent_service import Agent
-from app.services.sql_service import SqlService
-from sqlalchemy.orm import Session
-from app.database.setup import get_db
+from app.services.admission import admission_controller
+from app.services.sql_service import AsyncSqlService
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.setup import get_async_db
 
 
 agent_router = APIRouter(prefix='/api/v1', tags=["Agent"])
 
+# Services are built once per process and shared across requests. The agent stack is
+# imported here rather than at module load; startup warm-up builds it before traffic arrives
+@lru_cache(maxsize=None)
 def get_agent():
+    from app.services.agent_service import Agent
     return Agent()
 
-def get_sql_service():
-    return SqlService()
+def shutdown_agent():
+    """Stop the agent's background executors, if warm-up got as far as building it."""
+    if get_agent.cache_info().currsize:
+        get_agent().shutdown()
 
+@lru_cache(maxsize=None)
+def get_sql_service():
+    return AsyncSqlService()
 
-@agent_router.post("/assistant")
-def assistant(
-        request: Request,
-        query: str,
-        agent_service: Agent = Depends(get_agent),
-        sql_service: SqlService = Depends(get_sql_service),
-        db: Session = Depends(get_db)
-):
-    print(f"User's query ---> {query}")
 
+def get_session_id(request: Request) -> str:
     session_id = request.session.get("session_id")
 
     if session_id:
@@ -37,14 +42,77 @@ def assistant(
         request.session["session_id"] = session_id
         print(f"Newly generated session ID: {session_id}")
 
+    return session_id
 
-    session_info = sql_service.get_or_create(db, session_id)
 
+def build_chat_payload(session_id: str, query: str, session_info: dict) -> ChatPayload:
     chat_payload = ChatPayload(id=session_id, query=query)
 
     chat_payload.id = session_info.get("alias_id")
     print(f"session_info: {session_info}")
-    return agent_service.chat(chat_payload)
+    return chat_payload
 
 
+@agent_router.post("/assistant")
+async def assistant(
+        request: Request,
+        query: str,
+        agent_service=Depends(get_agent),
+        sql_service: AsyncSqlService = Depends(get_sql_service),
+        db: AsyncSession = Depends(get_async_db)
+):
+    print(f"User's query ---> {query}")
+
+    session_id = get_session_id(request)
+    await admission_controller.check_session(session_id)
+    session_info = await sql_service.get_or_create(db, session_id)
+
+    chat_payload = build_chat_payload(session_id, query, session_info)
+    await admission_controller.check_alias(chat_payload.id)
+
+    await admission_controller.acquire()
+    try:
+        return await agent_service.achat(chat_payload)
+    finally:
+        admission_controller.release()
 
+
+@agent_router.post("/assistant/stream")
+async def assistant_stream(
+        request: Request,
+        query: str,
+        agent_service=Depends(get_agent),
+        sql_service: AsyncSqlService = Depends(get_sql_service),
+        db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Server-Sent Events variant of /assistant: emits `tool` progress events, then `token`
+    events as the LLM generates, and a final `done` event with the full response.
+    """
+    print(f"User's query (stream) ---> {query}")
+
+    session_id = get_session_id(request)
+    await admission_controller.check_session(session_id)
+    session_info = await sql_service.get_or_create(db, session_id)
+
+    chat_payload = build_chat_payload(session_id, query, session_info)
+    await admission_controller.check_alias(chat_payload.id)
+
+    # Admitted before the response starts, so a rejection is still a plain 429/503
+    await admission_controller.acquire()
+    release = admission_controller.releaser()
+
+    async def event_stream():
+        try:
+            async for event in agent_service.astream_chat(chat_payload):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also frees the slot if the client went away before the stream started
+        background=BackgroundTask(release)
+    )
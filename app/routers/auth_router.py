@@ -1,11 +1,13 @@
+from functools import lru_cache
 from fastapi import APIRouter, Request, Depends
 
 from app.services.auth_service import AuthService
-from sqlalchemy.orm import Session
-from app.database.setup import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.setup import get_async_db
 
 auth_router = APIRouter(prefix="/api/v1", tags=["Auth"])
 
+@lru_cache(maxsize=None)
 def get_auth_service():
     return AuthService()
 
@@ -18,7 +20,7 @@ async def login_via_google(request: Request,
 
 @auth_router.get("/google/callback")
 async def google_auth_callback(request: Request,
-                               db: Session = Depends(get_db),
+                               db: AsyncSession = Depends(get_async_db),
                                auth_service: AuthService = Depends(get_auth_service)):
     return await auth_service.google_user_info(request, db)
 
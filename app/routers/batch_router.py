@@ -0,0 +1,60 @@
+import json
+from functools import lru_cache
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.models.batch_model import BatchJobRequest, BatchJobStatus
+from app.services.batch_service import BatchRunner, batch_runner
+
+batch_router = APIRouter(prefix="/api/v1/batch", tags=["Batch"])
+
+
+@lru_cache(maxsize=None)
+def get_batch_runner() -> BatchRunner:
+    return batch_runner
+
+
+@batch_router.post("/jobs", response_model=BatchJobStatus, status_code=202)
+def create_batch_job(payload: BatchJobRequest, runner: BatchRunner = Depends(get_batch_runner)):
+    return runner.submit(payload.urls, payload.output_type, payload.instructions)
+
+
+@batch_router.get("/jobs/{job_id}", response_model=BatchJobStatus)
+def get_batch_job(job_id: str, include_items: bool = False, runner: BatchRunner = Depends(get_batch_runner)):
+    status = runner.get_status(job_id, include_items)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return status
+
+
+@batch_router.post("/jobs/{job_id}/cancel", response_model=BatchJobStatus)
+def cancel_batch_job(job_id: str, runner: BatchRunner = Depends(get_batch_runner)):
+    status = runner.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return status
+
+
+@batch_router.get("/jobs/{job_id}/results")
+def download_batch_results(job_id: str,
+                           format: str = Query("jsonl", pattern="^(jsonl|markdown)$"),
+                           runner: BatchRunner = Depends(get_batch_runner)):
+    """Every item's output in input order, streamed as JSON lines or one Markdown document."""
+    if runner.get_status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    def jsonl():
+        for item in runner.iter_results(job_id):
+            yield json.dumps({"position": item.position, "youtube_url": item.youtube_url, "status": item.status,
+                              "result": item.result, "error": item.error}) + "\n"
+
+    def markdown():
+        for item in runner.iter_results(job_id):
+            body = item.result if item.status == "done" else f"_{item.status}: {item.error or 'no output'}_"
+            yield f"## {item.position + 1}. {item.youtube_url}\n\n{body}\n\n"
+
+    if format == "markdown":
+        return StreamingResponse(markdown(), media_type="text/markdown",
+                                 headers={"Content-Disposition": f'attachment; filename="{job_id}.md"'})
+    return StreamingResponse(jsonl(), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="{job_id}.jsonl"'})
@@ -0,0 +1,90 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.database.setup import get_pool_stats
+from app.services.admission import admission_controller
+from app.services.history_store import history_maintenance
+from app.services.metrics import register_collector, render_metrics
+from app.services.session_cache import session_cache
+from app.services.startup import startup
+
+monitoring_router = APIRouter(prefix="/api/v1/monitoring", tags=["Monitoring"])
+
+# Prometheus scrapes /metrics at the root
+metrics_router = APIRouter(tags=["Monitoring"])
+
+# Liveness and readiness probes, also at the root
+health_router = APIRouter(prefix="/healthz", tags=["Monitoring"])
+
+
+# The transcript stack (youtube_transcript_api, zstandard) is imported on the first call,
+# not by `import main`; it is normally loaded by the agent warm-up by then
+def _transcript_store_stats() -> dict:
+    from app.services.transcript_store import get_transcript_store
+    return get_transcript_store().stats()
+
+
+def _youtube_fetcher_stats() -> dict:
+    from app.services.transcript_fetcher import transcript_fetcher
+    return transcript_fetcher.stats()
+
+
+register_collector("yt_db_pool", get_pool_stats)
+register_collector("yt_session_cache", session_cache.stats)
+register_collector("yt_transcript_store", _transcript_store_stats)
+register_collector("yt_youtube_breaker", _youtube_fetcher_stats)
+register_collector("yt_admission", admission_controller.stats)
+register_collector("yt_startup", startup.stats)
+register_collector("yt_history", history_maintenance.stats)
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@health_router.get("/live")
+def liveness():
+    return {"status": "ok"}
+
+
+@health_router.get("/ready")
+def readiness():
+    """200 once warm-up is done, 503 with the pending steps until then."""
+    stats = startup.stats()
+    return JSONResponse(stats, status_code=200 if startup.ready else 503)
+
+
+@monitoring_router.get("/startup")
+def startup_stats():
+    return startup.stats()
+
+
+@monitoring_router.get("/db-pool")
+def db_pool_stats():
+    return get_pool_stats()
+
+
+@monitoring_router.get("/transcripts")
+def transcript_store_stats():
+    return _transcript_store_stats()
+
+
+@monitoring_router.get("/admission")
+def admission_stats():
+    return admission_controller.stats()
+
+
+@monitoring_router.get("/history")
+def history_maintenance_stats():
+    return history_maintenance.stats()
+
+
+@monitoring_router.get("/youtube")
+def youtube_fetcher_stats():
+    return _youtube_fetcher_stats()
+
+
+@monitoring_router.get("/session-cache")
+def session_cache_stats():
+    return session_cache.stats()
@@ -0,0 +1,165 @@
+"""
+Admission control for the chat endpoints.
+
+Two layers, both checked before any LLM work starts:
+
+  * Rate limits: token buckets per session and per alias_id, kept in Redis (one Lua call
+    per check) so they hold across worker processes. Over the limit -> 429.
+  * Capacity: at most ADMISSION_MAX_CONCURRENT chats run at once per process. Up to
+    ADMISSION_MAX_QUEUE more wait for a slot, each for at most ADMISSION_QUEUE_TIMEOUT
+    seconds. A full queue or an expired wait -> 503.
+
+Rejections are immediate and carry Retry-After, so a burst is turned away at the door
+instead of piling onto the LLM and slowing down every request already admitted. If Redis
+is unavailable the rate limits are skipped (fail open); the capacity limit still applies.
+"""
+import asyncio
+import math
+import os
+import time
+
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+
+from app.database.redis_setup import async_redis_client, redis_breaker
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.metrics import Counter, Histogram, record_stage
+
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+SESSION_RATE_PER_MINUTE = float(os.getenv("SESSION_RATE_PER_MINUTE", "20"))
+SESSION_RATE_BURST = float(os.getenv("SESSION_RATE_BURST", "5"))
+ALIAS_RATE_PER_MINUTE = float(os.getenv("ALIAS_RATE_PER_MINUTE", "60"))
+ALIAS_RATE_BURST = float(os.getenv("ALIAS_RATE_BURST", "10"))
+
+RATE_KEY_PREFIX = "yt:ratelimit:"
+
+# KEYS[1] bucket; ARGV: rate (tokens/s), capacity, now (s), cost -> {allowed, retry after (s)}
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+ADMISSIONS = Counter("yt_admission_total", "Admission decisions for chat requests", ["result"])
+ADMISSION_WAIT_SECONDS = Histogram("yt_admission_wait_seconds", "Time admitted chats waited for a slot")
+
+
+class RedisRateLimiter:
+    """Token buckets in Redis, refilled lazily by a Lua script so a check is one round trip."""
+
+    def __init__(self, redis=async_redis_client, breaker: CircuitBreaker = redis_breaker):
+        self.breaker = breaker
+        self._script = redis.register_script(TOKEN_BUCKET_LUA)
+
+    async def acquire(self, key: str, per_minute: float, burst: float) -> float:
+        """0 if a token was taken, else seconds until one is available."""
+        if not self.breaker.allow():
+            return 0.0
+        try:
+            allowed, retry_after = await self._script(keys=[RATE_KEY_PREFIX + key],
+                                                      args=[per_minute / 60.0, burst, time.time(), 1])
+        except RedisError as e:
+            print(f"[Admission] Rate limit check failed, allowing: {e}")
+            self.breaker.record_failure()
+            return 0.0
+        self.breaker.record_success()
+        return 0.0 if int(allowed) else float(retry_after)
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, rate_limiter: RedisRateLimiter = None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate_limiter = rate_limiter or RedisRateLimiter()
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._in_flight = 0
+        self._queued = 0
+
+    # ---- rate limits -----------------------------------------------------------------
+
+    async def check_session(self, session_id: str):
+        await self._check_rate(f"session:{session_id}", SESSION_RATE_PER_MINUTE, SESSION_RATE_BURST, "session")
+
+    async def check_alias(self, alias_id: str):
+        await self._check_rate(f"alias:{alias_id}", ALIAS_RATE_PER_MINUTE, ALIAS_RATE_BURST, "alias")
+
+    async def _check_rate(self, key: str, per_minute: float, burst: float, scope: str):
+        retry_after = await self.rate_limiter.acquire(key, per_minute, burst)
+        if retry_after > 0:
+            ADMISSIONS.inc(result=f"rate_limited_{scope}")
+            raise HTTPException(status_code=429, detail=f"Too many requests for this {scope}, slow down",
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    # ---- capacity --------------------------------------------------------------------
+
+    async def acquire(self):
+        """Take a chat slot, waiting in the bounded queue if needed; raises 503 when full."""
+        # Only requests that find every slot taken wait, and count towards the queue
+        queued = self._slots.locked()
+        if queued:
+            if self._queued >= self.max_queue:
+                ADMISSIONS.inc(result="rejected_queue_full")
+                self._reject("Server is at capacity, try again shortly")
+            ADMISSIONS.inc(result="queued")
+            self._queued += 1
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSIONS.inc(result="rejected_timeout")
+            self._reject("Server is busy, try again shortly")
+        finally:
+            if queued:
+                self._queued -= 1
+        waited = time.perf_counter() - start
+        ADMISSION_WAIT_SECONDS.observe(waited)
+        record_stage("admission_wait", waited)
+        ADMISSIONS.inc(result="admitted")
+        self._in_flight += 1
+
+    def release(self):
+        self._in_flight -= 1
+        self._slots.release()
+
+    def releaser(self):
+        """A release() that only acts once, for paths that may end in more than one place."""
+        released = False
+
+        def release_once():
+            nonlocal released
+            if not released:
+                released = True
+                self.release()
+        return release_once
+
+    def _reject(self, detail: str):
+        raise HTTPException(status_code=503, detail=detail,
+                            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))})
+
+    def stats(self) -> dict:
+        return {"in_flight": self._in_flight, "queued": self._queued,
+                "max_concurrent": self.max_concurrent, "max_queue": self.max_queue}
+
+
+admission_controller = AdmissionController()
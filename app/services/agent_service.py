@@ -1,61 +1,285 @@
+import os
+from typing import AsyncIterator, List, Optional, Tuple
 from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import run_in_executor
 
 from app.models.agent_model import ChatPayload
 from app.templates.agent_prompt import agent_prompt
 
 load_dotenv()
 
-from langchain_openai import ChatOpenAI
 from langchain.agents import create_openai_functions_agent, AgentExecutor
-from langchain import hub
-from app.services.memory_manager import MemoryManager
-from app.services.yt_tool import fetch_video_transcript
+from app.database.setup import get_async_session_factory
+from app.services.fast_path import AGENT, FAST_PATH_ENABLED, FastPathRouter
+from app.services.generation_cache import get_generation_cache, has_personalizing_context, parse_cacheable_request
+from app.services.memory_manager import MemoryManager, shutdown_summaries
+from app.services.llm_metrics import llm_metrics_callback
+from app.services.prefetch import transcript_prefetcher
+from app.services.prompt_budget import PromptBudget
+from app.services.summarizer import transcript_summarizer
+from app.services.yt_tool import (fetch_video_transcript, fetch_multiple_transcripts, search_video_transcript,
+                                  window_video_transcript)
 from app.services.langsmith_manager import TracingManager
 
 
-# Initialize the LLM
-LLM = ChatOpenAI(model="gpt-4o-mini", temperature=0.02)
+# Built on first use (see get_llm), so importing this module needs no API key or client setup
+LLM = None
+
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "false") == "true"
+
+# Progress messages surfaced to streaming clients while a tool runs
+TOOL_PROGRESS = {
+    "youtube_transcript_saver": "fetching transcript",
+    "youtube_transcript_search": "searching transcript",
+    "youtube_transcript_window": "reading transcript section",
+    "youtube_multi_transcript_saver": "fetching transcripts",
+}
+
+
+def get_llm():
+    global LLM
+    if LLM is None:
+        from langchain_openai import ChatOpenAI
+        # stream_usage: token counts are reported for streamed runs too (see llm_metrics.LLMMetricsCallback)
+        LLM = ChatOpenAI(model="gpt-4o-mini", temperature=0.02, stream_usage=True)
+    return LLM
+
+
+def summarize_history(previous_summary: Optional[str], messages: List[BaseMessage]) -> str:
+    """Fold turns that left the history window into the running conversation summary."""
+    new_turns = "\n".join(f"{m.type}: {m.content}" for m in messages)
+    prompt = ("Update the running summary of a conversation between a user and a YouTube agent. "
+              "Keep video URLs, the user's requests and preferences, and key facts; stay under 150 words.\n\n"
+              f"Current summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{new_turns}\n\nUpdated summary:")
+    return get_llm().invoke(prompt).content
+
 
 class Agent:
+    """
+    Process-level agent runtime.
+
+    The prompt template, tool bindings, executor and memory wrapper are compiled once
+    when the Agent is created and shared by every request. Nothing on the invoke path
+    mutates them, so a single instance is safe to use from concurrent requests; the
+    per-request state (session id, tracing tags) only travels through the config.
+    """
 
     def __init__(self, project_name: str = "youtube-agent"):
         self.tracing_manager = TracingManager(project_name)
-        self.tools = [fetch_video_transcript]
-        # self.prompt = hub.pull("hwchase17/openai-functions-agent")
+        self.tools = [fetch_video_transcript, fetch_multiple_transcripts, search_video_transcript,
+                      window_video_transcript]
         self.prompt = agent_prompt
 
+        self.prompt_template = ChatPromptTemplate.from_messages([
+            ("system", self.prompt),
+            ("user", "{chat_history}\n{input}"),
+            ("system", "{agent_scratchpad}")
+        ])
 
+        # History and tool results are fitted to the per-call token budget before each LLM call
+        self.prompt_budget = PromptBudget(self.prompt, self.tools)
+        llm = get_llm()
+        agent = (RunnableLambda(self.prompt_budget.fit, name="prompt_budget")
+                 | create_openai_functions_agent(llm=llm, tools=self.tools, prompt=self.prompt_template))
 
-    def chat(self, chat_data: ChatPayload) -> dict:
+        self.agent_executor = AgentExecutor(agent=agent,
+                                            tools=self.tools,
+                                            verbose=True,
+                                            handle_parsing_errors=True,
+                                            max_iterations=5)
+
+        self.memory_manager = MemoryManager(summarizer=summarize_history if HISTORY_SUMMARY_ENABLED else None,
+                                            async_sessions=get_async_session_factory())
+        self.agent_with_memory = self.memory_manager.wrap_with_memory(self.agent_executor)
+        self.generation_cache = get_generation_cache(f"{llm.model_name}:{llm.temperature}")
+        self.fast_path = FastPathRouter() if FAST_PATH_ENABLED else None
+
+    @staticmethod
+    def shutdown():
+        """Stop the background work chats start (prefetches, transcript and history summaries)."""
+        if transcript_prefetcher is not None:
+            transcript_prefetcher.shutdown()
+        transcript_summarizer.shutdown()
+        shutdown_summaries()
 
+    def _build_config(self, session_id: str) -> dict:
+        langsmith_config = self.tracing_manager.get_config(session_id)
+        runnable_history_config = {"session_id": session_id}
+        # Metrics callbacks are attached per run, so they don't depend on LangSmith being enabled
+        return {**langsmith_config, "callbacks": [llm_metrics_callback], "configurable": runnable_history_config}
+
+    @staticmethod
+    def _start_prefetch(chat_data: ChatPayload):
+        """Warm linked transcripts while the first LLM call decides whether to fetch them."""
+        if transcript_prefetcher is None:
+            return
+        try:
+            transcript_prefetcher.prefetch(chat_data.id, chat_data.query)
+        except Exception as e:
+            print(f"[Prefetch] Skipped: {e}")
+
+    def _route_turn(self, chat_data: ChatPayload) -> Tuple[str, List[BaseMessage]]:
+        """
+        Fast-path route for the turn (AGENT unless it can skip the agent), with history if it was loaded.
+        Starts the transcript prefetch too: both touch local stores, so the async paths run this off the loop.
+        """
+        self._start_prefetch(chat_data)
+        if self.fast_path is None:
+            return AGENT, []
         try:
-            langsmith_config = self.tracing_manager.get_config(chat_data.id)
-            runnable_history_config = {"session_id": chat_data.id}
-            config = {**langsmith_config, "configurable": runnable_history_config}
+            history = self.memory_manager.get_history(chat_data.id)
+            return self.fast_path.route(chat_data.query, history.has_video, lambda: history.messages)
+        except Exception as e:
+            print(f"[FastPath] Routing failed: {e}")
+            return AGENT, []
+
+    async def _astream_fast_path(self, chat_data: ChatPayload, route: str,
+                                 history: List[BaseMessage]) -> AsyncIterator[str]:
+        """Answer a fast-path turn from its template or the short prompt, and record it in history."""
+        answer = self.fast_path.template(route)
+        if answer is not None:
+            yield answer
+        else:
+            parts = []
+            async for chunk in get_llm().astream(self.fast_path.chat_messages(chat_data.query, history),
+                                                 config=self._build_config(chat_data.id)):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+            answer = "".join(parts)
+        # The same turn the memory wrapper would have written
+        await self.memory_manager.get_history(chat_data.id).aadd_messages(
+            [HumanMessage(content=chat_data.query), AIMessage(content=answer)])
 
+    def _lookup_generation(self, chat_data: ChatPayload) -> Tuple[Optional[str], Optional[Tuple[str, str]]]:
+        """
+        Serve bare whole-video requests ("summary of <url>") from the generation cache.
+        Returns (cached answer, (video_id, intent) to cache a fresh answer under); both are
+        None when the turn isn't cacheable.
+        """
+        request = parse_cacheable_request(chat_data.query) if self.generation_cache else None
+        if request is None:
+            return None, None
+        try:
+            history = self.memory_manager.get_history(chat_data.id)
+            if has_personalizing_context(history.messages):
+                self.generation_cache.record_bypass()
+                return None, None
+
+            answer = self.generation_cache.get(*request)
+            if answer is not None:
+                # The same turn the memory wrapper would have written
+                history.add_messages([HumanMessage(content=chat_data.query), AIMessage(content=answer)])
+            return answer, request
+        except Exception as e:
+            print(f"[GenerationCache] Lookup failed: {e}")
+            return None, None
+
+    def _store_generation(self, request: Optional[Tuple[str, str]], output: str):
+        if request is None or not output or output.startswith("Agent stopped"):
+            return
+        try:
+            self.generation_cache.put(*request, output)
+        except Exception as e:
+            print(f"[GenerationCache] Store failed: {e}")
 
-            prompt_template = ChatPromptTemplate.from_messages([
-                ("system", self.prompt),
-                ("user", "{chat_history}\n{input}"),
-                ("system", "{agent_scratchpad}")
-            ])
-            # prompt_template = self.prompt
+    def chat(self, chat_data: ChatPayload) -> dict:
 
-            agent = create_openai_functions_agent(llm=LLM, tools=self.tools, prompt=prompt_template)
+        try:
+            route, history = self._route_turn(chat_data)
+            if route != AGENT:
+                answer = self.fast_path.template(route)
+                if answer is None:
+                    answer = get_llm().invoke(self.fast_path.chat_messages(chat_data.query, history),
+                                              config=self._build_config(chat_data.id)).content
+                self.memory_manager.get_history(chat_data.id).add_messages(
+                    [HumanMessage(content=chat_data.query), AIMessage(content=answer)])
+                return {"response": answer}
 
-            agent_executor = AgentExecutor(agent=agent,
-                                           tools=self.tools,
-                                           verbose=True,
-                                           handle_parsing_errors=True,
-                                           max_iterations=5)
+            cached, request = self._lookup_generation(chat_data)
+            if cached is not None:
+                return {"response": cached}
 
-            memory_wrapper  = MemoryManager(chat_data.id)
-            agent_with_memory = memory_wrapper.wrap_with_memory(agent_executor)
+            config = self._build_config(chat_data.id)
 
             # Invoke the agent with user input and LangSmith trace config
-            response = agent_with_memory.invoke({"input": chat_data.query}, config=config)
+            response = self.agent_with_memory.invoke({"input": chat_data.query}, config=config)
+            self._store_generation(request, response["output"])
+            return {"response": response["output"]}
+
+        except Exception as e:
+            return {"response": f"Sorry, I encountered an error: {str(e)}"}
+
+    async def achat(self, chat_data: ChatPayload) -> dict:
+        """Async chat(): the LLM call and history I/O are awaited, so no thread is held meanwhile."""
+        try:
+            route, history = await run_in_executor(None, self._route_turn, chat_data)
+            if route != AGENT:
+                return {"response": "".join([token async for token in
+                                             self._astream_fast_path(chat_data, route, history)])}
+
+            cached, request = await run_in_executor(None, self._lookup_generation, chat_data)
+            if cached is not None:
+                return {"response": cached}
+
+            config = self._build_config(chat_data.id)
+            response = await self.agent_with_memory.ainvoke({"input": chat_data.query}, config=config)
+            await run_in_executor(None, self._store_generation, request, response["output"])
             return {"response": response["output"]}
 
         except Exception as e:
             return {"response": f"Sorry, I encountered an error: {str(e)}"}
+
+    async def astream_chat(self, chat_data: ChatPayload) -> AsyncIterator[dict]:
+        """
+        Stream a chat turn as events: tool progress first, then LLM tokens as they arrive,
+        then the final answer. The turn is written to chat history by the memory wrapper
+        once the run completes, exactly like chat(). A cached generation or templated
+        fast-path answer is sent as a single token event.
+        """
+        try:
+            route, history = await run_in_executor(None, self._route_turn, chat_data)
+            if route != AGENT:
+                tokens = []
+                async for token in self._astream_fast_path(chat_data, route, history):
+                    tokens.append(token)
+                    yield {"event": "token", "data": {"token": token}}
+                yield {"event": "done", "data": {"response": "".join(tokens), "route": route}}
+                return
+
+            cached, request = await run_in_executor(None, self._lookup_generation, chat_data)
+            if cached is not None:
+                yield {"event": "token", "data": {"token": cached}}
+                yield {"event": "done", "data": {"response": cached, "cached": True}}
+                return
+
+            config = self._build_config(chat_data.id)
+
+            async for event in self.agent_with_memory.astream_events(
+                    {"input": chat_data.query}, config=config, version="v2"):
+                kind = event["event"]
+
+                if kind == "on_tool_start":
+                    yield {"event": "tool",
+                           "data": {"tool": event["name"],
+                                    "status": TOOL_PROGRESS.get(event["name"], "running tool")}}
+
+                elif kind == "on_tool_end":
+                    yield {"event": "tool", "data": {"tool": event["name"], "status": "done"}}
+
+                elif kind == "on_chat_model_stream":
+                    token = event["data"]["chunk"].content
+                    if token:
+                        yield {"event": "token", "data": {"token": token}}
+
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    # Top-level run finished, history has been written
+                    output = event["data"].get("output") or {}
+                    await run_in_executor(None, self._store_generation, request, output.get("output", ""))
+                    yield {"event": "done", "data": {"response": output.get("output", "")}}
+
+        except Exception as e:
+            yield {"event": "error", "data": {"response": f"Sorry, I encountered an error: {str(e)}"}}
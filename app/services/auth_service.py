@@ -1,14 +1,13 @@
 import os
+from functools import lru_cache
 from fastapi import Request, HTTPException
-from authlib.integrations.starlette_client import OAuth
 from dotenv import load_dotenv
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.sql_service import SqlService
+from app.services.sql_service import AsyncSqlService
 
 load_dotenv()
-oauth = OAuth()
 
 # Load from environment
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
@@ -16,18 +15,26 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 BASE_URL = os.getenv("PROJECT_BASE_URL")
 CHAT_UI_URL = os.getenv("CHAT_UI_URL")
 
-# OAuth config
-oauth.register(
-    name="google",
-    client_id=GOOGLE_CLIENT_ID,
-    client_secret=GOOGLE_CLIENT_SECRET,
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    client_kwargs={"scope": "openid email profile"}
-)
 
+# OAuth config, registered on the first login rather than at import
+@lru_cache(maxsize=None)
+def get_oauth():
+    from authlib.integrations.starlette_client import OAuth
 
+    oauth = OAuth()
+    oauth.register(
+        name="google",
+        client_id=GOOGLE_CLIENT_ID,
+        client_secret=GOOGLE_CLIENT_SECRET,
+        server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+        client_kwargs={"scope": "openid email profile"}
+    )
+    return oauth
+
+
+@lru_cache(maxsize=None)
 def get_sql_service():
-    return SqlService()
+    return AsyncSqlService()
 
 
 
@@ -49,16 +56,17 @@ class AuthService:
             raise HTTPException(status_code=400, detail="Missing session_id")
         # Store session_id in session or your DB
         request.session["oauth_session_id"] = session_id
-        return await oauth.google.authorize_redirect(
+        return await get_oauth().google.authorize_redirect(
             request,
             redirect_uri=self.redirect_uri,
             state=session_id
         )
 
-    async def google_user_info(self, request: Request, db: Session):
+    async def google_user_info(self, request: Request, db: AsyncSession):
         try:
-            token = await oauth.google.authorize_access_token(request)
-            response = await oauth.google.get(self.google_userinfo_url, token=token)
+            google = get_oauth().google
+            token = await google.authorize_access_token(request)
+            response = await google.get(self.google_userinfo_url, token=token)
             user_info = response.json()
 
         except Exception as e:
@@ -72,7 +80,7 @@ class AuthService:
         name=user_info.get("name")
 
         sql_service = get_sql_service()
-        sql_service.get_or_create(db=db, session_id=session_id, email=email, name=name)
+        await sql_service.get_or_create(db=db, session_id=session_id, email=email, name=name)
         print(f"""User logged in:
                             NAME: {name}
                            EMAIL: {email}""")
@@ -0,0 +1,320 @@
+"""
+Bulk generation jobs: one output per YouTube URL, produced by a pool of worker threads.
+
+Jobs and their items are persisted in batch_jobs / batch_job_items, and the items table
+is the queue itself. A worker claims the next open item with FOR UPDATE SKIP LOCKED and
+holds a lease on it, so any number of workers (across processes) share the queue without
+double work, and a restart simply resumes: unfinished items are still pending, and items
+whose worker died become claimable again once their lease expires. On shutdown, items
+still being generated are handed back to the queue rather than left leased.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.database.schema import BatchJob, BatchJobItem
+from app.database.setup import SessionLocal
+from app.models.batch_model import BatchItemStatus, BatchJobStatus
+from app.services.metrics import Counter, timed
+from app.services.rate_limiter import TokenBucket
+from app.templates.agent_prompt import agent_prompt
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+BATCH_LLM_REQUESTS_PER_MINUTE = float(os.getenv("BATCH_LLM_RPM", "60"))
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+BATCH_ITEM_LEASE_SECONDS = int(os.getenv("BATCH_ITEM_LEASE_SECONDS", "600"))
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "5"))
+# How long shutdown waits for items in progress before handing them back to the queue
+BATCH_SHUTDOWN_SECONDS = float(os.getenv("BATCH_SHUTDOWN_SECONDS", "10"))
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED, COMPLETED = \
+    "pending", "running", "done", "failed", "cancelled", "completed"
+
+# What each output type asks the agent for; the agent prompt's GOALS cover the formats
+OUTPUT_REQUESTS = {
+    "article": "Write an article",
+    "blog": "Write a blog post",
+    "summary": "Write a summary",
+    "tldr": "Write a crisp TLDR",
+    "key_points": "List the key points",
+    "debate": "Write a debate-style piece",
+}
+
+BATCH_ITEMS = Counter("yt_batch_items_total", "Batch items finished", ["status"])
+
+
+class LeaseLost(Exception):
+    """The item's lease expired and another attempt now owns it."""
+
+
+def build_generation_messages(youtube_url: str, output_type: str, transcript_text: str,
+                              instructions: Optional[str] = None):
+    # Imported here, like the agent stack, so the router loads without LangChain
+    from langchain_core.messages import HumanMessage, SystemMessage
+    request = f"{OUTPUT_REQUESTS[output_type]} for this YouTube video: {youtube_url}"
+    if instructions:
+        request += f"\n{instructions}"
+    return [SystemMessage(content=agent_prompt),
+            HumanMessage(content=f"{request}\n\nTranscript:\n{transcript_text}")]
+
+
+class BatchRunner:
+    def __init__(self, workers: int = BATCH_WORKERS, llm_concurrency: int = BATCH_LLM_CONCURRENCY,
+                 llm_requests_per_minute: float = BATCH_LLM_REQUESTS_PER_MINUTE,
+                 session_factory=SessionLocal):
+        self.workers = workers
+        self.session_factory = session_factory
+        self._llm_slots = threading.BoundedSemaphore(llm_concurrency)
+        self._llm_rate = TokenBucket.per_minute(llm_requests_per_minute, burst=llm_concurrency)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        # item id -> (attempts, job id) of the items workers are processing right now
+        self._in_progress: Dict[int, Tuple[int, str]] = {}
+        self._in_progress_lock = threading.Lock()
+
+    # ---- lifecycle -------------------------------------------------------------------
+
+    def start(self):
+        """Start the worker threads (idempotent); they pick up any unfinished jobs first."""
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"batch-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"[Batch] Started {self.workers} worker(s)")
+
+    def notify(self):
+        self._wakeup.set()
+
+    def stop(self, timeout: float = BATCH_SHUTDOWN_SECONDS):
+        """
+        Stop claiming items and wait up to `timeout` for those in progress. Any still running
+        after that go back to pending (the interrupted attempt still counts), so the next
+        process picks them up right away instead of after their lease expires.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self._in_progress_lock:
+            unfinished = list(self._in_progress.items())
+        for item_id, (attempts, job_id) in unfinished:
+            try:
+                self._finish(item_id, job_id, attempts, PENDING, error="interrupted by shutdown")
+            except Exception as e:
+                print(f"[Batch] Item {item_id} could not be handed back: {e}")
+        print(f"[Batch] Stopped; {len(unfinished)} item(s) in progress handed back to the queue")
+
+    # ---- API -------------------------------------------------------------------------
+
+    def submit(self, urls: List[str], output_type: str, instructions: Optional[str] = None) -> BatchJobStatus:
+        job_id = str(uuid.uuid4())
+        with self.session_factory() as db:
+            job = BatchJob(id=job_id, output_type=output_type, instructions=instructions,
+                           status=PENDING, total_items=len(urls))
+            db.add(job)
+            db.flush()
+            db.add_all([BatchJobItem(job_id=job_id, position=i, youtube_url=url.strip(), status=PENDING, attempts=0)
+                        for i, url in enumerate(urls)])
+            db.commit()
+            status = self._job_status(db, job)
+        self.start()
+        self.notify()
+        return status
+
+    def get_status(self, job_id: str, include_items: bool = False) -> Optional[BatchJobStatus]:
+        with self.session_factory() as db:
+            job = db.get(BatchJob, job_id)
+            if job is None:
+                return None
+            return self._job_status(db, job, include_items)
+
+    def cancel(self, job_id: str) -> Optional[BatchJobStatus]:
+        """Drop the job's pending items; items already being generated still finish."""
+        with self.session_factory() as db:
+            job = db.get(BatchJob, job_id)
+            if job is None:
+                return None
+            db.execute(update(BatchJobItem)
+                       .where(BatchJobItem.job_id == job_id, BatchJobItem.status == PENDING)
+                       .values(status=CANCELLED))
+            if job.status in (PENDING, RUNNING):
+                job.status = CANCELLED
+            db.commit()
+            return self._job_status(db, job)
+
+    def iter_results(self, job_id: str, batch_size: int = 50) -> Iterator[BatchJobItem]:
+        """Items in input order, streamed from the database in batches."""
+        with self.session_factory() as db:
+            rows = db.execute(select(BatchJobItem)
+                              .where(BatchJobItem.job_id == job_id)
+                              .order_by(BatchJobItem.position)
+                              .execution_options(yield_per=batch_size)).scalars()
+            for item in rows:
+                yield item
+
+    @staticmethod
+    def _job_status(db: Session, job: BatchJob, include_items: bool = False) -> BatchJobStatus:
+        counts = dict(db.execute(select(BatchJobItem.status, func.count())
+                                 .where(BatchJobItem.job_id == job.id)
+                                 .group_by(BatchJobItem.status)).all())
+        items = None
+        if include_items:
+            rows = db.execute(select(BatchJobItem).where(BatchJobItem.job_id == job.id)
+                              .order_by(BatchJobItem.position)).scalars()
+            items = [BatchItemStatus(position=row.position, youtube_url=row.youtube_url, status=row.status,
+                                     attempts=row.attempts, error=row.error) for row in rows]
+        return BatchJobStatus(job_id=job.id, status=job.status, output_type=job.output_type,
+                              total_items=job.total_items, counts=counts, created_at=job.created_at,
+                              updated_at=job.updated_at, items=items)
+
+    # ---- workers ---------------------------------------------------------------------
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                claimed = self._claim()
+            except Exception as e:
+                print(f"[Batch] Claim failed: {e}")
+                claimed = None
+            if claimed is None:
+                self._wakeup.wait(BATCH_POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            item_id, attempts, job_id = claimed[0], claimed[2], claimed[-1]
+            with self._in_progress_lock:
+                self._in_progress[item_id] = (attempts, job_id)
+            try:
+                self._process(*claimed)
+            except Exception as e:
+                # e.g. the database went away while recording the result; the item's lease
+                # expires and it is claimed again, so keep this worker alive
+                print(f"[Batch] Item {item_id} could not be processed: {e}")
+            finally:
+                with self._in_progress_lock:
+                    self._in_progress.pop(item_id, None)
+
+    def _claim(self):
+        """Lease the oldest open item; returns (item id, url, attempts, job) or None."""
+        job_cancelled = (select(BatchJob.id)
+                         .where(BatchJob.id == BatchJobItem.job_id, BatchJob.status == CANCELLED)
+                         .exists())
+        open_item = (select(BatchJobItem.id)
+                     .where(or_(BatchJobItem.status == PENDING,
+                                and_(BatchJobItem.status == RUNNING, BatchJobItem.lease_expires_at < func.now())),
+                            ~job_cancelled)
+                     .order_by(BatchJobItem.id)
+                     .limit(1)
+                     .with_for_update(skip_locked=True)
+                     .scalar_subquery())
+        with self.session_factory() as db:
+            row = db.execute(update(BatchJobItem)
+                             .where(BatchJobItem.id == open_item)
+                             .values(status=RUNNING,
+                                     attempts=BatchJobItem.attempts + 1,
+                                     lease_expires_at=func.now() + timedelta(seconds=BATCH_ITEM_LEASE_SECONDS))
+                             .returning(BatchJobItem.id, BatchJobItem.job_id, BatchJobItem.youtube_url,
+                                        BatchJobItem.attempts)).first()
+            if row is None:
+                db.commit()
+                return None
+            db.execute(update(BatchJob).where(BatchJob.id == row.job_id, BatchJob.status == PENDING)
+                       .values(status=RUNNING))
+            job = db.get(BatchJob, row.job_id)
+            db.commit()
+            return row.id, row.youtube_url, row.attempts, job.output_type, job.instructions, row.job_id
+
+    def _process(self, item_id: int, youtube_url: str, attempts: int, output_type: str,
+                 instructions: Optional[str], job_id: str):
+        if attempts > BATCH_MAX_ATTEMPTS:
+            self._finish(item_id, job_id, attempts, FAILED, error=f"gave up after {BATCH_MAX_ATTEMPTS} attempts")
+            return
+        # Imported here so the router can load without the agent stack (warmed up at startup)
+        from app.services.yt_tool import fetch_video_transcript
+        try:
+            # Same tool the agent uses: store hit, or a deduplicated fetch
+            transcript = fetch_video_transcript.invoke({"youtube_url": youtube_url})
+            if transcript.status != "success":
+                if transcript.retryable:
+                    # YouTube is failing for now; retried like any other failed attempt
+                    raise RuntimeError(transcript.reason)
+                self._finish(item_id, job_id, attempts, FAILED, error=transcript.reason)
+                return
+            result = self._generate(item_id, attempts, youtube_url, output_type, transcript.transcript_text,
+                                    instructions)
+            self._finish(item_id, job_id, attempts, DONE, result=result)
+        except LeaseLost:
+            print(f"[Batch] Item {item_id} attempt {attempts} lost its lease, leaving it to the new owner")
+        except Exception as e:
+            print(f"[Batch] Item {item_id} attempt {attempts} failed: {e}")
+            retry = attempts < BATCH_MAX_ATTEMPTS
+            self._finish(item_id, job_id, attempts, PENDING if retry else FAILED, error=str(e))
+
+    def _generate(self, item_id: int, attempts: int, youtube_url: str, output_type: str, transcript_text: str,
+                  instructions: Optional[str]) -> str:
+        from app.services.agent_service import get_llm
+        from app.services.llm_metrics import llm_metrics_callback
+        messages = build_generation_messages(youtube_url, output_type, transcript_text, instructions)
+        with self._llm_slots:
+            self._llm_rate.acquire()
+            # Waiting for a slot has no upper bound; make sure the item is still ours and
+            # give the generation a full lease
+            self._renew_lease(item_id, attempts)
+            with timed("batch_generation"):
+                return get_llm().invoke(messages, config={"callbacks": [llm_metrics_callback]}).content
+
+    def _renew_lease(self, item_id: int, attempts: int):
+        with self.session_factory() as db:
+            renewed = db.execute(update(BatchJobItem)
+                                 .where(*self._leased_by(item_id, attempts))
+                                 .values(lease_expires_at=func.now() + timedelta(seconds=BATCH_ITEM_LEASE_SECONDS))
+                                 ).rowcount
+            db.commit()
+        if not renewed:
+            raise LeaseLost(item_id)
+
+    @staticmethod
+    def _leased_by(item_id: int, attempts: int):
+        """Conditions matching the item only while this attempt still holds it."""
+        # Every claim bumps attempts, so a reclaimed item no longer matches
+        return BatchJobItem.id == item_id, BatchJobItem.status == RUNNING, BatchJobItem.attempts == attempts
+
+    def _finish(self, item_id: int, job_id: str, attempts: int, status: str, result: Optional[str] = None,
+                error: Optional[str] = None):
+        with self.session_factory() as db:
+            # A retry of a cancelled job's item would never be claimed; close it instead
+            if status == PENDING and db.get(BatchJob, job_id).status == CANCELLED:
+                status = CANCELLED
+            updated = db.execute(update(BatchJobItem).where(*self._leased_by(item_id, attempts))
+                                 .values(status=status, result=result, error=error, lease_expires_at=None)).rowcount
+            if not updated:
+                db.rollback()
+                print(f"[Batch] Item {item_id} attempt {attempts} lost its lease, result dropped")
+                return
+            # Last open item closes the job
+            still_open = (select(BatchJobItem.id)
+                          .where(BatchJobItem.job_id == job_id, BatchJobItem.status.in_([PENDING, RUNNING]))
+                          .exists())
+            db.execute(update(BatchJob)
+                       .where(BatchJob.id == job_id, BatchJob.status == RUNNING, ~still_open)
+                       .values(status=COMPLETED))
+            db.commit()
+        if status != PENDING:
+            BATCH_ITEMS.inc(status=status)
+        else:
+            self.notify()
+
+
+batch_runner = BatchRunner()
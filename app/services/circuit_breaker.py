@@ -0,0 +1,83 @@
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because the dependency is marked unhealthy."""
+
+
+class CircuitBreaker:
+    """
+    Minimal thread-safe circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and `allow()` returns
+    False for `reset_timeout` seconds, so callers skip the dependency instead of waiting on
+    it. The first call after that window is let through as a probe (half-open): success
+    closes the circuit, failure re-opens it for another window. A probe that never reports
+    back (cancelled, or gave up before calling the dependency) is replaced by a new one
+    after another `reset_timeout`, so the circuit can't stay half-open for good.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if ((self._state == self.OPEN and now - self._opened_at >= self.reset_timeout)
+                    or (self._state == self.HALF_OPEN and now - self._probe_started_at >= self.reset_timeout)):
+                self._state = self.HALF_OPEN
+                self._probe_started_at = now
+                return True  # this caller is the probe
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                    print(f"[CircuitBreaker] {self.name} opened after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker; raises CircuitOpenError while open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self._state, "consecutive_failures": self._failures,
+                    "times_opened": self.times_opened}
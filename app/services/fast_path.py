@@ -0,0 +1,97 @@
+"""
+Pre-routing for turns that don't need the tool-enabled agent.
+
+Greetings, thanks and "what can you do?" are recognised by rules and answered from
+templates. A turn without a YouTube link, in a session that has no video yet, can't use
+any tool either, so it gets a short prompt without tools instead of the full agent prompt
+and function schemas. Everything else goes to the agent. Every decision is counted under
+yt_fast_path_total{route} so the rules can be tuned.
+"""
+import os
+import re
+from typing import Callable, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.services.metrics import Counter
+from app.services.yt_tool import find_video_ids
+from app.templates.fast_path_prompt import (capabilities_response, fast_path_prompt, greeting_response,
+                                            thanks_response)
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true") == "true"
+# Answer no-video turns from the short prompt (one small LLM call) instead of the agent
+FAST_PATH_CHAT_ENABLED = os.getenv("FAST_PATH_CHAT_ENABLED", "true") == "true"
+FAST_PATH_HISTORY_MESSAGES = 6  # Recent turns included with the short prompt
+FAST_PATH_MAX_WORDS = 8         # Longer messages are never treated as small talk
+
+AGENT, CHAT = "agent", "chat"
+
+# Whole-message patterns, matched after lowercasing and stripping punctuation
+RULES = [
+    ("greeting", re.compile(r"(hi|hello|hey|hiya|yo|howdy|greetings|good (morning|afternoon|evening))"
+                            r"( there| agent| bot)?")),
+    ("thanks", re.compile(r"((ok|okay|great|awesome|perfect|cool|nice|got it) )?(thanks|thank you|thx|ty|cheers)"
+                          r"( (a lot|so much|very much|again))?")),
+    ("capabilities", re.compile(r"(what can you do|what do you do|what are you|who are you|help|what is this"
+                                r"|how does this work|how do i use (you|this)|what can i ask( you)?"
+                                r"|what are your (features|capabilities))( for me)?")),
+]
+TEMPLATES = {
+    "greeting": greeting_response,
+    "thanks": thanks_response,
+    "capabilities": capabilities_response,
+}
+
+NON_WORD = re.compile(r"[^a-z0-9' ]+")
+# Any mention of YouTube, even without a parsable link, may need the tools
+YOUTUBE_MENTION = re.compile(r"youtube|youtu\.be", re.IGNORECASE)
+
+FAST_PATH_DECISIONS = Counter("yt_fast_path_total", "Chat turns by pre-routing decision", ["route"])
+
+
+def classify_turn(query: str) -> Optional[str]:
+    """Template route for small talk, or None."""
+    text = " ".join(NON_WORD.sub(" ", query.lower()).split())
+    if not text or len(text.split()) > FAST_PATH_MAX_WORDS:
+        return None
+    for route, pattern in RULES:
+        if pattern.fullmatch(text):
+            return route
+    return None
+
+
+class FastPathRouter:
+    def __init__(self, chat_enabled: bool = FAST_PATH_CHAT_ENABLED):
+        self.chat_enabled = chat_enabled
+
+    def route(self, query: str, has_video: Callable[[], bool],
+              load_history: Callable[[], List[BaseMessage]]) -> Tuple[str, List[BaseMessage]]:
+        """
+        (route, history): a TEMPLATES key, CHAT or AGENT. History is only loaded, and
+        returned, for CHAT, whose prompt includes it; the agent's memory wrapper reads its own.
+        """
+        route, history = self._route(query, has_video, load_history)
+        FAST_PATH_DECISIONS.inc(route=route)
+        return route, history
+
+    def _route(self, query: str, has_video: Callable[[], bool],
+               load_history: Callable[[], List[BaseMessage]]) -> Tuple[str, List[BaseMessage]]:
+        if YOUTUBE_MENTION.search(query) or find_video_ids(query):
+            return AGENT, []
+        route = classify_turn(query)
+        if route is not None:
+            return route, []
+        if not self.chat_enabled:
+            return AGENT, []
+        if has_video():
+            return AGENT, []
+        return CHAT, load_history()
+
+    @staticmethod
+    def template(route: str) -> Optional[str]:
+        return TEMPLATES.get(route)
+
+    @staticmethod
+    def chat_messages(query: str, history: List[BaseMessage]) -> List[BaseMessage]:
+        return [SystemMessage(content=fast_path_prompt), *history[-FAST_PATH_HISTORY_MESSAGES:],
+                HumanMessage(content=query)]
@@ -0,0 +1,201 @@
+"""
+Cache of whole-video generations ("summary", "blog", "TLDR", ...).
+
+A request is cacheable when it is only a YouTube link plus one of the known intents, with
+no extra instructions, and the session has no earlier context that could change the
+answer. The key covers everything the answer depends on: the transcript content, the
+agent prompt version, the model settings and the intent.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.database.redis_setup import redis_breaker, redis_client
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.metrics import Counter
+from app.services.transcript_store import BASE_DIR, DiskTranscriptStore, get_transcript_store
+from app.services.yt_tool import YOUTUBE_URL_PATTERN, find_video_ids
+from app.templates.agent_prompt import AGENT_PROMPT_VERSION
+
+GENERATION_CACHE_BACKEND = os.getenv("GENERATION_CACHE_BACKEND", "redis")  # redis | disk | off
+GENERATION_CACHE_TTL_SECONDS = int(os.getenv("GENERATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "5000"))
+GENERATION_CACHE_DISK_MB = int(os.getenv("GENERATION_CACHE_DISK_MB", "256"))
+GENERATIONS_DIR = os.path.join(BASE_DIR, "..", "generations")
+
+GENERATION_KEY_PREFIX = "yt:generation:"
+GENERATION_LRU_KEY = "yt:generation:lru"  # sorted set: key -> last access time
+
+GENERATION_CACHE_REQUESTS = Counter("yt_generation_cache_total", "Generation cache lookups and writes",
+                                    ["result"])
+
+# A request must name exactly one: "blog post and TLDR" is a different answer from either
+INTENT_PATTERNS = [
+    ("blog", re.compile(r"\b(blog|article)(\s+post)?\b")),
+    ("tldr", re.compile(r"\btl\s*;?\s*dr\b")),
+    ("key_points", re.compile(r"\b(key\s+points|key\s+takeaways|takeaways|highlights)\b")),
+    ("summary", re.compile(r"\b(summary|summari[sz]e|summari[sz]ation)\b")),
+]
+
+# Words that don't change what gets generated; anything else makes the request custom
+FILLER_WORDS = {
+    "a", "an", "the", "of", "for", "on", "about", "from", "into", "as", "and", "to", "this", "that",
+    "it", "its", "here", "is", "video", "youtube", "link", "url", "please", "pls", "can", "could",
+    "would", "you", "i", "me", "us", "want", "need", "give", "get", "write", "make", "create",
+    "generate", "provide", "do", "turn", "post",
+}
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def parse_cacheable_request(query: str) -> Optional[Tuple[str, str]]:
+    """(video_id, intent) when the query is a bare whole-video request, else None."""
+    video_ids = find_video_ids(query)
+    if len(video_ids) != 1:
+        return None
+
+    text = YOUTUBE_URL_PATTERN.sub(" ", query.lower())
+    intents = [intent for intent, pattern in INTENT_PATTERNS if pattern.search(text)]
+    if len(intents) != 1:
+        return None
+
+    for _, pattern in INTENT_PATTERNS:
+        text = pattern.sub(" ", text)
+    if any(word not in FILLER_WORDS for word in WORD_PATTERN.findall(text)):
+        return None
+    return video_ids[0], intents[0]
+
+
+def has_personalizing_context(messages: List[BaseMessage]) -> bool:
+    """
+    Whether earlier turns could change a cacheable answer: any user message that wasn't
+    itself a bare cacheable request (preferences, language, follow-up instructions), or a
+    running summary of older turns.
+    """
+    for message in messages:
+        if isinstance(message, SystemMessage):
+            return True
+        if isinstance(message, HumanMessage) and parse_cacheable_request(str(message.content)) is None:
+            return True
+    return False
+
+
+class RedisGenerationBackend:
+    """Entries under yt:generation:{key} with a TTL, bounded by an LRU sorted set (as SessionCache)."""
+
+    def __init__(self, redis: Redis = redis_client, breaker: CircuitBreaker = redis_breaker,
+                 ttl_seconds: int = GENERATION_CACHE_TTL_SECONDS, max_entries: int = GENERATION_CACHE_MAX_ENTRIES):
+        self.redis = redis
+        self.breaker = breaker
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.breaker.allow():
+            return None
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(GENERATION_KEY_PREFIX + key)
+            pipe.zadd(GENERATION_LRU_KEY, {key: time.time()}, xx=True)
+            value, _ = pipe.execute()
+            self.breaker.record_success()
+            return value
+        except RedisError as e:
+            print(f"[GenerationCache] Redis read failed: {e}")
+            self.breaker.record_failure()
+            return None
+
+    def put(self, key: str, value: str):
+        if not self.breaker.allow():
+            return
+        now = time.time()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(GENERATION_KEY_PREFIX + key, value, ex=self.ttl_seconds)
+            pipe.zadd(GENERATION_LRU_KEY, {key: now})
+            pipe.zremrangebyscore(GENERATION_LRU_KEY, 0, now - self.ttl_seconds)
+            pipe.zcard(GENERATION_LRU_KEY)
+            _, _, _, size = pipe.execute()
+            if size > self.max_entries:
+                evicted = [member for member, _ in self.redis.zpopmin(GENERATION_LRU_KEY, size - self.max_entries)]
+                if evicted:
+                    self.redis.delete(*[GENERATION_KEY_PREFIX + member for member in evicted])
+            self.breaker.record_success()
+        except RedisError as e:
+            print(f"[GenerationCache] Redis write failed: {e}")
+            self.breaker.record_failure()
+
+
+class DiskGenerationBackend:
+    """
+    Local-disk entries, reusing the compressed transcript store layout (zstd blobs, LRU
+    eviction over a byte quota). Entries carry their creation time for the TTL.
+    """
+
+    def __init__(self, directory: str = GENERATIONS_DIR, ttl_seconds: int = GENERATION_CACHE_TTL_SECONDS,
+                 quota_bytes: int = GENERATION_CACHE_DISK_MB * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.store = DiskTranscriptStore(directory, quota_bytes=quota_bytes, memory_items=256,
+                                         memory_bytes=16 * 1024 * 1024)
+
+    def get(self, key: str) -> Optional[str]:
+        raw = self.store.get(key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if time.time() - entry["created_at"] > self.ttl_seconds:
+            self.store.delete(key)
+            return None
+        return entry["response"]
+
+    def put(self, key: str, value: str):
+        self.store.put(key, json.dumps({"created_at": time.time(), "response": value}))
+
+
+class GenerationCache:
+    def __init__(self, backend, model_settings: str):
+        self.backend = backend
+        self.model_settings = model_settings
+
+    def key(self, video_id: str, intent: str) -> Optional[str]:
+        """Cache key, or None while the transcript isn't stored yet."""
+        transcript_text = get_transcript_store().get(video_id)
+        if transcript_text is None:
+            return None
+        transcript_hash = hashlib.sha256(transcript_text.encode("utf-8")).hexdigest()
+        parts = (transcript_hash, AGENT_PROMPT_VERSION, self.model_settings, intent)
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, video_id: str, intent: str) -> Optional[str]:
+        key = self.key(video_id, intent)
+        answer = self.backend.get(key) if key else None
+        GENERATION_CACHE_REQUESTS.inc(result="hit" if answer is not None else "miss")
+        return answer
+
+    def put(self, video_id: str, intent: str, answer: str):
+        key = self.key(video_id, intent)
+        if key is None:
+            # The run never got the transcript (fetch failed), so the answer isn't one to keep
+            return
+        self.backend.put(key, answer)
+        GENERATION_CACHE_REQUESTS.inc(result="store")
+
+    @staticmethod
+    def record_bypass():
+        GENERATION_CACHE_REQUESTS.inc(result="bypass")
+
+
+@lru_cache(maxsize=None)
+def get_generation_cache(model_settings: str) -> Optional[GenerationCache]:
+    if GENERATION_CACHE_BACKEND == "off":
+        return None
+    backend = DiskGenerationBackend() if GENERATION_CACHE_BACKEND == "disk" else RedisGenerationBackend()
+    return GenerationCache(backend, model_settings)
@@ -0,0 +1,399 @@
+"""
+Retention for the message_store chat history table.
+
+LangChain's SQLChatMessageHistory appends every turn and never removes any, so the table
+only grows. Two jobs keep it to the rows the app still reads:
+
+  * Compaction: turns already folded into a session's running summary (message_summary,
+    see memory_manager) are outside the history window and never read again. They are
+    moved to cold storage and deleted.
+  * Archival: sessions with no new message for HISTORY_ARCHIVE_AFTER_DAYS are moved to
+    cold storage as a whole. A returning user starts from the summary, if there is one;
+    `restore` brings the turns back.
+
+Cold storage is zstd-compressed JSON lines under HISTORY_ARCHIVE_DIR, one file per moved
+range of a session. A file is fsynced before its rows are deleted, and the same range
+always maps to the same file, so an interrupted run is simply redone.
+
+With HISTORY_MAINTENANCE_ENABLED=true a background thread runs both jobs every
+HISTORY_MAINTENANCE_INTERVAL_SECONDS. A Postgres advisory lock makes sure only one
+process in the deployment runs them at a time. The same jobs, plus a size report per
+tenant (alias_id), are available from the command line:
+
+    python -m app.services.history_store report [--limit 20] [--json]
+    python -m app.services.history_store compact | archive [--days 30]
+    python -m app.services.history_store restore <session_id>
+
+Sessions are found idle through message_store.created_at and the (session_id, id) index;
+existing deployments get both from `python -m app.database.migrations`. Rows that predate
+that migration are stamped with the time it ran, so archival only starts picking up those
+sessions HISTORY_ARCHIVE_AFTER_DAYS later.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, delete, exists, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+
+from app.database.schema import ChatSummary, SessionVideo, User
+from app.database.setup import engine
+from app.services.metrics import Counter
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))                # /path/to/project_root/app/services
+HISTORY_ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", os.path.join(BASE_DIR, "..", "history_archive"))
+
+HISTORY_MAINTENANCE_ENABLED = os.getenv("HISTORY_MAINTENANCE_ENABLED", "false") == "true"
+HISTORY_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("HISTORY_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+HISTORY_ARCHIVE_AFTER_DAYS = float(os.getenv("HISTORY_ARCHIVE_AFTER_DAYS", "30"))
+HISTORY_SESSIONS_PER_RUN = int(os.getenv("HISTORY_SESSIONS_PER_RUN", "500"))
+HISTORY_ARCHIVE_CHUNK_ROWS = 5000  # Rows per archive file, and per delete
+ZSTD_LEVEL = 9
+
+# pg_try_advisory_lock key shared by every process running the maintenance jobs
+MAINTENANCE_LOCK_KEY = 0x79745F68  # "yt_h"
+
+ARCHIVED, COMPACTED = "archived", "compacted"
+
+HISTORY_MOVED_MESSAGES = Counter("yt_history_moved_messages_total",
+                                 "message_store rows moved to cold storage", ["reason"])
+HISTORY_MOVED_SESSIONS = Counter("yt_history_moved_sessions_total",
+                                 "Sessions with rows moved to cold storage", ["reason"])
+
+
+def _message_table():
+    # Imported here: memory_manager pulls in LangChain, which startup defers
+    from app.services.memory_manager import MESSAGE_TABLE
+    return MESSAGE_TABLE
+
+
+class HistoryArchive:
+    """
+    Cold storage for message_store rows:
+    `directory/{hash prefix}/{quoted session_id}/{first id}-{last id}.jsonl.zst`.
+    """
+
+    def __init__(self, directory: str = HISTORY_ARCHIVE_DIR, compression_level: int = ZSTD_LEVEL):
+        self.directory = os.path.abspath(directory)
+        self.compression_level = compression_level
+
+    def _session_dir(self, session_id: str) -> str:
+        shard = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:2]
+        return os.path.join(self.directory, shard, quote(session_id, safe=""))
+
+    def write(self, session_id: str, rows: List[dict], reason: str) -> str:
+        """Write rows ({"id", "created_at", "message"}) durably; returns the file path."""
+        # zstandard is imported on use: main imports this module for the maintenance thread
+        import zstandard
+        session_dir = self._session_dir(session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        path = os.path.join(session_dir, f"{rows[0]['id']:012d}-{rows[-1]['id']:012d}.jsonl.zst")
+        lines = "".join(json.dumps({**row, "reason": reason}) + "\n" for row in rows)
+        blob = zstandard.ZstdCompressor(level=self.compression_level).compress(lines.encode("utf-8"))
+
+        # Rows are deleted right after this returns, so the file must be on disk first
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    def files(self, session_id: str) -> List[str]:
+        session_dir = self._session_dir(session_id)
+        if not os.path.isdir(session_dir):
+            return []
+        return sorted(os.path.join(session_dir, name) for name in os.listdir(session_dir)
+                      if name.endswith(".jsonl.zst"))
+
+    def read(self, path: str) -> List[dict]:
+        import zstandard
+        with open(path, "rb") as f:
+            lines = zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+        return [json.loads(line) for line in lines.splitlines() if line]
+
+    def session_bytes(self, session_id: str) -> int:
+        return sum(os.path.getsize(path) for path in self.files(session_id))
+
+
+class HistoryMaintenance:
+    def __init__(self, bind: Engine = engine, archive: Optional[HistoryArchive] = None,
+                 archive_after_days: float = HISTORY_ARCHIVE_AFTER_DAYS,
+                 sessions_per_run: int = HISTORY_SESSIONS_PER_RUN,
+                 interval_seconds: float = HISTORY_MAINTENANCE_INTERVAL_SECONDS):
+        self.bind = bind
+        self.archive = archive or HistoryArchive()
+        self.archive_after_days = archive_after_days
+        self.sessions_per_run = sessions_per_run
+        self.interval_seconds = interval_seconds
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Updated by the maintenance thread (or the CLI), read by the monitoring endpoints
+        self._stats_lock = threading.Lock()
+        self._stats = {"runs": 0, "skipped_runs": 0, "failed_runs": 0, "last_run_seconds": 0.0,
+                       "archived_sessions": 0, "compacted_sessions": 0, "moved_messages": 0}
+
+    # ---- lifecycle -------------------------------------------------------------------
+
+    def start(self):
+        """Start the background thread (idempotent)."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="history-maintenance", daemon=True)
+            self._thread.start()
+        print(f"[History] Maintenance every {self.interval_seconds:.0f}s, "
+              f"archiving sessions idle for {self.archive_after_days:g} day(s)")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background thread; a run in progress stops after the session it is moving."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stopping.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                self._count("failed_runs")
+                print(f"[History] Maintenance run failed: {e}")
+
+    def run_once(self) -> Optional[dict]:
+        """Compact, then archive, unless another process holds the lock; returns what was moved."""
+        start = time.perf_counter()
+        # Session-level lock on an autocommit connection: holding it doesn't keep a transaction
+        # (and its snapshot) open for the whole run, which would hold back vacuum on
+        # message_store, the table this job deletes from
+        with self.bind.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+            if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}).scalar():
+                self._count("skipped_runs")
+                print("[History] Maintenance is running in another process, skipping")
+                return None
+            try:
+                result = {COMPACTED: self.compact(), ARCHIVED: self.archive_idle()}
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self._stats["runs"] += 1
+            self._stats["last_run_seconds"] = round(elapsed, 3)
+        print(f"[History] Compacted {result[COMPACTED]} and archived {result[ARCHIVED]} message(s) "
+              f"in {elapsed:.2f}s")
+        return result
+
+    # ---- jobs ------------------------------------------------------------------------
+
+    def compact(self) -> int:
+        """Move turns already folded into a summary to cold storage; returns rows moved."""
+        messages = _message_table()
+        summarized = (select(ChatSummary.session_id, ChatSummary.last_message_id)
+                      .where(exists().where(messages.c.session_id == ChatSummary.session_id,
+                                            messages.c.id <= ChatSummary.last_message_id))
+                      .limit(self.sessions_per_run))
+        with self.bind.connect() as conn:
+            sessions = conn.execute(summarized).all()
+        moved = compacted = 0
+        for session_id, last_message_id in sessions:
+            if self._stopping.is_set():
+                break
+            moved += self.move_to_archive(session_id, COMPACTED, up_to_id=last_message_id)
+            compacted += 1
+        self._count("compacted_sessions", compacted)
+        return moved
+
+    def archive_idle(self, now: Optional[datetime] = None) -> int:
+        """Move sessions without a message in archive_after_days to cold storage; returns rows moved."""
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=self.archive_after_days)
+        sessions = self.idle_sessions(cutoff)
+        moved = archived = 0
+        for session_id in sessions:
+            if self._stopping.is_set():
+                break
+            moved += self.move_to_archive(session_id, ARCHIVED)
+            archived += 1
+        self._count("archived_sessions", archived)
+        return moved
+
+    def idle_sessions(self, cutoff: datetime) -> List[str]:
+        messages = _message_table()
+        recent = messages.alias("recent")
+        with self.bind.connect() as conn:
+            # ids grow with created_at, so rows at or after the first recent id are the recent ones
+            boundary = conn.execute(select(messages.c.id).where(messages.c.created_at >= cutoff)
+                                    .order_by(messages.c.id).limit(1)).scalar()
+            if boundary is None:
+                boundary = (conn.execute(select(func.max(messages.c.id))).scalar() or 0) + 1
+            # The anti-join is a lookup per candidate on the (session_id, id) index
+            idle = (select(messages.c.session_id).distinct()
+                    .where(messages.c.id < boundary,
+                           ~exists().where(recent.c.session_id == messages.c.session_id, recent.c.id >= boundary))
+                    .limit(self.sessions_per_run))
+            return list(conn.execute(idle).scalars())
+
+    def move_to_archive(self, session_id: str, reason: str, up_to_id: Optional[int] = None) -> int:
+        """Archive and delete a session's rows (only those up to `up_to_id` if given), chunk by chunk."""
+        messages = _message_table()
+        moved, after_id = 0, 0
+        while True:
+            condition = and_(messages.c.session_id == session_id, messages.c.id > after_id)
+            if up_to_id is not None:
+                condition = and_(condition, messages.c.id <= up_to_id)
+            with self.bind.begin() as conn:
+                rows = conn.execute(select(messages.c.id, messages.c.created_at, messages.c.message)
+                                    .where(condition).order_by(messages.c.id)
+                                    .limit(HISTORY_ARCHIVE_CHUNK_ROWS)).all()
+                if not rows:
+                    break
+                self.archive.write(session_id, [{"id": row.id, "created_at": row.created_at.isoformat(),
+                                                 "message": row.message} for row in rows], reason)
+                conn.execute(delete(messages).where(messages.c.session_id == session_id,
+                                                    messages.c.id.between(rows[0].id, rows[-1].id)))
+            moved += len(rows)
+            after_id = rows[-1].id
+        if moved:
+            HISTORY_MOVED_MESSAGES.inc(moved, reason=reason)
+            HISTORY_MOVED_SESSIONS.inc(reason=reason)
+            self._count("moved_messages", moved)
+            print(f"[History] Moved {moved} message(s) of {session_id} to cold storage ({reason})")
+        return moved
+
+    def restore(self, session_id: str) -> int:
+        """Put a session's archived rows back into message_store, with their original ids."""
+        from app.services.yt_tool import find_video_ids
+
+        messages = _message_table()
+        restored = 0
+        for path in self.archive.files(session_id):
+            rows = [{"id": row["id"], "session_id": session_id, "message": row["message"],
+                     "created_at": datetime.fromisoformat(row["created_at"])} for row in self.archive.read(path)]
+            with self.bind.begin() as conn:
+                conn.execute(insert(messages).values(rows).on_conflict_do_nothing(index_elements=["id"]))
+                # Sessions archived before session_video existed were never flagged
+                if any(find_video_ids(row["message"]) for row in rows):
+                    conn.execute(insert(SessionVideo).values(session_id=session_id)
+                                 .on_conflict_do_nothing(index_elements=["session_id"]))
+            os.remove(path)
+            restored += len(rows)
+        print(f"[History] Restored {restored} message(s) of {session_id}")
+        return restored
+
+    # ---- reporting -------------------------------------------------------------------
+
+    def size_report(self, limit: int = 20) -> dict:
+        """Table and index sizes, and the largest tenants by message bytes."""
+        messages = _message_table()
+        with self.bind.connect() as conn:
+            table = conn.execute(text(
+                "SELECT pg_total_relation_size(c.oid), pg_relation_size(c.oid), pg_indexes_size(c.oid), "
+                "c.reltuples::bigint FROM pg_class c WHERE c.oid = 'message_store'::regclass")).one()
+            indexes = conn.execute(text(
+                "SELECT i.indexrelid::regclass::text, pg_relation_size(i.indexrelid) FROM pg_index i "
+                "WHERE i.indrelid = 'message_store'::regclass ORDER BY 2 DESC")).all()
+
+            message_bytes = func.sum(func.pg_column_size(messages.c.message))
+            rows = func.count()
+            tenants = conn.execute(
+                select(messages.c.session_id, User.email, rows.label("rows"), message_bytes.label("bytes"),
+                       func.max(messages.c.created_at).label("last_message_at"),
+                       func.sum(rows).over().label("all_rows"), func.sum(message_bytes).over().label("all_bytes"),
+                       func.count().over().label("tenants"))
+                .select_from(messages.outerjoin(User, User.alias_id == messages.c.session_id))
+                .group_by(messages.c.session_id, User.email)
+                .order_by(message_bytes.desc())
+                .limit(limit)).all()
+
+        total_bytes, heap_bytes, index_bytes, estimated_rows = table
+        all_rows = int(tenants[0].all_rows) if tenants else 0
+        all_bytes = int(tenants[0].all_bytes) if tenants else 0
+        return {
+            "table": {"total_bytes": total_bytes, "heap_bytes": heap_bytes, "index_bytes": index_bytes,
+                      "rows": all_rows, "estimated_rows": estimated_rows,
+                      "tenants": int(tenants[0].tenants) if tenants else 0},
+            "indexes": {name: size for name, size in indexes},
+            # Postgres doesn't track size per key: the heap is shared out by message bytes,
+            # the indexes by row count
+            "tenants": [{"alias_id": row.session_id, "email": row.email, "rows": row.rows,
+                         "message_bytes": int(row.bytes),
+                         "estimated_heap_bytes": round(heap_bytes * int(row.bytes) / all_bytes) if all_bytes else 0,
+                         "estimated_index_bytes": round(index_bytes * row.rows / all_rows) if all_rows else 0,
+                         "archived_bytes": self.archive.session_bytes(row.session_id),
+                         "last_message_at": row.last_message_at.isoformat() if row.last_message_at else None}
+                        for row in tenants],
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+history_maintenance = HistoryMaintenance()
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def print_report(report: Dict):
+    table = report["table"]
+    print(f"message_store: {_format_bytes(table['total_bytes'])} total ({_format_bytes(table['heap_bytes'])} heap, "
+          f"{_format_bytes(table['index_bytes'])} indexes), {table['rows']} rows, {table['tenants']} tenant(s)")
+    for name, size in report["indexes"].items():
+        print(f"  index {name:<40} {_format_bytes(size):>10}")
+    print(f"  {'alias_id':<38} {'email':<28} {'rows':>9} {'heap':>10} {'index':>10} {'archived':>10}  last message")
+    for tenant in report["tenants"]:
+        print(f"  {tenant['alias_id']:<38} {(tenant['email'] or '-')[:28]:<28} {tenant['rows']:>9} "
+              f"{_format_bytes(tenant['estimated_heap_bytes']):>10} {_format_bytes(tenant['estimated_index_bytes']):>10} "
+              f"{_format_bytes(tenant['archived_bytes']):>10}  {tenant['last_message_at'] or '-'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chat history retention and size reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="table and index size, per tenant")
+    report.add_argument("--limit", type=int, default=20, help="largest tenants to list")
+    report.add_argument("--json", action="store_true", help="print the report as JSON")
+    commands.add_parser("compact", help="move summarized turns to cold storage")
+    archive = commands.add_parser("archive", help="move idle sessions to cold storage")
+    archive.add_argument("--days", type=float, default=HISTORY_ARCHIVE_AFTER_DAYS, help="idle for at least this long")
+    restore = commands.add_parser("restore", help="bring a session's archived turns back")
+    restore.add_argument("session_id")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        result = history_maintenance.size_report(args.limit)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            print_report(result)
+    elif args.command == "compact":
+        history_maintenance.compact()
+    elif args.command == "archive":
+        history_maintenance.archive_after_days = args.days
+        history_maintenance.archive_idle()
+    elif args.command == "restore":
+        history_maintenance.restore(args.session_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+LangChain callback feeding the LLM call timings and token counts into app.services.metrics.
+
+Kept out of metrics itself so the middleware and the collectors can be imported without
+LangChain; only the modules that invoke a model import this one.
+"""
+import time
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.services.metrics import LLM_TOKENS, STAGE_ERRORS, record_stage
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Times every chat model call and counts prompt/completion tokens from its usage report."""
+
+    # Cheap enough to run on the event loop instead of a worker thread; this also keeps
+    # the request's context so the call shows up in Server-Timing
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            record_stage("llm", time.perf_counter() - start)
+
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        model = (response.llm_output or {}).get("model_name", "")
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        if not usage:
+            # Streaming runs report usage on the message instead
+            for generations in response.generations:
+                for generation in generations:
+                    message = getattr(generation, "message", None)
+                    metadata = getattr(message, "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+                    model = model or getattr(message, "response_metadata", {}).get("model_name", "")
+        if prompt_tokens:
+            LLM_TOKENS.inc(prompt_tokens, model=model, type="prompt")
+        if completion_tokens:
+            LLM_TOKENS.inc(completion_tokens, model=model, type="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        start = self._started.pop(run_id, None)
+        STAGE_ERRORS.inc(stage="llm")
+        if start is not None:
+            record_stage("llm", time.perf_counter() - start)
+
+
+llm_metrics_callback = LLMMetricsCallback()
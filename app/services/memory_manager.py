@@ -1,35 +1,223 @@
 import os
-from langchain_community.chat_message_histories.sql import SQLChatMessageHistory
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Union
+from langchain_community.chat_message_histories.sql import SQLChatMessageHistory, DefaultMessageConverter
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.runnables.config import run_in_executor
 from langchain_core.runnables.history import RunnableWithMessageHistory
+from sqlalchemy import Column, DateTime, Index, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database.schema import ChatSummary, SessionVideo
+from app.database.setup import engine
+from app.services.metrics import timed
+from app.services.tokens import count_tokens
+
+HISTORY_WINDOW_SIZE = int(os.getenv("HISTORY_WINDOW_SIZE", "10"))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "3000"))
+
+# (previous summary or None, messages that just left the window) -> updated summary
+Summarizer = Callable[[Optional[str], List[BaseMessage]], str]
+
+# Summaries are refreshed off the request path
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+# One message model for every history instance; the default converter declares a new
+# SQLAlchemy model class each time it is constructed
+MESSAGE_CONVERTER = DefaultMessageConverter("message_store")
+MESSAGE_TABLE = MESSAGE_CONVERTER.get_sql_model_class().__table__
+
+# Not part of LangChain's model, so the ORM never writes it: Postgres fills it in, and
+# history_store uses it to find idle sessions
+MESSAGE_TABLE.append_column(Column("created_at", DateTime(timezone=True), server_default=func.now(), nullable=False))
+# Window reads (WHERE session_id = ? ORDER BY id DESC LIMIT n) walk this index backwards
+Index("ix_message_store_session_id_id", MESSAGE_TABLE.c.session_id, MESSAGE_TABLE.c.id)
+
+
+def shutdown_summaries():
+    """Drop queued summary refreshes; the next write to the session redoes them."""
+    _summary_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_message_store(bind: Engine = engine):
+    """
+    Create the message_store table; called once at startup instead of per history. An
+    existing table is upgraded by app.database.migrations instead (it builds the index
+    concurrently).
+    """
+    MESSAGE_TABLE.metadata.create_all(bind)
 
 
 class WindowedSQLChatHistory(SQLChatMessageHistory):
-    def __init__(self, session_id: str, db_url: str, window_size: int = 10):
-        super().__init__(session_id=session_id, connection=db_url)
+    """
+    SQL chat history that only ever loads the tail of a session.
+
+    Reads fetch the last `window_size` messages with ORDER BY id DESC LIMIT, then drop the
+    oldest of those until they fit `max_tokens`. With a summarizer, turns that slide out
+    of the window are folded into a running summary (message_summary table), which is
+    prepended as a system message so older context isn't lost entirely.
+
+    Pass the process-wide Engine as `connection` so every history shares its pool; the
+    message_store table is expected to exist already (see create_message_store). With an
+    `async_sessions` factory the async methods (used by ainvoke/astream_events) run the same
+    queries on the async engine instead of a worker thread.
+    """
+
+    def __init__(self, session_id: str, connection: Union[str, Engine], window_size: int = HISTORY_WINDOW_SIZE,
+                 max_tokens: Optional[int] = HISTORY_MAX_TOKENS, summarizer: Optional[Summarizer] = None,
+                 async_sessions: Optional[async_sessionmaker[AsyncSession]] = None):
+        super().__init__(session_id=session_id, connection=connection,
+                         custom_message_converter=MESSAGE_CONVERTER)
         self.window_size = window_size
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.async_sessions = async_sessions
+
+    def _create_table_if_not_exists(self) -> None:
+        self._table_created = True
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore[override]
+        with timed("history_read"), self._make_sync_session() as session:
+            rows = session.execute(self._window_query()).scalars().all()
+            summary = session.get(ChatSummary, self.session_id) if self.summarizer else None
+        return self._to_messages(rows, summary)
+
+    def _window_query(self):
+        model = self.sql_model_class
+        return (select(model)
+                .where(getattr(model, self.session_id_field_name) == self.session_id)
+                .order_by(model.id.desc())
+                .limit(self.window_size))
+
+    def _to_messages(self, rows, summary: Optional[ChatSummary]) -> List[BaseMessage]:
+        messages = self._fit_token_budget([self.converter.from_sql_model(row) for row in reversed(rows)])
+        if summary:
+            messages.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {summary.summary}"))
+        return messages
+
+    def _fit_token_budget(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        if not self.max_tokens:
+            return messages
+        kept, used = [], 0
+        for message in reversed(messages):
+            used += count_tokens(str(message.content))
+            if used > self.max_tokens and kept:
+                break
+            kept.append(message)
+        return kept[::-1]
+
+    def has_video(self) -> bool:
+        """Whether any turn of the session linked a YouTube video, however long ago."""
+        with self._make_sync_session() as session:
+            return session.get(SessionVideo, self.session_id) is not None
+
+    def _video_flag(self, messages: Sequence[BaseMessage]):
+        """Statement recording that the session has a video, or None if the messages link none."""
+        # Imported here so the history CLI (history_store) doesn't load the tools
+        from app.services.yt_tool import find_video_ids
+        if not any(find_video_ids(str(message.content)) for message in messages):
+            return None
+        return insert(SessionVideo).values(session_id=self.session_id).on_conflict_do_nothing(
+            index_elements=["session_id"])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        flag = self._video_flag(messages)
+        with timed("history_write"), self._make_sync_session() as session:
+            session.add_all([self.converter.to_sql_model(message, self.session_id) for message in messages])
+            if flag is not None:
+                session.execute(flag)
+            session.commit()
+        if self.summarizer:
+            _summary_executor.submit(self._update_summary)
+
+    # SQLChatMessageHistory only allows one engine mode per instance, so the async methods
+    # use their own session factory; without one they fall back to a worker thread.
+    async def aget_messages(self) -> List[BaseMessage]:
+        if self.async_sessions is None:
+            return await run_in_executor(None, lambda: self.messages)
+        with timed("history_read"):
+            async with self.async_sessions() as session:
+                rows = (await session.execute(self._window_query())).scalars().all()
+                summary = await session.get(ChatSummary, self.session_id) if self.summarizer else None
+        return self._to_messages(rows, summary)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if self.async_sessions is None:
+            await run_in_executor(None, self.add_messages, messages)
+            return
+        flag = self._video_flag(messages)
+        with timed("history_write"):
+            async with self.async_sessions() as session:
+                session.add_all([self.converter.to_sql_model(message, self.session_id) for message in messages])
+                if flag is not None:
+                    await session.execute(flag)
+                await session.commit()
+        if self.summarizer:
+            _summary_executor.submit(self._update_summary)
+
+    def _update_summary(self):
+        """Fold messages that have left the window (and aren't summarized yet) into the summary."""
+        model = self.sql_model_class
+        session_filter = getattr(model, self.session_id_field_name) == self.session_id
+        try:
+            with self._make_sync_session() as session:
+                # Newest message outside the window
+                boundary_id = session.execute(
+                    select(model.id).where(session_filter)
+                    .order_by(model.id.desc()).offset(self.window_size).limit(1)
+                ).scalar()
+                if boundary_id is None:
+                    return
+
+                summary = session.get(ChatSummary, self.session_id)
+                last_summarized = summary.last_message_id if summary else 0
+                if boundary_id <= last_summarized:
+                    return
+
+                rows = session.execute(
+                    select(model).where(session_filter, model.id > last_summarized, model.id <= boundary_id)
+                    .order_by(model.id.asc())
+                ).scalars().all()
+                updated = self.summarizer(summary.summary if summary else None,
+                                          [self.converter.from_sql_model(row) for row in rows])
+
+                if summary is None:
+                    summary = ChatSummary(session_id=self.session_id, summary=updated, last_message_id=boundary_id)
+                    session.add(summary)
+                else:
+                    summary.summary = updated
+                    summary.last_message_id = boundary_id
+                session.commit()
+        except Exception as e:
+            print(f"[Memory] Failed to update summary for {self.session_id}: {e}")
 
 
 class MemoryManager:
-    def __init__(self, tenant_id: str, db_url: str = None, window_size: int = 10):
+    def __init__(self, tenant_id: str = None, connection: Union[str, Engine, None] = None,
+                 window_size: int = HISTORY_WINDOW_SIZE, max_tokens: Optional[int] = HISTORY_MAX_TOKENS,
+                 summarizer: Optional[Summarizer] = None,
+                 async_sessions: Optional[async_sessionmaker[AsyncSession]] = None):
         self.tenant_id = tenant_id
-        self.db_url = db_url or os.getenv("YT_DATABASE_URL")
+        self.connection = connection or engine
         self.window_size = window_size
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.async_sessions = async_sessions
+
+    def get_history(self, session_id: str) -> WindowedSQLChatHistory:
+        return WindowedSQLChatHistory(session_id, self.connection, self.window_size,
+                                      self.max_tokens, self.summarizer, self.async_sessions)
 
     def wrap_with_memory(self, chain):
         """
         Wrap a runnable (agent or chain) with SQL-based chat memory using message history.
         """
-        def get_history(session_id: str):
-            history = WindowedSQLChatHistory(session_id, self.db_url, self.window_size)
-            print(f"Created history for session {session_id}")
-            print(f"History messages type: {history.messages}")
-            return history
-
         return RunnableWithMessageHistory(
             runnable=chain,
-            get_session_history=get_history,
+            get_session_history=self.get_history,
             input_messages_key="input",
             history_messages_key="chat_history"
         )
-
-
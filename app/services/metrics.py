@@ -0,0 +1,218 @@
+"""
+In-process metrics: counters, histograms and per-request stage timings.
+
+Everything is exported in the Prometheus text format on /metrics, and the stages timed
+during a request are echoed back to the client as a Server-Timing header. No LangSmith or
+Prometheus client library is needed; recording a sample is a lock and a bisect.
+"""
+import bisect
+import contextvars
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += bucket_count
+                    le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REGISTRY: List[Any] = []
+
+# name prefix -> callable returning a flat dict of numbers, read at scrape time (gauges)
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def register_collector(prefix: str, collect: Callable[[], dict]):
+    """Export a stats() style dict as gauges named `{prefix}_{key}` on every scrape."""
+    _collectors[prefix] = collect
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for prefix, collect in _collectors.items():
+        try:
+            values = collect()
+        except Exception as e:
+            print(f"[Metrics] Collector {prefix} failed: {e}")
+            continue
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value}")
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram("yt_stage_duration_seconds", "Time spent per request stage", ["stage"])
+STAGE_ERRORS = Counter("yt_stage_errors_total", "Stages that raised", ["stage"])
+HTTP_REQUEST_SECONDS = Histogram("yt_http_request_duration_seconds", "HTTP request latency",
+                                 ["method", "route", "status"])
+LLM_TOKENS = Counter("yt_llm_tokens_total", "Tokens reported by the LLM API", ["model", "type"])
+TRANSCRIPT_BYTES = Counter("yt_transcript_bytes_total", "Transcript text bytes served", ["source"])
+
+# Stages timed during the current request; None outside a request (background threads)
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = \
+    contextvars.ContextVar("request_timings", default=None)
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block as `stage`: observed in the histogram and added to Server-Timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def timed_stage(stage: str):
+    """Decorator form of timed() for sync and async functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timed(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    # Repeated stages (e.g. two LLM calls in one agent run) are summed into one entry
+    merged: Dict[str, List[float]] = {}
+    for stage, seconds in timings:
+        entry = merged.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = [f'{stage};dur={seconds * 1e3:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+             for stage, (seconds, count) in merged.items()]
+    parts.append(f"total;dur={total * 1e3:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware: collects the stages timed while handling a request, records the
+    request latency, and adds a Server-Timing header. Streaming responses send headers
+    first, so their header only covers the stages that ran before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                header = _server_timing(timings, time.perf_counter() - start)
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                         route=getattr(route, "path", "unmatched"), status=status["code"])
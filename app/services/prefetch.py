@@ -0,0 +1,94 @@
+"""
+Speculative transcript prefetch.
+
+When a message contains YouTube links, their transcripts are fetched in the background
+while the first LLM call decides what to do. The fetch goes through the same single-flight
+path as the transcript tools, so if the agent then calls a tool it joins the in-flight
+fetch (or reads the stored transcript) instead of starting from scratch.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from app.services.metrics import Counter
+from app.services.transcript_store import get_transcript_store
+from app.services.yt_tool import find_video_ids, get_or_fetch_transcript
+
+PREFETCH_ENABLED = os.getenv("TRANSCRIPT_PREFETCH_ENABLED", "true") == "true"
+PREFETCH_WORKERS = int(os.getenv("TRANSCRIPT_PREFETCH_WORKERS", "4"))
+# Prefetches a session may start per window; bounds the cost of links the agent never uses
+PREFETCH_SESSION_BUDGET = int(os.getenv("TRANSCRIPT_PREFETCH_SESSION_BUDGET", "5"))
+PREFETCH_BUDGET_WINDOW_SECONDS = int(os.getenv("TRANSCRIPT_PREFETCH_WINDOW_SECONDS", "600"))
+PREFETCH_MAX_URLS_PER_MESSAGE = 3
+
+PREFETCHES = Counter("yt_transcript_prefetch_total", "Speculative transcript prefetches", ["result"])
+
+
+class TranscriptPrefetcher:
+    def __init__(self, workers: int = PREFETCH_WORKERS, session_budget: int = PREFETCH_SESSION_BUDGET,
+                 window_seconds: int = PREFETCH_BUDGET_WINDOW_SECONDS):
+        self.session_budget = session_budget
+        self.window_seconds = window_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcript-prefetch")
+        self._max_in_flight = workers * 2
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        # session id -> start times of its prefetches within the current window
+        self._spent: dict[str, List[float]] = {}
+
+    def prefetch(self, session_id: str, message: str) -> int:
+        """Start background fetches for the uncached videos linked in `message`; returns how many."""
+        started = 0
+        for video_id in find_video_ids(message)[:PREFETCH_MAX_URLS_PER_MESSAGE]:
+            if get_transcript_store().exists(video_id):
+                PREFETCHES.inc(result="cached")
+                continue
+            refused = self._reserve(session_id)
+            if refused:
+                PREFETCHES.inc(result=refused)
+                break
+            self._executor.submit(self._fetch, video_id)
+            PREFETCHES.inc(result="started")
+            started += 1
+        return started
+
+    def shutdown(self):
+        """Drop prefetches that haven't started; nothing waits on them."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _reserve(self, session_id: str) -> Optional[str]:
+        """Take a slot from the session's budget; returns why not, or None on success."""
+        now = time.monotonic()
+        with self._lock:
+            if self._in_flight >= self._max_in_flight:
+                return "busy"
+            spent = [t for t in self._spent.get(session_id, []) if now - t < self.window_seconds]
+            if len(spent) >= self.session_budget:
+                self._spent[session_id] = spent
+                return "over_budget"
+            spent.append(now)
+            self._spent[session_id] = spent
+            self._in_flight += 1
+            if len(self._spent) > 10_000:
+                self._prune(now)
+            return None
+
+    def _prune(self, now: float):
+        for session_id in [sid for sid, times in self._spent.items() if now - times[-1] >= self.window_seconds]:
+            del self._spent[session_id]
+
+    def _fetch(self, video_id: str):
+        try:
+            if get_or_fetch_transcript(video_id) is None:
+                PREFETCHES.inc(result="unavailable")
+        except Exception as e:
+            print(f"[Prefetch] Failed for {video_id}: {e}")
+            PREFETCHES.inc(result="failed")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+transcript_prefetcher = TranscriptPrefetcher() if PREFETCH_ENABLED else None
@@ -0,0 +1,125 @@
+"""
+Per-call token budget for the agent prompt.
+
+Every LLM call the agent makes is assembled from the system prompt and tool schemas, the
+chat history, the results of the tools called so far in this run (transcripts), and the
+user's query. PromptBudget runs just before the prompt is rendered and fits those parts
+into PROMPT_BUDGET_TOKENS, trimming the lowest-priority parts first:
+
+    system prompt, tool schemas, query   always kept
+    tool results, newest first           middle-truncated once they no longer fit
+    history summary                      dropped if even that doesn't fit
+    history, newest first                oldest messages dropped first
+
+The allocation is logged for every call and exported as metrics.
+"""
+import json
+import os
+from typing import List, Sequence, Tuple
+
+from langchain_core.agents import AgentAction
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_function
+
+from app.services.metrics import Counter
+from app.services.tokens import count_tokens, get_encoding
+
+PROMPT_BUDGET_TOKENS = int(os.getenv("PROMPT_BUDGET_TOKENS", "40000"))
+MESSAGE_OVERHEAD_TOKENS = 8    # Role and rendering around each message, roughly
+TRUNCATED_TAIL_TOKENS = 150    # Kept from the end of a cut tool result (its next_action)
+MIN_TOOL_RESULT_TOKENS = 300   # Below this a cut tool result isn't worth keeping
+
+PROMPT_TOKENS = Counter("yt_prompt_tokens_total", "Prompt tokens allocated per part", ["part"])
+PROMPT_TRIMS = Counter("yt_prompt_trims_total", "Prompt parts trimmed to fit the budget", ["part"])
+
+
+def truncate_middle(text: str, max_tokens: int, tail_tokens: int = TRUNCATED_TAIL_TOKENS) -> str:
+    """Cut `text` to about `max_tokens`, keeping its start and its last `tail_tokens` tokens."""
+    encoding = get_encoding()
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text
+    tail_tokens = min(tail_tokens, max_tokens // 4)
+    head = encoding.decode(tokens[:max_tokens - tail_tokens])
+    tail = encoding.decode(tokens[len(tokens) - tail_tokens:]) if tail_tokens else ""
+    cut = len(tokens) - max_tokens
+    return f"{head}\n...[{cut} tokens cut to fit the prompt budget]...\n{tail}"
+
+
+class PromptBudget:
+    def __init__(self, system_prompt: str, tools: Sequence[BaseTool], budget_tokens: int = PROMPT_BUDGET_TOKENS):
+        self.budget_tokens = budget_tokens
+        # Sent with every call and never trimmed, so counted once
+        self.system_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        self.tool_schema_tokens = count_tokens(json.dumps([convert_to_openai_function(t) for t in tools]))
+
+    def fit(self, inputs: dict) -> dict:
+        """Agent inputs with chat_history and intermediate_steps trimmed to the budget."""
+        query_tokens = count_tokens(inputs["input"]) + MESSAGE_OVERHEAD_TOKENS
+        remaining = self.budget_tokens - self.system_tokens - self.tool_schema_tokens - query_tokens
+
+        steps, steps_tokens, truncated = self._fit_steps(inputs.get("intermediate_steps") or [], remaining)
+        remaining -= steps_tokens
+        history = inputs.get("chat_history") or []
+        kept_history, history_tokens = self._fit_history(history, remaining)
+
+        allocation = {"system": self.system_tokens + self.tool_schema_tokens, "query": query_tokens,
+                      "tool_results": steps_tokens, "history": history_tokens}
+        for part, tokens in allocation.items():
+            PROMPT_TOKENS.inc(tokens, part=part)
+        if truncated:
+            PROMPT_TRIMS.inc(truncated, part="tool_results")
+        dropped = len(history) - len(kept_history)
+        if dropped:
+            PROMPT_TRIMS.inc(dropped, part="history")
+        print(f"[PromptBudget] {sum(allocation.values())}/{self.budget_tokens} tokens: "
+              + ", ".join(f"{part}={tokens}" for part, tokens in allocation.items())
+              + f" ({len(steps)} tool result(s), {truncated} cut; {len(kept_history)} history message(s), {dropped} dropped)")
+
+        return {**inputs, "chat_history": kept_history, "intermediate_steps": steps}
+
+    @staticmethod
+    def _fit_steps(steps: List[Tuple[AgentAction, object]], remaining: int):
+        """Newest results first; the first one that doesn't fit is cut, older ones after it too."""
+        fitted, used, truncated = [], 0, 0
+        for action, observation in reversed(steps):
+            action_tokens = count_tokens(str(action.tool_input)) + MESSAGE_OVERHEAD_TOKENS
+            # Rendered the way the scratchpad formats a non-JSON tool result
+            text = observation if isinstance(observation, str) else str(observation)
+            tokens = count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+            room = remaining - used - action_tokens - MESSAGE_OVERHEAD_TOKENS
+            if action_tokens + tokens > remaining - used:
+                truncated += 1
+                if room >= MIN_TOOL_RESULT_TOKENS:
+                    observation = truncate_middle(text, room)
+                else:
+                    observation = "[result omitted to fit the prompt budget; call the tool again if it is needed]"
+                tokens = min(tokens, max(room, 0)) + MESSAGE_OVERHEAD_TOKENS
+            fitted.append((action, observation))
+            used += action_tokens + tokens
+        fitted.reverse()
+        return fitted, used, truncated
+
+    @staticmethod
+    def _fit_history(history: List[BaseMessage], remaining: int):
+        """Keep the summary, then the newest messages that fit, in their original order."""
+        summary = history[0] if history and isinstance(history[0], SystemMessage) else None
+        messages = history[1:] if summary else history
+        used = 0
+        if summary is not None:
+            summary_tokens = count_tokens(str(summary.content)) + MESSAGE_OVERHEAD_TOKENS
+            if summary_tokens <= remaining:
+                used = summary_tokens
+            else:
+                summary = None
+
+        kept = []
+        for message in reversed(messages):
+            tokens = count_tokens(str(message.content)) + MESSAGE_OVERHEAD_TOKENS
+            if used + tokens > remaining:
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+        return ([summary] if summary else []) + kept, used
@@ -0,0 +1,50 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Thread-safe in-process token bucket: `rate` tokens per second, bursts up to `capacity`.
+
+    acquire() blocks until a token is available (or the timeout passes); try_acquire()
+    never blocks.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, count: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(count / 60.0, burst)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
@@ -0,0 +1,317 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+
+from app.database.redis_setup import async_redis_client, redis_client, redis_pubsub_client, redis_breaker
+from app.services.circuit_breaker import CircuitBreaker
+
+SESSION_KEY_PREFIX = "yt:session:"
+SESSION_LRU_KEY = "yt:session:lru"   # sorted set: session_id -> last access time
+INVALIDATION_CHANNEL = "yt:session:invalidate"
+MAX_CACHE_KEYS = int(os.getenv("SESSION_CACHE_MAX_KEYS", "10000"))
+CACHE_TTL_SECONDS = 1800  # 30 mins
+
+# In-process tier: short TTL bounds staleness if an invalidation message is ever missed
+LOCAL_CACHE_MAX_KEYS = int(os.getenv("SESSION_L1_MAX_KEYS", "10000"))
+LOCAL_CACHE_TTL_SECONDS = float(os.getenv("SESSION_L1_TTL_SECONDS", "60"))
+LISTENER_RETRY_SECONDS = 5
+
+
+class LocalTTLCache:
+    """Bounded, TTL-aware, thread-safe in-process LRU."""
+
+    def __init__(self, max_keys: int = LOCAL_CACHE_MAX_KEYS, ttl_seconds: float = LOCAL_CACHE_TTL_SECONDS):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_keys:
+                self._items.popitem(last=False)
+
+    def pop(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SessionCache:
+    """
+    Two-tier cache of session_id -> user identity.
+
+    L1 is a bounded in-process LRU with a short TTL, so the hot chat path resolves identity
+    without any network call. L2 is Redis: entries live under namespaced keys
+    (yt:session:{session_id}) with a TTL, and a sorted set scores each session by its last
+    access time, so bounding the cache is a ZCARD plus a ZPOPMIN of the oldest members
+    instead of scanning the keyspace. Reads and writes are pipelined into a single round
+    trip.
+
+    Redis calls go through a circuit breaker: after repeated failures L2 is skipped
+    entirely for a while and callers fall through to the database immediately. Every write
+    publishes an invalidation so other worker processes drop their L1 copy (e.g. when a
+    login rebinds a session to an email account).
+
+    The a-prefixed methods are the same operations on the asyncio client, for callers on
+    the event loop; both share L1, the breaker and the counters.
+    """
+
+    def __init__(self, redis: Redis = redis_client, max_keys: int = MAX_CACHE_KEYS,
+                 ttl_seconds: int = CACHE_TTL_SECONDS, local: Optional[LocalTTLCache] = None,
+                 breaker: CircuitBreaker = redis_breaker, pubsub_redis: Optional[Redis] = redis_pubsub_client,
+                 async_redis: Optional[AsyncRedis] = async_redis_client):
+        self.redis = redis
+        self.async_redis = async_redis
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.local = local or LocalTTLCache()
+        self.breaker = breaker
+        self.pubsub_redis = pubsub_redis
+        self._instance_id = uuid.uuid4().hex
+        self._listener: Optional[threading.Thread] = None
+        self._listener_lock = threading.Lock()
+        self._counters = {"l1_hits": 0, "hits": 0, "misses": 0, "writes": 0, "evictions": 0,
+                          "errors": 0, "short_circuited": 0, "invalidations_received": 0}
+        self._counter_lock = threading.Lock()
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"{SESSION_KEY_PREFIX}{session_id}"
+
+    def get(self, session_id: str) -> Optional[dict]:
+        return self.get_many([session_id]).get(session_id)
+
+    def get_many(self, session_ids: Iterable[str]) -> dict[str, dict]:
+        """Bulk lookup: L1 first, then one pipelined MGET for the rest."""
+        found, remote_ids = self._local_lookup(session_ids)
+        if not remote_ids or not self._allow(len(remote_ids)):
+            return found
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            self._queue_read(pipe, remote_ids)
+            values, _ = pipe.execute()
+        except RedisError as e:
+            self._read_failed(e, remote_ids)
+            return found
+        return {**found, **self._read_done(remote_ids, values)}
+
+    async def aget(self, session_id: str) -> Optional[dict]:
+        return (await self.aget_many([session_id])).get(session_id)
+
+    async def aget_many(self, session_ids: Iterable[str]) -> dict[str, dict]:
+        found, remote_ids = self._local_lookup(session_ids)
+        if not remote_ids or not self._allow(len(remote_ids)):
+            return found
+        try:
+            pipe = self.async_redis.pipeline(transaction=False)
+            self._queue_read(pipe, remote_ids)
+            values, _ = await pipe.execute()
+        except (RedisError, OSError) as e:
+            self._read_failed(e, remote_ids)
+            return found
+        return {**found, **self._read_done(remote_ids, values)}
+
+    def _local_lookup(self, session_ids: Iterable[str]) -> tuple[dict, list]:
+        self._ensure_listener()
+        found = {}
+        remote_ids = []
+        for sid in session_ids:
+            value = self.local.get(sid)
+            if value is not None:
+                found[sid] = value
+            else:
+                remote_ids.append(sid)
+        self._count("l1_hits", len(found))
+        return found, remote_ids
+
+    def _allow(self, misses: int = 0) -> bool:
+        if self.breaker.allow():
+            return True
+        self._count("short_circuited")
+        self._count("misses", misses)
+        return False
+
+    def _queue_read(self, pipe, session_ids: list):
+        pipe.mget([self._key(sid) for sid in session_ids])
+        # xx: only refresh members that are still indexed, never add new ones
+        pipe.zadd(SESSION_LRU_KEY, {sid: time.time() for sid in session_ids}, xx=True)
+
+    def _read_failed(self, error: Exception, session_ids: list):
+        print(f"Redis cache read failed: {error}")
+        self.breaker.record_failure()
+        self._count("errors")
+        self._count("misses", len(session_ids))
+
+    def _read_done(self, session_ids: list, values: list) -> dict:
+        self.breaker.record_success()
+        remote = {sid: json.loads(value) for sid, value in zip(session_ids, values) if value}
+        for sid, value in remote.items():
+            self.local.set(sid, value)
+        self._count("hits", len(remote))
+        self._count("misses", len(session_ids) - len(remote))
+        return remote
+
+    def set(self, session_id: str, data: dict):
+        self._ensure_listener()
+        self.local.set(session_id, data)
+        if not self._allow():
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            self._queue_write(pipe, session_id, data)
+            _, _, _, size, _ = pipe.execute()
+            self._count("writes")
+
+            if size > self.max_keys:
+                self._evict(size - self.max_keys)
+            self.breaker.record_success()
+        except RedisError as e:
+            self._write_failed(e)
+
+    async def aset(self, session_id: str, data: dict):
+        self._ensure_listener()
+        self.local.set(session_id, data)
+        if not self._allow():
+            return
+        try:
+            pipe = self.async_redis.pipeline(transaction=False)
+            self._queue_write(pipe, session_id, data)
+            _, _, _, size, _ = await pipe.execute()
+            self._count("writes")
+
+            if size > self.max_keys:
+                evicted = [sid for sid, _ in await self.async_redis.zpopmin(SESSION_LRU_KEY, size - self.max_keys)]
+                if evicted:
+                    await self.async_redis.delete(*[self._key(sid) for sid in evicted])
+                    self._count("evictions", len(evicted))
+            self.breaker.record_success()
+        except (RedisError, OSError) as e:
+            self._write_failed(e)
+
+    def _queue_write(self, pipe, session_id: str, data: dict):
+        now = time.time()
+        pipe.set(self._key(session_id), json.dumps(data), ex=self.ttl_seconds)
+        pipe.zadd(SESSION_LRU_KEY, {session_id: now})
+        # Members whose keys have expired by TTL
+        pipe.zremrangebyscore(SESSION_LRU_KEY, 0, now - self.ttl_seconds)
+        pipe.zcard(SESSION_LRU_KEY)
+        pipe.publish(INVALIDATION_CHANNEL, f"{self._instance_id}:{session_id}")
+
+    def _write_failed(self, error: Exception):
+        print(f"Redis cache write failed: {error}")
+        self.breaker.record_failure()
+        self._count("errors")
+
+    def delete(self, *session_ids: str):
+        """Drop sessions from both tiers and tell other processes to drop their L1 copies."""
+        if not session_ids:
+            return
+        for sid in session_ids:
+            self.local.pop(sid)
+        if not self._allow():
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(*[self._key(sid) for sid in session_ids])
+            pipe.zrem(SESSION_LRU_KEY, *session_ids)
+            for sid in session_ids:
+                pipe.publish(INVALIDATION_CHANNEL, f"{self._instance_id}:{sid}")
+            pipe.execute()
+            self.breaker.record_success()
+        except RedisError as e:
+            print(f"Redis cache delete failed: {e}")
+            self.breaker.record_failure()
+            self._count("errors")
+
+    def _evict(self, count: int):
+        # ZPOPMIN is atomic, so concurrent writers never evict the same member twice
+        evicted = [sid for sid, _ in self.redis.zpopmin(SESSION_LRU_KEY, count)]
+        if evicted:
+            self.redis.delete(*[self._key(sid) for sid in evicted])
+            self._count("evictions", len(evicted))
+
+    def _ensure_listener(self):
+        if self._listener is not None or self.pubsub_redis is None:
+            return
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="session-cache-invalidation",
+                                                  daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        reconnecting = False
+        while True:
+            try:
+                pubsub = self.pubsub_redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                if reconnecting:
+                    # Invalidations may have been missed while disconnected; L1 keeps serving
+                    # during the outage and is only dropped once we are listening again
+                    self.local.clear()
+                    reconnecting = False
+                for message in pubsub.listen():
+                    origin, _, session_id = str(message["data"]).partition(":")
+                    if origin != self._instance_id:
+                        self.local.pop(session_id)
+                        self._count("invalidations_received")
+            except (RedisError, OSError) as e:
+                if not reconnecting:
+                    print(f"Session cache invalidation listener disconnected: {e}")
+                reconnecting = True
+                time.sleep(LISTENER_RETRY_SECONDS)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._counter_lock:
+            self._counters[name] += amount
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            counters = dict(self._counters)
+        lookups = counters["l1_hits"] + counters["hits"] + counters["misses"]
+        size = None
+        if self.breaker.state == CircuitBreaker.CLOSED:
+            try:
+                size = self.redis.zcard(SESSION_LRU_KEY)
+            except RedisError:
+                pass
+        return {
+            "size": size,
+            "max_keys": self.max_keys,
+            "l1_size": len(self.local),
+            "hit_ratio": round((counters["l1_hits"] + counters["hits"]) / lookups, 4) if lookups else None,
+            "breaker": self.breaker.stats(),
+            **counters,
+        }
+
+
+session_cache = SessionCache()
@@ -1,139 +1,160 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, update, exists, literal, union_all, func
+from sqlalchemy.dialects.postgresql import insert
 from uuid import uuid4
-import redis
-import json
 from app.database.schema import User
+from app.services.metrics import timed_stage
+from app.services.session_cache import SessionCache, session_cache
 
-# Redis setup
-redis_client = redis.Redis(host="localhost", port=6379, db=1, decode_responses=True)
-MAX_CACHE_KEYS = 30
-CACHE_TTL_SECONDS = 1800  # 30 mins
+USER_COLUMNS = (User.session_id, User.email, User.name, User.alias_id)
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def build_bind_email_statement(session_id: str, email: str, name: str | None):
+    """
+    Single-statement login: bind `session_id` to the account for `email`.
+
+    - an anonymous row already owning the session is claimed (its alias_id, and so its
+      chat history, carries over to a new account),
+    - an existing account just takes over the session,
+    - other accounts that still point at this session are detached from it.
+    The unique index on lower(email) makes concurrent logins converge on one row.
+    """
+    email = normalize_email(email)
+    claimed = (delete(User)
+               .where(User.session_id == session_id, User.email.is_(None))
+               .returning(User.alias_id)
+               .cte("claimed"))
+    detached = (update(User)
+                .where(User.session_id == session_id, User.email.is_not(None), func.lower(User.email) != email)
+                .values(session_id=None)
+                .cte("detached"))
+
+    stmt = insert(User).values(
+        alias_id=func.coalesce(select(claimed.c.alias_id).limit(1).scalar_subquery(), str(uuid4())),
+        session_id=session_id,
+        email=email,
+        name=name,
+    )
+    return (stmt
+            .on_conflict_do_update(
+                index_elements=[func.lower(User.email)],
+                set_={"session_id": stmt.excluded.session_id,
+                      "name": func.coalesce(stmt.excluded.name, User.name),
+                      "updated_at": func.now()})
+            .returning(*USER_COLUMNS)
+            .add_cte(claimed)
+            .add_cte(detached))
+
+
+def build_resolve_session_statement(session_id: str):
+    """
+    Single-statement lookup-or-create of the user owning `session_id`.
+
+    Returns the existing row, or inserts an anonymous one. Two first requests racing on
+    the same session are serialized by the partial unique index; the loser inserts
+    nothing and sees no row, and simply runs the statement again.
+    """
+    existing = (select(*USER_COLUMNS)
+                .where(User.session_id == session_id)
+                .order_by(User.updated_at.desc().nulls_last())
+                .limit(1)
+                .cte("existing"))
+    inserted = (insert(User)
+                .from_select(["alias_id", "session_id"],
+                             select(literal(str(uuid4())), literal(session_id))
+                             .where(~exists(select(existing.c.alias_id))))
+                .on_conflict_do_nothing(index_elements=[User.session_id], index_where=User.email.is_(None))
+                .returning(*USER_COLUMNS)
+                .cte("inserted"))
+    return union_all(select(inserted), select(existing))
 
 
 class SqlService:
     """
     SQL Service with sync handling for database operations.
+
+    Each flow is one INSERT ... ON CONFLICT ... RETURNING round trip (see the statement
+    builders above), backed by the unique indexes on users.
     """
+    def __init__(self, cache: SessionCache = session_cache):
+        self.cache = cache
+
+    @timed_stage("session")
     def get_or_create(self, db: Session, session_id: str, email: str|None = None, name: str|None = None):
         try:
-            # Check Redis cache
-            cached = redis_client.get(session_id)
-
-            if cached and email:
-                # Binding the inbetween login after few chats
-                result = db.execute(select(User).where(User.email == email.lower())) # For already existed email
-                user = result.scalars().first()
-                if user:
-                    return self._update_session_id_and_cache(user, session_id, db)
-
-                result = db.execute(select(User).where(User.session_id == session_id))  # For already existed session_id
-                user = result.scalars().first()
-                if user:
-                    return self._update_email_and_cache(user, email, name, db)
-
             if email:
-                result = db.execute(select(User).where(User.email == email.lower())) # For already existed email
-                user = result.scalars().first()
-                if user:
-                    return self._update_session_id_and_cache(user, session_id, db)
-
-                # new email, create new row
-                alias_id = str(uuid4())
-                new_user = User(session_id=session_id, email=email, name=name, alias_id=alias_id)
-                db.add(new_user)
+                # Login: bind the session (and any anonymous history) to the email account
+                row = db.execute(build_bind_email_statement(session_id, email, name)).one()
                 db.commit()
-                db.refresh(new_user)
-                return self._cache_and_return(new_user)
-
-            elif cached:
-                return json.loads(cached)
-
-            else:
-                # No email provided and session_id not in cache
-                result = db.execute(select(User).where(User.session_id == session_id))
-                user = result.scalars().first()
-                if user:
-                    return self._cache_and_return(user)
-
-                # No match, create with only session_id and alias_id
-                alias_id = str(uuid4())
-                new_user = User(session_id=session_id, alias_id=alias_id)
-                db.add(new_user)
+                return self._cache_and_return(row)
+
+            # Check Redis cache
+            cached = self.cache.get(session_id)
+            if cached:
+                return cached
+
+            for _ in range(2):
+                row = db.execute(build_resolve_session_statement(session_id)).first()
                 db.commit()
-                db.refresh(new_user)
-                return self._cache_and_return(new_user)
+                if row:
+                    return self._cache_and_return(row)
+            raise Exception(f"Could not resolve session {session_id}")
 
         except Exception as e:
             db.rollback()
             raise Exception(f"Database operation failed: {str(e)}")
 
+    @staticmethod
+    def _user_data(user) -> dict:
+        return {
+            "session_id": user.session_id,
+            "email": user.email,
+            "name": user.name,
+            "alias_id": user.alias_id,
+        }
 
-    def _update_session_id_and_cache(self, user: User, new_session_id: str, db: Session):
-        try:
-            user.session_id = new_session_id
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            return self._cache_and_return(user)
-        except Exception as e:
-            db.rollback()
-            raise Exception(f"Failed to update session_id: {str(e)}")
+    def _cache_and_return(self, user):
+        data = self._user_data(user)
+        # If Redis fails, the cache logs it and we still return the data
+        self.cache.set(user.session_id, data)
+        return data
 
 
-    def _update_email_and_cache(self, user: User, email_id: str, name: str, db: Session):
+class AsyncSqlService(SqlService):
+    """
+    Same flows as SqlService for the async request path: the statements run on an
+    AsyncSession (asyncpg) and the cache is read and written with the asyncio Redis client,
+    so resolving a session never blocks the event loop.
+    """
+    @timed_stage("session")
+    async def get_or_create(self, db: AsyncSession, session_id: str, email: str|None = None, name: str|None = None):
         try:
-            user.email = email_id
-            user.name = name
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            return self._cache_and_return(user)
-        except Exception as e:
-            db.rollback()
-            raise Exception(f"Failed to update email_id: {str(e)}")
+            if email:
+                row = (await db.execute(build_bind_email_statement(session_id, email, name))).one()
+                await db.commit()
+                return await self._acache_and_return(row)
+
+            cached = await self.cache.aget(session_id)
+            if cached:
+                return cached
+
+            for _ in range(2):
+                row = (await db.execute(build_resolve_session_statement(session_id))).first()
+                await db.commit()
+                if row:
+                    return await self._acache_and_return(row)
+            raise Exception(f"Could not resolve session {session_id}")
 
-    def _cache_and_return(self, user: User):
-        try:
-            data = {
-                "session_id": user.session_id,
-                "email": user.email,
-                "name": user.name,
-                "alias_id": user.alias_id,
-            }
-            self._evict_if_needed()
-            redis_client.set(user.session_id, json.dumps(data), ex=CACHE_TTL_SECONDS)
-            return data
-        except Exception as e:
-            # If Redis fails, still return the data
-            print(f"Redis cache failed: {e}")
-            return {
-                "session_id": user.session_id,
-                "email": user.email,
-                "name": user.name,
-                "alias_id": user.alias_id,
-            }
-
-    def _evict_if_needed(self):
-        try:
-            # Get all keys with their last access time
-            keys = redis_client.keys("*")
-            if len(keys) >= MAX_CACHE_KEYS:
-                # Get keys with their idle time (rough LRU approximation)
-                key_idle_times = []
-                for key in keys:
-                    idle_time = redis_client.object("idletime", key)
-                    if idle_time is not None:
-                        key_idle_times.append((key, idle_time))
-
-                if key_idle_times:
-                    # Sort by idle time (highest = least recently used)
-                    key_idle_times.sort(key=lambda x: x[1], reverse=True)
-                    # Delete the least recently used key
-                    redis_client.delete(key_idle_times[0][0])
-                else:
-                    # Fallback: delete first key if OBJECT IDLETIME fails
-                    redis_client.delete(keys[0])
         except Exception as e:
-            print(f"Cache eviction failed: {e}")
+            await db.rollback()
+            raise Exception(f"Database operation failed: {str(e)}")
 
+    async def _acache_and_return(self, user):
+        data = self._user_data(user)
+        await self.cache.aset(user.session_id, data)
+        return data
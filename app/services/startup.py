@@ -0,0 +1,97 @@
+"""
+Warm-up run from the app's lifespan hook instead of at import time.
+
+Importing main only builds the FastAPI app: nothing talks to Postgres, and the agent stack
+(LangChain, OpenAI, NumPy, the YouTube client) is not imported yet. Once the server is
+accepting connections, the warm-up steps run in order on a worker thread:
+
+    schema    create missing tables (skipped with MIGRATE_ON_STARTUP=false)
+    agent     import the agent stack and build the shared Agent
+    auth      register the Google OAuth client
+    batch     resume unfinished batch jobs
+    history   start history maintenance (only with HISTORY_MAINTENANCE_ENABLED=true)
+
+A failing step (e.g. Postgres still starting) is retried with backoff rather than taking
+the process down. /healthz/live answers as soon as requests are served; /healthz/ready
+answers 503 until every step is done, so traffic only reaches a warm worker.
+
+On shutdown, once in-flight requests have finished, the background work is stopped in
+order: batch workers (items still in progress go back to the queue), history maintenance,
+then the agent's prefetch and summary executors. Each stop step runs once; a failure is
+logged and the next one still runs.
+"""
+import asyncio
+import time
+from typing import Callable, List, Optional, Tuple
+
+from app.services.metrics import Histogram
+
+STARTUP_RETRY_BASE_SECONDS = 1.0
+STARTUP_RETRY_MAX_SECONDS = 30.0
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+STARTUP_STEP_SECONDS = Histogram("yt_startup_step_seconds", "Time taken by each warm-up step", ["step"])
+
+
+class Startup:
+    def __init__(self, retry_base: float = STARTUP_RETRY_BASE_SECONDS, retry_max: float = STARTUP_RETRY_MAX_SECONDS):
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.steps = {}
+        self.errors = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    async def warm_up(self, steps: List[Tuple[str, Callable[[], object]]]):
+        """Run the (name, blocking function) steps in order, each retried until it succeeds."""
+        self.steps = {name: PENDING for name, _ in steps}
+        for name, step in steps:
+            await self._run_step(name, step)
+        self.ready_at = time.time()
+        print(f"[Startup] Ready after {self.ready_at - self.started_at:.2f}s")
+
+    async def _run_step(self, name: str, step: Callable[[], object]):
+        attempt = 0
+        while True:
+            self.steps[name] = RUNNING
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(step)
+            except Exception as e:
+                delay = min(self.retry_max, self.retry_base * 2 ** attempt)
+                attempt += 1
+                self.steps[name] = FAILED
+                self.errors[name] = f"{type(e).__name__}: {e}"[:500]
+                print(f"[Startup] Step {name} failed (attempt {attempt}), retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            elapsed = time.perf_counter() - start
+            STARTUP_STEP_SECONDS.observe(elapsed, step=name)
+            self.steps[name] = DONE
+            self.errors.pop(name, None)
+            print(f"[Startup] Step {name} done in {elapsed:.2f}s")
+            return
+
+    async def shut_down(self, steps: List[Tuple[str, Callable[[], object]]]):
+        """Run the (name, blocking function) stop steps in order, each once."""
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(step)
+            except Exception as e:
+                print(f"[Startup] Shutdown step {name} failed: {e}")
+                continue
+            print(f"[Startup] Shutdown step {name} done in {time.perf_counter() - start:.2f}s")
+
+    def stats(self) -> dict:
+        return {"ready": int(self.ready), "uptime_seconds": round(time.time() - self.started_at, 3),
+                "warm_up_seconds": round(self.ready_at - self.started_at, 3) if self.ready else None,
+                "steps": dict(self.steps), "errors": dict(self.errors)}
+
+
+startup = Startup()
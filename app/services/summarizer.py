@@ -0,0 +1,167 @@
+"""
+Map-reduce condensing of transcripts too long to hand to the agent in one piece.
+
+The transcript is split into token-sized chunks, each chunk is summarized into dense notes
+on a bounded thread pool (map), and while the notes are still over budget, neighbouring
+notes are merged the same way (reduce). A 3-hour video costs one round of parallel chunk
+calls plus at most a couple of merge rounds, rather than one call per chunk in sequence.
+
+Chunk notes are persisted next to the transcript, keyed by a hash of the chunk text, the
+prompt and the model, so later requests on the same video reuse them whatever output
+they ask for.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+
+from app.services.llm_metrics import llm_metrics_callback
+from app.services.metrics import Counter, timed
+from app.services.tokens import count_tokens
+from app.services.transcript_index import chunk_transcript
+from app.services.transcript_store import get_transcript_store
+
+# Transcripts above this are condensed before the agent sees them
+CONDENSE_ABOVE_TOKENS = int(os.getenv("CONDENSE_ABOVE_TOKENS", "30000"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "4000"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+# Notes are merged further until they fit in this many tokens
+SUMMARY_NOTES_BUDGET_TOKENS = int(os.getenv("SUMMARY_NOTES_BUDGET_TOKENS", "8000"))
+SUMMARY_NOTE_WORDS = 350
+SUMMARY_MAX_REDUCE_LEVELS = 4
+SUMMARIES_ARTIFACT = "summaries"
+
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gpt-4o-mini")
+
+MAP_PROMPT = """You are condensing part {part} of {parts} of a YouTube video transcript into notes. A writer
+will later produce articles, summaries, debates and answers from these notes alone, without the transcript.
+
+Write dense bullet notes of at most {words} words, in the order things are said. Keep the speakers' claims,
+arguments, names, numbers, examples and conclusions; drop filler and repetition. Don't add anything that isn't
+in the transcript. Transcripts may be autogenerated and misspell terms; correct them cautiously.
+
+Transcript part {part} of {parts}:
+{text}"""
+
+REDUCE_PROMPT = """Below are consecutive notes taken from one YouTube video transcript. Merge them into a single
+set of bullet notes of at most {words} words, in the original order. Keep the claims, arguments, names, numbers,
+examples and conclusions; merge repeated points. Don't add anything that isn't in the notes.
+
+{text}"""
+
+# Changes whenever the prompts do, so stale notes are not reused
+SUMMARY_PROMPT_VERSION = hashlib.sha256((MAP_PROMPT + REDUCE_PROMPT).encode("utf-8")).hexdigest()[:12]
+
+SUMMARY_CHUNKS = Counter("yt_summary_chunks_total", "Transcript chunk notes by source", ["result"])
+
+
+@lru_cache(maxsize=None)
+def get_summary_llm():
+    """Built on first use, like the agent's LLM."""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=SUMMARY_MODEL, temperature=0, stream_usage=True)
+
+
+class TranscriptSummarizer:
+    def __init__(self, llm=None, chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+                 notes_budget_tokens: int = SUMMARY_NOTES_BUDGET_TOKENS, concurrency: int = SUMMARY_CONCURRENCY):
+        self._llm = llm
+        self.chunk_tokens = chunk_tokens
+        self.notes_budget_tokens = notes_budget_tokens
+        # Shared by all requests, so concurrency is bounded process-wide
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="summarize")
+        self._artifact_lock = threading.Lock()
+
+    @property
+    def llm(self):
+        return self._llm if self._llm is not None else get_summary_llm()
+
+    def shutdown(self):
+        """Drop queued chunks; chunks being summarized finish before the interpreter exits."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def condense(self, video_id: str, transcript_text: str) -> str:
+        """Notes covering the whole transcript, within the notes budget."""
+        chunks = chunk_transcript(transcript_text, self.chunk_tokens, overlap_tokens=0)
+        with timed("summarize_map"):
+            notes = self._map(video_id, chunks)
+        with timed("summarize_reduce"):
+            notes = self._reduce(notes)
+        if len(notes) == 1:
+            return notes[0]
+        return "\n\n".join(f"Part {i} of {len(notes)}:\n{note}" for i, note in enumerate(notes, 1))
+
+    def _map(self, video_id: str, chunks: List[str]) -> List[str]:
+        keys = [self._chunk_key(chunk) for chunk in chunks]
+        cached = self._load_notes(video_id)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        SUMMARY_CHUNKS.inc(len(chunks) - len(missing), result="cached")
+        SUMMARY_CHUNKS.inc(len(missing), result="generated")
+        if missing:
+            print(f"[Summarizer] Summarizing {len(missing)} of {len(chunks)} chunk(s) for {video_id}")
+            prompts = [MAP_PROMPT.format(part=i + 1, parts=len(chunks), words=SUMMARY_NOTE_WORDS, text=chunks[i])
+                       for i in missing]
+            generated = dict(zip((keys[i] for i in missing), self._complete_all(prompts)))
+            self._save_notes(video_id, generated)
+            cached.update(generated)
+        return [cached[key] for key in keys]
+
+    def _reduce(self, notes: List[str]) -> List[str]:
+        for _ in range(SUMMARY_MAX_REDUCE_LEVELS):
+            sizes = [count_tokens(note) for note in notes]
+            if len(notes) == 1 or sum(sizes) <= self.notes_budget_tokens:
+                break
+            groups = self._group(notes, sizes)
+            print(f"[Summarizer] Merging {len(notes)} notes into {len(groups)}")
+            notes = self._complete_all([REDUCE_PROMPT.format(words=SUMMARY_NOTE_WORDS, text="\n\n".join(group))
+                                        for group in groups])
+        return notes
+
+    def _group(self, notes: List[str], sizes: List[int]) -> List[List[str]]:
+        """Neighbouring notes in groups of up to the notes budget, at least two per group."""
+        groups, current, used = [], [], 0
+        for note, size in zip(notes, sizes):
+            if len(current) >= 2 and used + size > self.notes_budget_tokens:
+                groups.append(current)
+                current, used = [], 0
+            current.append(note)
+            used += size
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        elif current:
+            groups.append(current)
+        return groups
+
+    def _complete_all(self, prompts: List[str]) -> List[str]:
+        # Each call runs in a copy of the caller's context so its timing lands in the request's
+        futures = [self._executor.submit(contextvars.copy_context().run, self._complete, prompt)
+                   for prompt in prompts]
+        return [future.result() for future in futures]
+
+    def _complete(self, prompt: str) -> str:
+        return self.llm.invoke(prompt, config={"callbacks": [llm_metrics_callback]}).content
+
+    def _chunk_key(self, chunk: str) -> str:
+        parts = (SUMMARY_PROMPT_VERSION, self.llm.model_name, str(self.llm.temperature), chunk)
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _load_notes(video_id: str) -> dict:
+        data = get_transcript_store().get_artifact(video_id, SUMMARIES_ARTIFACT)
+        return json.loads(data) if data else {}
+
+    def _save_notes(self, video_id: str, notes: dict):
+        try:
+            with self._artifact_lock:
+                # Re-read so notes saved by a concurrent request on the same video are kept
+                merged = {**self._load_notes(video_id), **notes}
+                get_transcript_store().put_artifact(video_id, SUMMARIES_ARTIFACT, json.dumps(merged).encode("utf-8"))
+        except Exception as e:
+            print(f"[Summarizer] Failed to store chunk notes for {video_id}: {e}")
+
+
+transcript_summarizer = TranscriptSummarizer()
@@ -0,0 +1,166 @@
+import io
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.services.tokens import get_encoding
+from app.services.transcript_store import get_transcript_store
+
+TIMED_ARTIFACT = "timed"
+TIMED_VERSION = 1
+TIMED_CACHE_SIZE = 32
+
+TIMESTAMP_RE = re.compile(r"^\s*(?:(\d+):)?(\d{1,2}):(\d{1,2})(?:\.\d+)?\s*$")
+
+
+def parse_timestamp(value: str) -> float:
+    """Seconds from "14:30", "1:02:03" or plain seconds ("870")."""
+    value = str(value).strip()
+    match = TIMESTAMP_RE.match(value)
+    if match:
+        hours, minutes, seconds = match.groups()
+        if int(minutes) < 60 and int(seconds) < 60:
+            return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+    else:
+        try:
+            seconds = float(value)
+        except ValueError:
+            seconds = None
+        # float() also takes "nan", "inf" and negatives, none of which is a point in a video
+        if seconds is not None and math.isfinite(seconds) and seconds >= 0:
+            return seconds
+    raise ValueError(f"unrecognized timestamp {value!r}; use mm:ss, hh:mm:ss or seconds")
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class TimedTranscript:
+    """
+    Transcript with its timing, in a compact array-backed form.
+
+    `text` is every segment joined by a space (identical to the plain transcript), and
+    segment i is text[offsets[i]:offsets[i + 1]] (minus the separator). `starts`/`ends`
+    are the segment times in seconds and `token_counts` their sizes, so a time range maps
+    to a slice of segments with two binary searches, and its token cost is a cumsum lookup.
+    """
+
+    def __init__(self, text: str, offsets: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 token_counts: np.ndarray):
+        self.text = text
+        self.offsets = offsets
+        self.starts = starts
+        self.ends = ends
+        self.token_counts = token_counts
+        self._token_cumsum = np.concatenate(([0], np.cumsum(token_counts, dtype=np.int64)))
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[dict]) -> "TimedTranscript":
+        """Build from the YouTube transcript API's [{"text", "start", "duration"}, ...]."""
+        segments = sorted(segments, key=lambda s: float(s.get("start", 0)))
+        texts = [s["text"] for s in segments]
+        starts = np.array([float(s.get("start", 0)) for s in segments], dtype=np.float64)
+        ends = starts + np.array([float(s.get("duration", 0)) for s in segments], dtype=np.float64)
+        lengths = np.array([len(t) for t in texts], dtype=np.int64)
+        # Each segment but the last is followed by a one-character separator
+        offsets = np.concatenate(([0], np.cumsum(lengths + 1)))
+        token_counts = np.array([len(tokens) for tokens in get_encoding().encode_ordinary_batch(texts)],
+                                dtype=np.int32) if texts else np.zeros(0, dtype=np.int32)
+        return cls(" ".join(texts), offsets, starts, ends, token_counts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def duration(self) -> float:
+        return float(self.ends.max()) if len(self) else 0.0
+
+    def segment_text(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def window(self, start: float, end: float) -> tuple[int, int]:
+        """Segments [i, j) that overlap the time range [start, end)."""
+        # Segments starting before `end`...
+        j = int(np.searchsorted(self.starts, end, side="left"))
+        # ...minus those that finished before `start`. Ends aren't sorted if segments
+        # overlap, so step back from the segment containing `start` by start time instead
+        i = max(int(np.searchsorted(self.starts, start, side="right")) - 1, 0)
+        if i < j and self.ends[i] <= start:
+            i += 1
+        return i, max(i, j)
+
+    def tokens_between(self, i: int, j: int) -> int:
+        return int(self._token_cumsum[j] - self._token_cumsum[i])
+
+    def excerpt(self, i: int, j: int, max_tokens: Optional[int] = None) -> tuple[str, int, bool]:
+        """Timestamped lines for segments [i, j); returns (text, last segment + 1, truncated)."""
+        if max_tokens is not None and self.tokens_between(i, j) > max_tokens:
+            # Largest j' with tokens(i, j') <= max_tokens, keeping at least one segment
+            j = max(i + 1, int(np.searchsorted(self._token_cumsum, self._token_cumsum[i] + max_tokens,
+                                               side="right")) - 1)
+            truncated = True
+        else:
+            truncated = False
+        lines = [f"[{format_timestamp(self.starts[k])}] {self.segment_text(k)}" for k in range(i, j)]
+        return "\n".join(lines), j, truncated
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer,
+                 version=np.array(TIMED_VERSION),
+                 text=np.frombuffer(self.text.encode("utf-8"), dtype=np.uint8),
+                 offsets=self.offsets,
+                 starts=self.starts,
+                 ends=self.ends,
+                 token_counts=self.token_counts)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["TimedTranscript"]:
+        arrays = np.load(io.BytesIO(data))
+        if int(arrays["version"]) != TIMED_VERSION:
+            return None
+        return cls(arrays["text"].tobytes().decode("utf-8"), arrays["offsets"], arrays["starts"],
+                   arrays["ends"], arrays["token_counts"])
+
+
+# Recently used transcripts stay deserialized in memory
+_timed_cache: OrderedDict[str, TimedTranscript] = OrderedDict()
+_timed_cache_lock = threading.Lock()
+
+
+def store_timed_transcript(video_id: str, timed: TimedTranscript):
+    """Persist the timing next to the stored transcript text."""
+    get_transcript_store().put_artifact(video_id, TIMED_ARTIFACT, timed.to_bytes())
+    _remember(video_id, timed)
+
+
+def load_timed_transcript(video_id: str) -> Optional[TimedTranscript]:
+    """The stored timed transcript, or None if this video was stored without timing."""
+    with _timed_cache_lock:
+        timed = _timed_cache.get(video_id)
+        if timed is not None:
+            _timed_cache.move_to_end(video_id)
+            return timed
+
+    data = get_transcript_store().get_artifact(video_id, TIMED_ARTIFACT)
+    timed = TimedTranscript.from_bytes(data) if data else None
+    if timed is not None:
+        _remember(video_id, timed)
+    return timed
+
+
+def _remember(video_id: str, timed: TimedTranscript):
+    with _timed_cache_lock:
+        _timed_cache[video_id] = timed
+        _timed_cache.move_to_end(video_id)
+        while len(_timed_cache) > TIMED_CACHE_SIZE:
+            _timed_cache.popitem(last=False)
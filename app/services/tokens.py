@@ -0,0 +1,14 @@
+from functools import lru_cache
+
+import tiktoken
+
+TOKEN_MODEL = "gpt-4o-mini"
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    return tiktoken.encoding_for_model(TOKEN_MODEL)
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode_ordinary(text))
@@ -0,0 +1,147 @@
+"""
+Client for fetching transcripts from YouTube.
+
+All fetches share one requests.Session with a keep-alive connection pool and explicit
+timeouts. Transient failures (connection errors, timeouts, 429 and 5xx responses) are
+retried with jittered exponential backoff, every attempt waits on a process-wide rate
+limiter, and a circuit breaker fails fast while YouTube keeps failing or blocking us.
+
+Videos that simply have no transcript (disabled, unavailable, ...) return None like
+before; upstream trouble raises TranscriptFetchError so callers can tell "no transcript"
+from "try again later".
+
+Set YT_BASE_URL to point the client at a local stand-in server instead of youtube.com.
+"""
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from youtube_transcript_api import YouTubeTranscriptApi
+from youtube_transcript_api._errors import (AgeRestricted, InvalidVideoId, NoTranscriptFound, TranscriptsDisabled,
+                                            VideoUnavailable, VideoUnplayable, YouTubeRequestFailed)
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.metrics import Counter
+from app.services.rate_limiter import TokenBucket
+
+YOUTUBE_URL = "https://www.youtube.com"
+YT_BASE_URL = os.getenv("YT_BASE_URL", YOUTUBE_URL)
+YT_CONNECT_TIMEOUT_SECONDS = float(os.getenv("YT_CONNECT_TIMEOUT_SECONDS", "3.05"))
+YT_READ_TIMEOUT_SECONDS = float(os.getenv("YT_READ_TIMEOUT_SECONDS", "10"))
+YT_POOL_SIZE = int(os.getenv("YT_POOL_SIZE", "16"))
+YT_MAX_RETRIES = int(os.getenv("YT_MAX_RETRIES", "3"))
+YT_BACKOFF_BASE_SECONDS = float(os.getenv("YT_BACKOFF_BASE_SECONDS", "0.5"))
+YT_BACKOFF_MAX_SECONDS = float(os.getenv("YT_BACKOFF_MAX_SECONDS", "8"))
+YT_REQUESTS_PER_SECOND = float(os.getenv("YT_REQUESTS_PER_SECOND", "5"))
+YT_RATE_LIMIT_BURST = float(os.getenv("YT_RATE_LIMIT_BURST", "10"))
+YT_RATE_LIMIT_WAIT_SECONDS = 10  # Longest a fetch queues on the rate limiter before giving up
+YT_BREAKER_FAILURES = int(os.getenv("YT_BREAKER_FAILURES", "5"))
+YT_BREAKER_RESET_SECONDS = float(os.getenv("YT_BREAKER_RESET_SECONDS", "30"))
+
+# The video has no usable transcript; YouTube itself answered fine
+NO_TRANSCRIPT_ERRORS = (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable, VideoUnplayable,
+                        InvalidVideoId, AgeRestricted)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+YOUTUBE_FETCHES = Counter("yt_youtube_fetch_total", "Transcript fetches from YouTube by outcome", ["result"])
+YOUTUBE_RETRIES = Counter("yt_youtube_retries_total", "Retried YouTube transcript fetch attempts")
+
+
+class TranscriptFetchError(Exception):
+    """YouTube could not be reached or refused us; worth retrying later."""
+
+
+class PooledSession(requests.Session):
+    """requests.Session with a sized connection pool, default timeouts and an optional base URL."""
+
+    def __init__(self, base_url: str = YT_BASE_URL, pool_size: int = YT_POOL_SIZE,
+                 timeout=(YT_CONNECT_TIMEOUT_SECONDS, YT_READ_TIMEOUT_SECONDS)):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        # Retries are done by TranscriptFetcher, with backoff and the breaker in the loop
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        if self.base_url != YOUTUBE_URL and url.startswith(YOUTUBE_URL):
+            url = self.base_url + url[len(YOUTUBE_URL):]
+        return super().request(method, url, *args, **kwargs)
+
+
+class TranscriptFetcher:
+    def __init__(self, session: Optional[requests.Session] = None, rate_limiter: Optional[TokenBucket] = None,
+                 breaker: Optional[CircuitBreaker] = None, max_retries: int = YT_MAX_RETRIES,
+                 backoff_base: float = YT_BACKOFF_BASE_SECONDS, backoff_max: float = YT_BACKOFF_MAX_SECONDS):
+        self.session = session or PooledSession()
+        self.api = YouTubeTranscriptApi(http_client=self.session)
+        self.rate_limiter = rate_limiter or TokenBucket(YT_REQUESTS_PER_SECOND, YT_RATE_LIMIT_BURST)
+        self.breaker = breaker or CircuitBreaker("youtube", failure_threshold=YT_BREAKER_FAILURES,
+                                                 reset_timeout=YT_BREAKER_RESET_SECONDS)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def fetch(self, video_id: str, languages=("en",)) -> Optional[List[Dict]]:
+        """Transcript segments ([{"text", "start", "duration"}, ...]), or None if the video has none."""
+        for attempt in range(self.max_retries + 1):
+            # Rate limit first: allow() may hand out the half-open probe, which must then call YouTube
+            if not self.rate_limiter.acquire(timeout=YT_RATE_LIMIT_WAIT_SECONDS):
+                YOUTUBE_FETCHES.inc(result="rate_limited")
+                raise TranscriptFetchError("too many transcript fetches in progress, rate limit reached")
+            if not self.breaker.allow():
+                YOUTUBE_FETCHES.inc(result="circuit_open")
+                raise TranscriptFetchError("YouTube is failing, not calling it for now (circuit open)")
+            try:
+                transcript = self.api.fetch(video_id, languages=languages)
+            except NO_TRANSCRIPT_ERRORS as e:
+                self.breaker.record_success()
+                YOUTUBE_FETCHES.inc(result="no_transcript")
+                print(f"[Fetcher] No transcript for {video_id}: {type(e).__name__}")
+                return None
+            except Exception as e:
+                self.breaker.record_failure()
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    YOUTUBE_FETCHES.inc(result="failed")
+                    raise TranscriptFetchError(f"{type(e).__name__}: {getattr(e, 'cause', e)}") from e
+                YOUTUBE_RETRIES.inc()
+                print(f"[Fetcher] Attempt {attempt + 1} for {video_id} failed ({type(e).__name__}), "
+                      f"retrying in {delay:.2f}s")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                YOUTUBE_FETCHES.inc(result="success")
+                return transcript.to_raw_data()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if `error` isn't worth retrying."""
+        if attempt >= self.max_retries:
+            return None
+        retry_after = 0.0
+        if isinstance(error, YouTubeRequestFailed):
+            # The library keeps only the message; the HTTPError it wraps is the context
+            response = getattr(error.__context__, "response", None)
+            if response is None or response.status_code not in RETRYABLE_STATUS_CODES:
+                return None
+            try:
+                retry_after = float(response.headers.get("Retry-After", 0))
+            except ValueError:
+                pass
+        elif not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            # Blocked, unparsable pages and the like won't go away on a quick retry
+            return None
+        # Full jitter spreads out the retries of fetches that failed together
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return min(self.backoff_max, max(backoff, retry_after))
+
+    def stats(self) -> dict:
+        return {**self.breaker.stats(), "open": int(self.breaker.state != CircuitBreaker.CLOSED)}
+
+
+transcript_fetcher = TranscriptFetcher()
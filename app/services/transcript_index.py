@@ -0,0 +1,197 @@
+import io
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.services.tokens import get_encoding
+from app.services.transcript_store import get_transcript_store
+
+CHUNK_TOKENS = 400         # Target size of a retrieval chunk
+CHUNK_OVERLAP_TOKENS = 50  # Carried over between neighbouring chunks so answers aren't split
+OUTLINE_SECTIONS = 12      # Max lines in the outline returned with search results
+OUTLINE_KEYWORDS = 5
+INDEX_ARTIFACT = "bm25"
+INDEX_VERSION = 1
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TERM_RE = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being but by can could
+did do does doing don't down for from had has have having he her here hers him his how i i'm if in into
+is it it's its just know like me more most my no not now of off on once only or other our out over
+really right say so some such than that that's the their them then there these they this those through
+to too um uh up very was we were what when where which while who why will with would yeah you your
+""".split())
+
+
+def tokenize_terms(text: str) -> list[str]:
+    return [t for t in TERM_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_transcript(text: str, chunk_tokens: int = CHUNK_TOKENS,
+                     overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[str]:
+    """Split a transcript into word-aligned chunks of roughly `chunk_tokens` tokens."""
+    words = text.split()
+    if not words:
+        return []
+    token_counts = [len(t) for t in get_encoding().encode_ordinary_batch([" " + w for w in words])]
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        end, used = start, 0
+        while end < len(words) and (used + token_counts[end] <= chunk_tokens or end == start):
+            used += token_counts[end]
+            end += 1
+        chunks.append(" ".join(words[start:end]))
+        if end >= len(words):
+            break
+
+        # Step back over roughly `overlap_tokens` worth of words for the next chunk
+        back, overlap = end, 0
+        while back > start + 1 and overlap + token_counts[back - 1] <= overlap_tokens:
+            back -= 1
+            overlap += token_counts[back]
+        start = back
+    return chunks
+
+
+class TranscriptIndex:
+    """
+    Lexical BM25 index over the chunks of one transcript.
+
+    Term frequencies are held in a dense (chunks x vocabulary) matrix so a query is scored
+    against every chunk with a handful of NumPy operations.
+    """
+
+    def __init__(self, chunks: list[str], vocabulary: dict[str, int], term_freqs: np.ndarray):
+        self.chunks = chunks
+        self.vocabulary = vocabulary
+        self.term_freqs = term_freqs
+        self.chunk_lengths = term_freqs.sum(axis=1, dtype=np.float32)
+        self.avg_chunk_length = float(self.chunk_lengths.mean()) if len(chunks) else 0.0
+
+        doc_freqs = (term_freqs > 0).sum(axis=0)
+        n = len(chunks)
+        self.idf = np.log1p((n - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+    @classmethod
+    def build(cls, text: str) -> "TranscriptIndex":
+        chunks = chunk_transcript(text)
+        chunk_terms = [tokenize_terms(chunk) for chunk in chunks]
+
+        vocabulary: dict[str, int] = {}
+        for terms in chunk_terms:
+            for term in terms:
+                vocabulary.setdefault(term, len(vocabulary))
+
+        term_freqs = np.zeros((len(chunks), len(vocabulary)), dtype=np.uint16)
+        for row, terms in enumerate(chunk_terms):
+            if not terms:
+                continue
+            ids, counts = np.unique([vocabulary[t] for t in terms], return_counts=True)
+            term_freqs[row, ids] = np.minimum(counts, np.iinfo(np.uint16).max)
+        return cls(chunks, vocabulary, term_freqs)
+
+    def scores(self, query: str) -> np.ndarray:
+        term_ids = [self.vocabulary[t] for t in set(tokenize_terms(query)) if t in self.vocabulary]
+        if not term_ids or not self.chunks:
+            return np.zeros(len(self.chunks), dtype=np.float32)
+
+        tf = self.term_freqs[:, term_ids].astype(np.float32)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_lengths / max(self.avg_chunk_length, 1.0))
+        weighted = tf * (BM25_K1 + 1) / (tf + length_norm[:, None])
+        return weighted @ self.idf[term_ids]
+
+    def search(self, query: str, top_k: int = 4) -> list[tuple[int, float, str]]:
+        """Top-k (chunk index, score, text) for the query, returned in transcript order."""
+        scores = self.scores(query)
+        if not scores.any():
+            return []
+        k = min(top_k, len(self.chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = [i for i in top if scores[i] > 0]
+        return [(int(i), round(float(scores[i]), 3), self.chunks[i]) for i in sorted(top)]
+
+    def outline(self, sections: int = OUTLINE_SECTIONS) -> list[str]:
+        """Short outline: the most distinctive keywords of evenly sized transcript sections."""
+        if not self.chunks:
+            return []
+        terms = np.empty(len(self.vocabulary), dtype=object)
+        for term, i in self.vocabulary.items():
+            terms[i] = term
+
+        lines = []
+        groups = np.array_split(np.arange(len(self.chunks)), min(sections, len(self.chunks)))
+        for part, rows in enumerate(groups, start=1):
+            weights = self.term_freqs[rows].sum(axis=0, dtype=np.float32) * self.idf
+            best = np.argsort(-weights)[:OUTLINE_KEYWORDS]
+            keywords = ", ".join(terms[i] for i in best if weights[i] > 0)
+            lines.append(f"Part {part} (chunks {rows[0]}-{rows[-1]}): {keywords}")
+        return lines
+
+    def to_bytes(self) -> bytes:
+        encoded_chunks = [c.encode("utf-8") for c in self.chunks]
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        buffer = io.BytesIO()
+        np.savez(buffer,
+                 version=np.array(INDEX_VERSION),
+                 chunk_text=np.frombuffer(b"".join(encoded_chunks), dtype=np.uint8),
+                 chunk_offsets=np.cumsum([0] + [len(c) for c in encoded_chunks]),
+                 vocabulary=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                 term_freqs=self.term_freqs)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["TranscriptIndex"]:
+        arrays = np.load(io.BytesIO(data))
+        if int(arrays["version"]) != INDEX_VERSION:
+            return None
+        text, offsets = arrays["chunk_text"].tobytes(), arrays["chunk_offsets"]
+        chunks = [text[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+        terms = arrays["vocabulary"].tobytes().decode("utf-8")
+        vocabulary = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+        return cls(chunks, vocabulary, arrays["term_freqs"])
+
+
+# Recently used indexes stay deserialized in memory
+_index_cache: OrderedDict[str, TranscriptIndex] = OrderedDict()
+_index_cache_lock = threading.Lock()
+INDEX_CACHE_SIZE = 32
+
+
+def build_transcript_index(video_id: str, transcript_text: str) -> TranscriptIndex:
+    """Build the index for a freshly fetched transcript and persist it in the transcript store."""
+    index = TranscriptIndex.build(transcript_text)
+    get_transcript_store().put_artifact(video_id, INDEX_ARTIFACT, index.to_bytes())
+    _remember(video_id, index)
+    return index
+
+
+def get_transcript_index(video_id: str, transcript_text: str) -> TranscriptIndex:
+    """Return the index for a video, loading the persisted one or building it once."""
+    with _index_cache_lock:
+        index = _index_cache.get(video_id)
+        if index is not None:
+            _index_cache.move_to_end(video_id)
+            return index
+
+    data = get_transcript_store().get_artifact(video_id, INDEX_ARTIFACT)
+    index = TranscriptIndex.from_bytes(data) if data else None
+    if index is None:
+        return build_transcript_index(video_id, transcript_text)
+    _remember(video_id, index)
+    return index
+
+
+def _remember(video_id: str, index: TranscriptIndex):
+    with _index_cache_lock:
+        _index_cache[video_id] = index
+        _index_cache.move_to_end(video_id)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
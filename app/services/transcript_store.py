@@ -0,0 +1,352 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+import zstandard
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Get absolute path to the root directory and set path to transcripts inside app/
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))           # /path/to/project_root/app/services
+TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "..", "transcripts")  # /path/to/project_root/app/transcripts
+
+TRANSCRIPT_STORE_QUOTA_MB = int(os.getenv("TRANSCRIPT_STORE_QUOTA_MB", "1024"))
+TRANSCRIPT_CACHE_ITEMS = int(os.getenv("TRANSCRIPT_CACHE_ITEMS", "128"))
+TRANSCRIPT_CACHE_MB = int(os.getenv("TRANSCRIPT_CACHE_MB", "64"))
+ZSTD_LEVEL = 6
+
+
+class TranscriptStore(ABC):
+    """Storage backend for fetched transcripts, keyed by YouTube video id."""
+
+    @abstractmethod
+    def get(self, video_id: str) -> Optional[str]:
+        """Return the transcript text, or None if it is not stored."""
+
+    @abstractmethod
+    def put(self, video_id: str, transcript_text: str) -> None:
+        """Store (or replace) the transcript for a video."""
+
+    @abstractmethod
+    def delete(self, video_id: str) -> None:
+        """Remove a transcript if present."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Return size and hit/miss counters for monitoring."""
+
+    def exists(self, video_id: str) -> bool:
+        return self.get(video_id) is not None
+
+    def get_artifact(self, video_id: str, name: str) -> Optional[bytes]:
+        """Return a derived artifact (e.g. a search index) stored next to the transcript."""
+        return None
+
+    def put_artifact(self, video_id: str, name: str, data: bytes) -> None:
+        """Store a derived artifact; backends without artifact support simply drop it."""
+
+
+class MemoryLRU:
+    """Small in-process LRU bounded by both item count and total text size."""
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: str):
+        self.pop(key)
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        self._items[key] = value
+        self.total_bytes += size
+        while len(self._items) > self.max_items or self.total_bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.total_bytes -= len(evicted)
+
+    def pop(self, key: str):
+        value = self._items.pop(key, None)
+        if value is not None:
+            self.total_bytes -= len(value)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskTranscriptStore(TranscriptStore):
+    """
+    Transcripts stored as zstandard-compressed blobs under `directory/blobs`, tracked by a
+    SQLite index of (video_id, size, raw_size, fetched_at, last_access).
+
+    Hot transcripts are served from an in-memory LRU. When the compressed bytes on disk
+    exceed the quota, the least recently accessed transcripts are evicted together with
+    their artifacts. Legacy `{video_id}.txt` files from the old layout are imported on
+    first access.
+    """
+
+    def __init__(self,
+                 directory: str = TRANSCRIPTS_DIR,
+                 quota_bytes: int = TRANSCRIPT_STORE_QUOTA_MB * 1024 * 1024,
+                 memory_items: int = TRANSCRIPT_CACHE_ITEMS,
+                 memory_bytes: int = TRANSCRIPT_CACHE_MB * 1024 * 1024,
+                 compression_level: int = ZSTD_LEVEL):
+        self.directory = os.path.abspath(directory)
+        self.blob_dir = os.path.join(self.directory, "blobs")
+        self.quota_bytes = quota_bytes
+        self.compression_level = compression_level
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._memory = MemoryLRU(memory_items, memory_bytes)
+        self._pending_touches: dict[str, float] = {}
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"),
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_transcripts_last_access ON transcripts (last_access)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                video_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (video_id, name)
+            )""")
+        (self._disk_bytes,) = self._db.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM transcripts) + "
+            "(SELECT COALESCE(SUM(size), 0) FROM artifacts)").fetchone()
+
+    def _blob_path(self, video_id: str) -> str:
+        # Shard by prefix so no single directory holds tens of thousands of files
+        return os.path.join(self.blob_dir, video_id[:2], f"{video_id}.zst")
+
+    def _artifact_path(self, video_id: str, name: str) -> str:
+        return os.path.join(self.blob_dir, video_id[:2], f"{video_id}.{name}.zst")
+
+    def _legacy_path(self, video_id: str) -> str:
+        return os.path.join(self.directory, f"{video_id}.txt")
+
+    def get(self, video_id: str) -> Optional[str]:
+        with self._lock:
+            text = self._memory.get(video_id)
+            if text is not None:
+                self._counters["memory_hits"] += 1
+                self._touch(video_id)
+                return text
+            row = self._db.execute("SELECT 1 FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+
+        if row is None:
+            return self._import_legacy(video_id)
+
+        try:
+            with open(self._blob_path(video_id), "rb") as f:
+                text = zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+        except (OSError, zstandard.ZstdError) as e:
+            print(f"[TranscriptStore] Dropping unreadable blob for {video_id}: {e}")
+            self.delete(video_id)
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self._counters["disk_hits"] += 1
+            self._memory.put(video_id, text)
+            self._touch(video_id)
+        return text
+
+    def exists(self, video_id: str) -> bool:
+        # Index lookup only; unlike get() nothing is read or decompressed
+        with self._lock:
+            if self._memory.get(video_id) is not None:
+                return True
+            return self._db.execute("SELECT 1 FROM transcripts WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def put(self, video_id: str, transcript_text: str) -> None:
+        raw = transcript_text.encode("utf-8")
+        blob = zstandard.ZstdCompressor(level=self.compression_level).compress(raw)
+        self._write_blob(self._blob_path(video_id), blob)
+
+        now = time.time()
+        with self._lock:
+            # Artifacts were derived from the previous text
+            self._delete_artifacts(video_id)
+            self._disk_bytes -= self._indexed_size(video_id)
+            self._disk_bytes += len(blob)
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, size, raw_size, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (video_id, len(blob), len(raw), now, now))
+            self._memory.put(video_id, transcript_text)
+            self._counters["writes"] += 1
+            self._evict_over_quota()
+
+    def delete(self, video_id: str) -> None:
+        with self._lock:
+            self._memory.pop(video_id)
+            self._pending_touches.pop(video_id, None)
+            self._disk_bytes -= self._indexed_size(video_id)
+            self._db.execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,))
+            self._delete_artifacts(video_id)
+        self._remove_file(self._blob_path(video_id))
+
+    def get_artifact(self, video_id: str, name: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM artifacts WHERE video_id = ? AND name = ?",
+                                   (video_id, name)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._artifact_path(video_id, name), "rb") as f:
+                return zstandard.ZstdDecompressor().decompress(f.read())
+        except (OSError, zstandard.ZstdError) as e:
+            print(f"[TranscriptStore] Unreadable artifact {name} for {video_id}: {e}")
+            return None
+
+    def put_artifact(self, video_id: str, name: str, data: bytes) -> None:
+        blob = zstandard.ZstdCompressor(level=self.compression_level).compress(data)
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM transcripts WHERE video_id = ?", (video_id,)).fetchone() is None:
+                return  # Transcript was evicted meanwhile; don't leave orphaned artifacts
+            self._write_blob(self._artifact_path(video_id, name), blob)
+            old = self._db.execute("SELECT size FROM artifacts WHERE video_id = ? AND name = ?",
+                                   (video_id, name)).fetchone()
+            self._disk_bytes += len(blob) - (old[0] if old else 0)
+            self._db.execute("INSERT OR REPLACE INTO artifacts (video_id, name, size) VALUES (?, ?, ?)",
+                             (video_id, name, len(blob)))
+            self._evict_over_quota()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._flush_touches()
+            entries, disk_bytes, raw_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM transcripts").fetchone()
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            return {
+                "entries": entries,
+                "disk_bytes": disk_bytes,
+                "raw_bytes": raw_bytes,
+                "compression_ratio": round(raw_bytes / disk_bytes, 2) if disk_bytes else None,
+                "artifact_bytes": self._disk_bytes - disk_bytes,
+                "quota_bytes": self.quota_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory.total_bytes,
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+                **self._counters,
+            }
+
+    @staticmethod
+    def _write_blob(path: str, blob: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so readers never see a partially written blob
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _delete_artifacts(self, video_id: str):
+        rows = self._db.execute("SELECT name, size FROM artifacts WHERE video_id = ?", (video_id,)).fetchall()
+        if not rows:
+            return
+        self._db.execute("DELETE FROM artifacts WHERE video_id = ?", (video_id,))
+        for name, size in rows:
+            self._disk_bytes -= size
+            self._remove_file(self._artifact_path(video_id, name))
+
+    def _indexed_size(self, video_id: str) -> int:
+        row = self._db.execute("SELECT size FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _touch(self, video_id: str):
+        # last_access updates are batched to keep index writes off the hot read path
+        self._pending_touches[video_id] = time.time()
+        if len(self._pending_touches) >= 64:
+            self._flush_touches()
+
+    def _flush_touches(self):
+        if self._pending_touches:
+            self._db.executemany("UPDATE transcripts SET last_access = ? WHERE video_id = ?",
+                                 [(ts, vid) for vid, ts in self._pending_touches.items()])
+            self._pending_touches.clear()
+
+    def _evict_over_quota(self):
+        if self._disk_bytes <= self.quota_bytes:
+            return
+
+        self._flush_touches()
+        for video_id, size in self._db.execute(
+                "SELECT video_id, size FROM transcripts ORDER BY last_access ASC").fetchall():
+            if self._disk_bytes <= self.quota_bytes:
+                break
+            self.delete(video_id)
+            self._counters["evictions"] += 1
+            print(f"[TranscriptStore] Evicted {video_id} ({size} bytes)")
+
+    def _import_legacy(self, video_id: str) -> Optional[str]:
+        legacy_path = self._legacy_path(video_id)
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        self.put(video_id, text)
+        try:
+            os.remove(legacy_path)
+        except FileNotFoundError:
+            pass  # imported concurrently by another request
+        print(f"[TranscriptStore] Imported legacy transcript {legacy_path}")
+        with self._lock:
+            self._counters["disk_hits"] += 1
+        return text
+
+
+_store_override: Optional[TranscriptStore] = None
+
+
+@lru_cache(maxsize=None)
+def _default_store() -> TranscriptStore:
+    return DiskTranscriptStore()
+
+
+def get_transcript_store() -> TranscriptStore:
+    """Process-wide transcript store (DiskTranscriptStore unless another backend is plugged in)."""
+    return _store_override or _default_store()
+
+
+def set_transcript_store(store: Optional[TranscriptStore]):
+    """Plug in a different TranscriptStore backend; pass None to restore the default."""
+    global _store_override
+    _store_override = store
@@ -1,15 +1,39 @@
 from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field
-from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
-from typing import Optional
+from typing import Callable, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import contextvars
 import os
-from app.models.tool_model import TranscriptErrorResponse, TranscriptSuccessResponse
-
-# Get absolute path to the root directory and set path to transcripts inside app/
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))           # /path/to/project_root/app
-TRANSCRIPTS_DIR = os.path.join(BASE_DIR, "..", "transcripts")  # /path/to/project_root/app/transcripts
+import re
+import threading
+import time
+from redis.exceptions import RedisError
+from app.models.tool_model import (TranscriptErrorResponse, TranscriptSuccessResponse,
+                                   TranscriptChunk, TranscriptChunksResponse, TranscriptWindowResponse,
+                                   TranscriptCondensedResponse, VideoTranscriptResult, MultiTranscriptResponse)
+from app.services.metrics import TRANSCRIPT_BYTES, timed
+from app.services.prompt_budget import truncate_middle
+from app.services.summarizer import CONDENSE_ABOVE_TOKENS, transcript_summarizer
+from app.services.tokens import count_tokens
+from app.services.transcript_fetcher import TranscriptFetchError, transcript_fetcher
+from app.services.transcript_store import TranscriptStore, get_transcript_store
+from app.services.transcript_index import build_transcript_index, get_transcript_index
+from app.services.timed_transcript import (TimedTranscript, format_timestamp, load_timed_transcript,
+                                           parse_timestamp, store_timed_transcript)
+from app.database.redis_setup import redis_client, redis_breaker
 
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_NEGATIVE_TTL_SECONDS", "60"))
+FETCH_LOCK_TTL_SECONDS = 60      # Redis lock expiry, bounds a crashed worker's hold
+FETCH_WAIT_TIMEOUT_SECONDS = 45  # How long followers wait on another caller's fetch
+WINDOW_DEFAULT_SECONDS = 60      # Either side of `start` when no end is given
+WINDOW_MAX_TOKENS = int(os.getenv("TRANSCRIPT_WINDOW_MAX_TOKENS", "3000"))
+MULTI_VIDEO_MAX_URLS = 5
+MULTI_VIDEO_CONCURRENCY = int(os.getenv("MULTI_VIDEO_CONCURRENCY", "5"))
+# Shared by all the videos of one multi-video call
+MULTI_VIDEO_BUDGET_TOKENS = int(os.getenv("MULTI_VIDEO_BUDGET_TOKENS", "24000"))
 
 
 # Schema for LangChain tool
@@ -17,7 +41,39 @@ class YouTubeTranscriptArgs(BaseModel):
     youtube_url: str = Field(..., description="A YouTube video URL (e.g., https://youtu.be/xyz or https://youtube.com/watch?v=xyz)")
 
 
+class YouTubeTranscriptSearchArgs(BaseModel):
+    youtube_url: str = Field(..., description="A YouTube video URL (e.g., https://youtu.be/xyz or https://youtube.com/watch?v=xyz)")
+    query: str = Field(..., description="What to look for in the transcript, in keywords (e.g. 'pricing of the pro plan')")
+    top_k: int = Field(4, ge=1, le=10, description="How many transcript excerpts to return")
+
+
+class YouTubeMultiTranscriptArgs(BaseModel):
+    youtube_urls: List[str] = Field(..., min_length=1, max_length=MULTI_VIDEO_MAX_URLS,
+                                    description="The YouTube video URLs, all of them in one call")
+
+
+class YouTubeTranscriptWindowArgs(BaseModel):
+    youtube_url: str = Field(..., description="A YouTube video URL (e.g., https://youtu.be/xyz or https://youtube.com/watch?v=xyz)")
+    start: str = Field(..., description="Start of the time range, as mm:ss, hh:mm:ss or seconds (e.g. '14:30')")
+    end: Optional[str] = Field(None, description="End of the time range in the same format; omit to get about "
+                                                 "a minute either side of `start`")
+
+
 # Utility: Extract YouTube video ID
+# YouTube links in free text, with or without a scheme ("youtu.be/ID", "www.youtube.com/watch?v=ID")
+YOUTUBE_URL_PATTERN = re.compile(r"(?:https?://)?(?:[\w-]+\.)*(?:youtube\.com|youtu\.be)/\S+", re.IGNORECASE)
+
+
+def find_video_ids(text: str) -> List[str]:
+    """YouTube video ids linked in a message, in order, without duplicates."""
+    video_ids = []
+    for url in YOUTUBE_URL_PATTERN.findall(text):
+        video_id = extract_video_id(url.rstrip(".,!?)"))
+        if video_id and video_id not in video_ids:
+            video_ids.append(video_id)
+    return video_ids
+
+
 def extract_video_id(url: str) -> Optional[str]:
     if "youtu.be" in url:
         return url.split("/")[-1].split("?")[0]
@@ -27,66 +83,413 @@ def extract_video_id(url: str) -> Optional[str]:
     return None
 
 
-# Utility: Fetch transcript as plain text
-def get_plain_transcript(video_id: str):
-    try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        print(transcript)
-        return " ".join([entry['text'] for entry in transcript])
-    except Exception as e:
-        print(f"[Tool] Error fetching transcript for {video_id}]: {e}")
-        return None
+# Utility: Fetch transcript segments ([{"text", "start", "duration"}, ...])
+# None when the video has no transcript; raises TranscriptFetchError when YouTube is failing
+def get_transcript_segments(video_id: str):
+    with timed("transcript_fetch"):
+        return transcript_fetcher.fetch(video_id)
 
 
-# Utility: Save transcript to transcripts/{video_id}.txt
-def save_transcript_to_file(video_id: str, transcript_text: str, directory: str = TRANSCRIPTS_DIR):
+# Utility: Save transcript into the compressed transcript store
+def save_transcript_to_file(video_id: str, transcript_text: str, store: Optional[TranscriptStore] = None):
     try:
-        os.makedirs(directory, exist_ok=True)  # Create transcripts/ dir if not exists
-        file_path = os.path.join(directory, f"{video_id}.txt")
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(transcript_text)
-            print(f"[Tool] Transcript created")
+        (store or get_transcript_store()).put(video_id, transcript_text)
+        print(f"[Tool] Transcript created")
         return True
     except Exception as e:
         print(f"Error occurred while fetching transcripts from youtube: {e}")
         return False
 
 
+class TranscriptSingleFlight:
+    """
+    Collapses concurrent fetches of the same video into one upstream call.
+
+    Within a process, the first caller for a video_id becomes the leader and the others
+    wait on its Future. Across worker processes, leaders serialize on a Redis lock and
+    re-check the transcript store once they hold it, so only one process hits YouTube.
+    Videos without a transcript are remembered for a short time (locally and in Redis)
+    so repeated requests fail fast instead of retrying upstream. If Redis is unavailable
+    the in-process deduplication still applies.
+    """
+
+    def __init__(self, negative_ttl: int = NEGATIVE_CACHE_TTL_SECONDS, redis=redis_client):
+        self.negative_ttl = negative_ttl
+        self.redis = redis
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        self._negative: dict[str, float] = {}
+
+    def fetch(self, video_id: str, loader: Callable[[], Optional[str]]) -> Optional[str]:
+        with self._lock:
+            if self._negative.get(video_id, 0) > time.monotonic():
+                print(f"[Tool] Negative cache hit for {video_id}")
+                return None
+            future = self._in_flight.get(video_id)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[video_id] = future
+
+        if not is_leader:
+            print(f"[Tool] Waiting on in-flight fetch for {video_id}")
+            try:
+                return future.result(timeout=FETCH_WAIT_TIMEOUT_SECONDS)
+            except TimeoutError:
+                # The tools report this like any other upstream trouble
+                raise TranscriptFetchError(f"timed out waiting for another fetch of {video_id}") from None
+
+        result = None
+        failed = False
+        try:
+            result = self._fetch_across_processes(video_id, loader)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            # Upstream trouble isn't remembered as "no transcript"; the next caller retries
+            failed = True
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(video_id, None)
+                if result is None and not failed:
+                    self._negative[video_id] = time.monotonic() + self.negative_ttl
+
+    def _fetch_across_processes(self, video_id: str, loader: Callable[[], Optional[str]]) -> Optional[str]:
+        negative_key = f"yt:transcript:missing:{video_id}"
+        if not redis_breaker.allow():
+            return loader()
+        try:
+            if self.redis.exists(negative_key):
+                print(f"[Tool] Shared negative cache hit for {video_id}")
+                return None
+            lock = self.redis.lock(f"yt:transcript:lock:{video_id}",
+                                   timeout=FETCH_LOCK_TTL_SECONDS,
+                                   blocking_timeout=FETCH_WAIT_TIMEOUT_SECONDS)
+            acquired = lock.acquire()
+        except RedisError as e:
+            redis_breaker.record_failure()
+            print(f"[Tool] Redis unavailable for fetch lock, deduplicating in-process only: {e}")
+            return loader()
+        redis_breaker.record_success()
+
+        try:
+            # Another worker may have stored it while we waited on the lock
+            result = loader()
+            if result is None:
+                self.redis.set(negative_key, 1, ex=self.negative_ttl)
+            return result
+        except RedisError as e:
+            print(f"[Tool] Failed to record negative cache entry for {video_id}: {e}")
+            return result
+        finally:
+            if acquired:
+                try:
+                    lock.release()
+                except RedisError:
+                    pass  # Lock expired or Redis went away; expiry cleans it up
+
+
+transcript_single_flight = TranscriptSingleFlight()
+
+
+def _fetch_and_store(video_id: str) -> Optional[str]:
+    transcript_text = get_transcript_store().get(video_id)
+    if transcript_text is not None:
+        return transcript_text
+
+    segments = get_transcript_segments(video_id)
+    if not segments:
+        return None
+    timed_transcript = TimedTranscript.from_segments(segments)
+    transcript_text = timed_transcript.text
+    TRANSCRIPT_BYTES.inc(len(transcript_text), source="youtube")
+    if save_transcript_to_file(video_id, transcript_text):
+        # Derived artifacts go after the text: storing the text drops the old ones
+        try:
+            store_timed_transcript(video_id, timed_transcript)
+        except Exception as e:
+            # Time-range queries re-fetch the timing on first use instead
+            print(f"[Tool] Failed to store transcript timing for {video_id}: {e}")
+        try:
+            build_transcript_index(video_id, transcript_text)
+        except Exception as e:
+            # Search builds it lazily on first use instead
+            print(f"[Tool] Failed to index transcript for {video_id}: {e}")
+    # Not stored (disk full, store locked) is still a transcript: serve it uncached rather
+    # than return None, which the single-flight would remember as "no transcript"
+    return transcript_text
+
+
+def get_or_fetch_transcript(video_id: str) -> Optional[str]:
+    """Return the stored transcript, fetching it once (deduplicated) on a miss."""
+    with timed("transcript_store"):
+        transcript_text = get_transcript_store().get(video_id)
+    if transcript_text is not None:
+        print(f"[Tool] Transcript already exists for {video_id}")
+        TRANSCRIPT_BYTES.inc(len(transcript_text), source="store")
+        return transcript_text
+    return transcript_single_flight.fetch(video_id, lambda: _fetch_and_store(video_id))
+
+
+def get_timed_transcript(video_id: str) -> Optional[TimedTranscript]:
+    """Return the transcript with its timing, fetching it once on a miss."""
+    timed_transcript = load_timed_transcript(video_id)
+    if timed_transcript is not None:
+        return timed_transcript
+    if get_or_fetch_transcript(video_id) is None:
+        return None
+    timed_transcript = load_timed_transcript(video_id)
+    if timed_transcript is None:
+        # Stored before timing was kept: fetch the segments again, once
+        segments = get_transcript_segments(video_id)
+        if not segments:
+            return None
+        timed_transcript = TimedTranscript.from_segments(segments)
+        store_timed_transcript(video_id, timed_transcript)
+    return timed_transcript
+
+
+def _unreachable_response(video_id: str, error: TranscriptFetchError) -> TranscriptErrorResponse:
+    print(f"[Tool] YouTube unavailable for {video_id}: {error}")
+    return TranscriptErrorResponse(reason=f"YouTube is not responding right now: {error}", retryable=True,
+                                   next_action="Tell the user that YouTube is temporarily unavailable and to "
+                                               "try again in a minute")
+
+
 # LangChain tool wrapper
 @tool("youtube_transcript_saver",
       args_schema=YouTubeTranscriptArgs,
-      description="Fetch and save transcript of a YouTube video into transcripts/{video_id}.txt if not already saved.")
+      description="Fetch and save transcript of a YouTube video into the transcript store if not already saved.")
 def fetch_video_transcript(youtube_url: str):
     """
-    Tool to fetch and save YouTube video transcript as a plain .txt file.
+    Tool to fetch and save YouTube video transcript in the compressed transcript store.
 
     Args:
         youtube_url (str): The full YouTube video URL (short or long form)
 
     Returns:
-        str: Status message indicating whether it was saved, skipped, or error
+        TranscriptSuccessResponse with the transcript, TranscriptCondensedResponse with notes
+        covering it when it is too long to use whole, or TranscriptErrorResponse
     """
     video_id = extract_video_id(youtube_url)
     if not video_id:
         return TranscriptErrorResponse(reason="video id not present in the URL or invalid youtube video URL provided")
 
-    save_path = os.path.join(TRANSCRIPTS_DIR, f"{video_id}.txt")
-    transcript_created = False
-    if os.path.exists(save_path):
-        print()
-        with open(save_path, "r", encoding="utf-8") as f:
-            transcript_text = f.read()
-            print(f"[Tool] Transcript already exists at {save_path}")
-        transcript_created = True
-    else:
-        transcript_text = get_plain_transcript(video_id)
-        if transcript_text:
-            transcript_created = save_transcript_to_file(video_id, transcript_text)
+    try:
+        transcript_text = get_or_fetch_transcript(video_id)
+    except TranscriptFetchError as e:
+        return _unreachable_response(video_id, e)
 
-    if not transcript_created:
+    if transcript_text is None:
         return TranscriptErrorResponse(reason="Some error occurred while fetching the transcript from youtube API.")
+
+    transcript_tokens = count_tokens(transcript_text)
+    if transcript_tokens > CONDENSE_ABOVE_TOKENS:
+        try:
+            notes = transcript_summarizer.condense(video_id, transcript_text)
+            return TranscriptCondensedResponse(transcript_text=notes, transcript_tokens=transcript_tokens)
+        except Exception as e:
+            print(f"[Tool] Failed to condense transcript for {video_id}, returning it whole: {e}")
     return TranscriptSuccessResponse(transcript_text=transcript_text)
 
 
+@tool("youtube_transcript_search",
+      args_schema=YouTubeTranscriptSearchArgs,
+      description="Search a YouTube video's transcript and return only the excerpts relevant to the query, "
+                  "plus a short outline of the whole video. Prefer this over youtube_transcript_saver for "
+                  "specific questions and follow-ups about a video.")
+def search_video_transcript(youtube_url: str, query: str, top_k: int = 4):
+    """
+    Tool to answer questions from the most relevant transcript chunks instead of the full text.
+
+    Args:
+        youtube_url (str): The full YouTube video URL (short or long form)
+        query (str): Keywords describing what to look for
+        top_k (int): Number of excerpts to return
+
+    Returns:
+        TranscriptChunksResponse with the outline and top-k chunks, or TranscriptErrorResponse
+    """
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return TranscriptErrorResponse(reason="video id not present in the URL or invalid youtube video URL provided")
+
+    try:
+        transcript_text = get_or_fetch_transcript(video_id)
+    except TranscriptFetchError as e:
+        return _unreachable_response(video_id, e)
+    if transcript_text is None:
+        return TranscriptErrorResponse(reason="Some error occurred while fetching the transcript from youtube API.")
+
+    with timed("transcript_search"):
+        index = get_transcript_index(video_id, transcript_text)
+        chunks = [TranscriptChunk(index=i, score=score, text=text) for i, score, text in index.search(query, top_k)]
+    return TranscriptChunksResponse(outline=index.outline(), chunks=chunks, total_chunks=len(index.chunks))
+
+
+
+@tool("youtube_transcript_window",
+      args_schema=YouTubeTranscriptWindowArgs,
+      description="Return the part of a YouTube video's transcript spoken in a time range, with timestamps. "
+                  "Use this for questions about a moment or a stretch of the video, like 'what does he say "
+                  "around 14:30?' or 'summarize minutes 10-20'.")
+def window_video_transcript(youtube_url: str, start: str, end: Optional[str] = None):
+    """
+    Tool to read only the transcript segments that overlap a time range.
+
+    Args:
+        youtube_url (str): The full YouTube video URL (short or long form)
+        start (str): Start of the range (mm:ss, hh:mm:ss or seconds)
+        end (str): End of the range; defaults to WINDOW_DEFAULT_SECONDS either side of start
+
+    Returns:
+        TranscriptWindowResponse with timestamped lines, or TranscriptErrorResponse
+    """
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return TranscriptErrorResponse(reason="video id not present in the URL or invalid youtube video URL provided")
+    try:
+        start_s = parse_timestamp(start)
+        end_s = parse_timestamp(end) if end else None
+    except ValueError as e:
+        return TranscriptErrorResponse(reason=str(e), next_action="Ask the user for the time range as mm:ss")
+    if end_s is None:
+        start_s, end_s = max(start_s - WINDOW_DEFAULT_SECONDS, 0), start_s + WINDOW_DEFAULT_SECONDS
+    if end_s <= start_s:
+        return TranscriptErrorResponse(reason="the end of the time range is before its start",
+                                       next_action="Ask the user for the time range as mm:ss")
+
+    try:
+        timed_transcript = get_timed_transcript(video_id)
+    except TranscriptFetchError as e:
+        return _unreachable_response(video_id, e)
+    if timed_transcript is None:
+        return TranscriptErrorResponse(reason="Some error occurred while fetching the transcript from youtube API.")
+
+    with timed("transcript_window"):
+        i, j = timed_transcript.window(start_s, end_s)
+        excerpt, stop, truncated = timed_transcript.excerpt(i, j, max_tokens=WINDOW_MAX_TOKENS)
+    TRANSCRIPT_BYTES.inc(len(excerpt), source="window")
+    if i == j:
+        window = f"{format_timestamp(start_s)}-{format_timestamp(end_s)}"
+    else:
+        window = f"{format_timestamp(timed_transcript.starts[i])}-{format_timestamp(timed_transcript.ends[stop - 1])}"
+    return TranscriptWindowResponse(window=window, video_duration=format_timestamp(timed_transcript.duration),
+                                    excerpt=excerpt, truncated=truncated)
+
+
+
+# Multi-video fetch: bounded pool shared by the sync and async tool entry points
+_multi_video_executor = ThreadPoolExecutor(max_workers=MULTI_VIDEO_CONCURRENCY, thread_name_prefix="multi-video")
+
+
+def _submit(fn, *args) -> Future:
+    # Runs in a copy of the caller's context so stage timings land in the request's
+    return _multi_video_executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _unique_videos(youtube_urls: List[str]) -> List[str]:
+    """URLs in order, without repeats of the same video."""
+    seen, unique = set(), []
+    for url in youtube_urls:
+        key = extract_video_id(url) or url
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+
+def _load_video(youtube_url: str) -> VideoTranscriptResult:
+    video_id = extract_video_id(youtube_url)
+    if not video_id:
+        return VideoTranscriptResult(youtube_url=youtube_url, status="error",
+                                     reason="video id not present in the URL or invalid youtube video URL provided")
+    try:
+        transcript_text = get_or_fetch_transcript(video_id)
+    except TranscriptFetchError as e:
+        return VideoTranscriptResult(youtube_url=youtube_url, status="error", retryable=True,
+                                     reason=f"YouTube is not responding right now: {e}")
+    if transcript_text is None:
+        return VideoTranscriptResult(youtube_url=youtube_url, status="error",
+                                     reason="Some error occurred while fetching the transcript from youtube API.")
+    return VideoTranscriptResult(youtube_url=youtube_url, transcript_text=transcript_text,
+                                 tokens=count_tokens(transcript_text))
+
+
+def allocate_token_budget(sizes: List[int], budget: int) -> List[int]:
+    """
+    Split `budget` across items of the given token sizes: smaller items get all they need,
+    and what they leave over is shared equally by the larger ones.
+    """
+    shares = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        shares[i] = min(sizes[i], remaining // (len(order) - position))
+        remaining -= shares[i]
+    return shares
+
+
+def _fit_video(result: VideoTranscriptResult, share: int) -> VideoTranscriptResult:
+    """Bring a transcript within its share: condensed notes first, then cut if still too long."""
+    if result.status != "success" or result.tokens <= share:
+        return result
+    text, condensed = result.transcript_text, False
+    try:
+        text = transcript_summarizer.condense(extract_video_id(result.youtube_url), text)
+        condensed = True
+    except Exception as e:
+        print(f"[Tool] Failed to condense transcript for {result.youtube_url}: {e}")
+    tokens = count_tokens(text)
+    truncated = tokens > share
+    if truncated:
+        text = truncate_middle(text, share)
+        tokens = share
+    return result.model_copy(update={"transcript_text": text, "tokens": tokens,
+                                     "condensed": condensed, "truncated": truncated})
+
+
+def _multi_response(results: List[VideoTranscriptResult]) -> MultiTranscriptResponse:
+    succeeded = sum(result.status == "success" for result in results)
+    status = "success" if succeeded == len(results) else "partial" if succeeded else "error"
+    return MultiTranscriptResponse(status=status, videos=results, token_budget=MULTI_VIDEO_BUDGET_TOKENS)
+
+
+def fetch_multiple_video_transcripts(youtube_urls: List[str]):
+    """
+    Tool to fetch the transcripts of several videos at once, on a bounded pool.
+
+    Args:
+        youtube_urls (List[str]): The YouTube video URLs (short or long form)
+
+    Returns:
+        MultiTranscriptResponse with one result (transcript or error) per video
+    """
+    urls = _unique_videos(youtube_urls)
+    results = [future.result() for future in [_submit(_load_video, url) for url in urls]]
+    shares = allocate_token_budget([result.tokens for result in results], MULTI_VIDEO_BUDGET_TOKENS)
+    results = [future.result() for future in [_submit(_fit_video, r, share) for r, share in zip(results, shares)]]
+    return _multi_response(results)
+
+
+async def afetch_multiple_video_transcripts(youtube_urls: List[str]):
+    """Async fetch_multiple_video_transcripts(): awaits the pool instead of blocking a thread on it."""
+    urls = _unique_videos(youtube_urls)
+    results = await asyncio.gather(*[asyncio.wrap_future(_submit(_load_video, url)) for url in urls])
+    shares = allocate_token_budget([result.tokens for result in results], MULTI_VIDEO_BUDGET_TOKENS)
+    results = await asyncio.gather(*[asyncio.wrap_future(_submit(_fit_video, r, share))
+                                     for r, share in zip(results, shares)])
+    return _multi_response(list(results))
 
 
+fetch_multiple_transcripts = StructuredTool.from_function(
+    func=fetch_multiple_video_transcripts,
+    coroutine=afetch_multiple_video_transcripts,
+    name="youtube_multi_transcript_saver",
+    args_schema=YouTubeMultiTranscriptArgs,
+    description="Fetch the transcripts of several YouTube videos at once, e.g. to compare them. Use this "
+                "instead of calling youtube_transcript_saver once per video whenever the user shares more "
+                "than one video."
+)
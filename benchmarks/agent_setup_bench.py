@@ -0,0 +1,56 @@
+"""
+Micro-benchmark: per-request agent setup overhead, before and after the process-level runtime.
+
+"before" rebuilds the prompt template, functions agent, executor and memory wrapper for
+every request (the old Agent.chat). "after" only builds the per-request config on the
+shared Agent. No LLM or database calls are made.
+
+    python -m benchmarks.agent_setup_bench [iterations]
+"""
+import os
+import sys
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain.agents import create_openai_functions_agent, AgentExecutor
+
+from app.services.agent_service import Agent, get_llm
+from app.services.memory_manager import MemoryManager
+
+
+def per_request_setup(agent: Agent, session_id: str):
+    config = agent._build_config(session_id)
+    prompt_template = ChatPromptTemplate.from_messages([
+        ("system", agent.prompt),
+        ("user", "{chat_history}\n{input}"),
+        ("system", "{agent_scratchpad}")
+    ])
+    functions_agent = create_openai_functions_agent(llm=get_llm(), tools=agent.tools, prompt=prompt_template)
+    agent_executor = AgentExecutor(agent=functions_agent,
+                                   tools=agent.tools,
+                                   verbose=True,
+                                   handle_parsing_errors=True,
+                                   max_iterations=5)
+    MemoryManager(session_id).wrap_with_memory(agent_executor)
+    return config
+
+
+def shared_runtime_setup(agent: Agent, session_id: str):
+    return agent._build_config(session_id)
+
+
+def main(iterations: int = 200):
+    agent = Agent()
+    before = timeit.timeit(lambda: per_request_setup(agent, "bench-session"), number=iterations)
+    after = timeit.timeit(lambda: shared_runtime_setup(agent, "bench-session"), number=iterations)
+
+    print(f"iterations: {iterations}")
+    print(f"before (per-request build): {before / iterations * 1e3:.3f} ms/request")
+    print(f"after  (shared runtime):    {after / iterations * 1e3:.3f} ms/request")
+    print(f"speedup: {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
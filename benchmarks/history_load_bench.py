@@ -0,0 +1,67 @@
+"""
+Benchmark: chat history load time for sessions of 10, 1k and 10k messages.
+
+Compares the full load done by SQLChatMessageHistory.messages with the windowed
+ORDER BY id DESC LIMIT read of WindowedSQLChatHistory. Uses a throwaway SQLite file
+unless BENCH_DATABASE_URL points somewhere else.
+
+    python -m benchmarks.history_load_bench
+"""
+import os
+import tempfile
+import time
+
+BENCH_DIR = tempfile.mkdtemp(prefix="yt-history-bench-")
+DB_URL = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{os.path.join(BENCH_DIR, 'history.db')}")
+os.environ.setdefault("YT_DATABASE_URL", DB_URL)
+
+from langchain_community.chat_message_histories.sql import SQLChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services.memory_manager import WindowedSQLChatHistory
+
+SESSION_SIZES = [10, 1_000, 10_000]
+REPEATS = 5
+
+
+def seed(session_id: str, count: int):
+    history = SQLChatMessageHistory(session_id=session_id, connection=DB_URL)
+    history.clear()
+    batch = []
+    for i in range(count):
+        message_cls = HumanMessage if i % 2 == 0 else AIMessage
+        batch.append(message_cls(content=f"message {i} " + "lorem ipsum dolor sit amet " * 20))
+        if len(batch) == 500:
+            history.add_messages(batch)
+            batch = []
+    if batch:
+        history.add_messages(batch)
+
+
+def best_of(fn) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    print(f"database: {DB_URL}")
+    print(f"{'messages':>10} {'full load (ms)':>15} {'windowed (ms)':>15} {'loaded':>8}")
+    for size in SESSION_SIZES:
+        session_id = f"bench-{size}"
+        seed(session_id, size)
+
+        full = SQLChatMessageHistory(session_id=session_id, connection=DB_URL)
+        # Token trimming is disabled so the numbers isolate the SQL read
+        windowed = WindowedSQLChatHistory(session_id, DB_URL, window_size=10, max_tokens=None)
+
+        full_time = best_of(lambda: full.messages)
+        windowed_time = best_of(lambda: windowed.messages)
+        print(f"{size:>10} {full_time * 1e3:>15.2f} {windowed_time * 1e3:>15.2f} {len(windowed.messages):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Load test: concurrent chat sessions against the real FastAPI app from main.py.
+
+External services are replaced by local stand-ins so runs are reproducible offline:
+  - LLM: FakeChatModel (configurable latency and answer length). It calls the transcript
+    tools the way the functions agent would: first turn saves the transcript, later turns
+    search it.
+  - YouTube: a stub transcript API behind the fetcher client, returning synthetic transcripts.
+  - Redis: fakeredis (in the dev dependency group: uv sync --group dev), unless
+    BENCH_REDIS_URL points at a real server.
+  - Postgres: BENCH_DATABASE_URL (the user upserts are Postgres-specific, so SQLite is not
+    an option). Rows are added under fresh session ids; nothing is dropped.
+
+Reports throughput, p50/p95/p99 request latency and a per-stage breakdown (session
+resolution, history read/write, transcript fetch, LLM), and compares them with a stored
+baseline so regressions show up as a non-zero exit code. Requests turned away by admission
+control (429/503) are counted as rejected, and left out of the latency figures.
+
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.load_test --users 50 --turns 4
+    python -m benchmarks.load_test ... --save-baseline     # record benchmarks/baselines/load_test.json
+    ADMISSION_MAX_CONCURRENT=8 python -m benchmarks.load_test --concurrency 200 ...   # overload
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Any, List, Optional
+
+DB_URL = os.environ["BENCH_DATABASE_URL"]
+os.environ["YT_DATABASE_URL"] = DB_URL
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("MIDDLE_WARE_SECRET", "benchmark")
+if os.getenv("BENCH_REDIS_URL"):
+    os.environ["YT_REDIS_URL"] = os.environ["BENCH_REDIS_URL"]
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, FunctionMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "load_test.json")
+URL_PATTERN = re.compile(r"https://www\.youtube\.com/watch\?v=([\w-]{11})")
+WORDS = ("model data search video python agent memory cache latency index token stream "
+         "history session network query summary chapter speaker example result").split()
+
+# stage name -> list of durations in seconds, filled by the timing wrappers below
+STAGES: dict[str, list] = defaultdict(list)
+
+
+def timed_stage(name: str, fn):
+    """Wrap a sync or async callable so every call's wall time is recorded under `name`."""
+    if asyncio.iscoroutinefunction(fn):
+        @wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                STAGES[name].append(time.perf_counter() - start)
+        return async_wrapper
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            STAGES[name].append(time.perf_counter() - start)
+    return wrapper
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Stand-in for ChatOpenAI with function calling.
+
+    Without a function result in the prompt it asks for the saver tool on "summarize"
+    queries and the search tool otherwise; once a tool has answered it replies with
+    `answer_words` words. Each call sleeps `latency_ms`.
+    """
+    latency_ms: float = 500.0
+    answer_words: int = 120
+    # Same settings attributes as ChatOpenAI (part of the generation cache key)
+    model_name: str = "fake-functions-chat"
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-functions-chat"
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        # The agent prompt renders the scratchpad into a system message, so a finished tool
+        # call shows up either as a FunctionMessage or inside that message's text
+        # Batch jobs send the transcript inline
+        if any(isinstance(m, FunctionMessage) or "FunctionMessage(" in str(m.content) or "\n\nTranscript:\n" in str(m.content)
+               for m in messages[-2:]):
+            return AIMessage(content=" ".join(random.choices(WORDS, k=self.answer_words)))
+
+        # The user message is "{chat_history}\n{input}"; the current query is its last line
+        human = [m for m in messages if isinstance(m, HumanMessage)]
+        query = str(human[-1].content).rsplit("\n", 1)[-1] if human else ""
+        match = URL_PATTERN.search(query)
+        if not match:
+            return AIMessage(content="Please share a YouTube link.")
+        if "summarize" in query.lower():
+            name, args = "youtube_transcript_saver", {"youtube_url": match.group(0)}
+        else:
+            name, args = "youtube_transcript_search", {"youtube_url": match.group(0), "query": query}
+        return AIMessage(content="", additional_kwargs={"function_call": {"name": name, "arguments": json.dumps(args)}})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        time.sleep(self.latency_ms / 1000)
+        message = self._respond(messages)
+        STAGES["llm"].append(time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        await asyncio.sleep(self.latency_ms / 1000)
+        message = self._respond(messages)
+        STAGES["llm"].append(time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeFetchedTranscript(list):
+    def to_raw_data(self):
+        return list(self)
+
+
+class FakeTranscriptApi:
+    """Stub for YouTubeTranscriptApi: deterministic synthetic transcripts per video id."""
+    words = 5_000
+    latency_ms = 300.0
+
+    def fetch(self, video_id: str, languages=("en",)):
+        time.sleep(self.latency_ms / 1000)
+        rng = random.Random(video_id)
+        segments, start = FakeFetchedTranscript(), 0.0
+        for offset in range(0, self.words, 12):
+            text = " ".join(rng.choices(WORDS, k=min(12, self.words - offset)))
+            segments.append({"text": text, "start": start, "duration": 4.0})
+            start += 4.0
+        return segments
+
+
+def install_stand_ins(args):
+    """Patch external dependencies before the app is imported, then import it."""
+    if not os.getenv("BENCH_REDIS_URL"):
+        import fakeredis
+        from app.database import redis_setup
+
+        server = fakeredis.FakeServer()
+        redis_setup.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+        redis_setup.async_redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        redis_setup.redis_pubsub_client = None  # single process, nothing to invalidate
+
+    from app.services import agent_service, transcript_store, yt_tool
+    from app.services.transcript_fetcher import transcript_fetcher
+    from app.services.memory_manager import WindowedSQLChatHistory
+    from app.services.sql_service import AsyncSqlService
+
+    agent_service.LLM = FakeChatModel(latency_ms=args.llm_latency_ms, answer_words=args.answer_words)
+    FakeTranscriptApi.words = args.transcript_words
+    FakeTranscriptApi.latency_ms = args.fetch_latency_ms
+    transcript_fetcher.api = FakeTranscriptApi()
+    transcript_store.set_transcript_store(
+        transcript_store.DiskTranscriptStore(tempfile.mkdtemp(prefix="yt-load-test-")))
+
+    AsyncSqlService.get_or_create = timed_stage("session", AsyncSqlService.get_or_create)
+    WindowedSQLChatHistory.aget_messages = timed_stage("history_read", WindowedSQLChatHistory.aget_messages)
+    WindowedSQLChatHistory.aadd_messages = timed_stage("history_write", WindowedSQLChatHistory.aadd_messages)
+    yt_tool.get_or_fetch_transcript = timed_stage("transcript", yt_tool.get_or_fetch_transcript)
+
+    import main
+    return main.app
+
+
+def video_ids(count: int) -> List[str]:
+    rng = random.Random(42)
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-"
+    return ["".join(rng.choices(alphabet, k=11)) for _ in range(count)]
+
+
+async def run_user(app, user: int, args, videos: List[str], latencies: list, failures: list, rejected: list):
+    import httpx
+
+    video = videos[user % len(videos)]
+    url = f"https://www.youtube.com/watch?v={video}"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for turn in range(args.turns):
+            query = f"Summarize {url}" if turn == 0 else f"What does {url} say about {random.choice(WORDS)}?"
+            start = time.perf_counter()
+            response = await client.post(f"/api/v1/{args.endpoint}", params={"query": query})
+            await response.aread()
+            elapsed = time.perf_counter() - start
+            if response.status_code in (429, 503):
+                # Turned away by admission control; only admitted requests count towards latency
+                rejected.append(response.status_code)
+                continue
+            if response.status_code != 200 or "encountered an error" in response.text:
+                failures.append(f"{response.status_code}: {response.text[:200]}")
+            latencies.append(elapsed)
+
+
+async def wait_until_ready(timeout: float = 120):
+    from app.services.startup import startup
+
+    deadline = time.perf_counter() + timeout
+    while not startup.ready:
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"app not ready after {timeout:.0f}s: {startup.stats()}")
+        await asyncio.sleep(0.05)
+
+
+def summarize(samples) -> dict:
+    values = np.asarray(samples) * 1e3
+    return {"count": int(values.size),
+            "mean_ms": round(float(values.mean()), 2),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2)}
+
+
+async def run(args) -> dict:
+    app = install_stand_ins(args)
+    videos = video_ids(args.videos)
+    latencies, failures, rejected = [], [], []
+
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    with quiet:
+        # The app's lifespan runs schema setup and warm-up, as under uvicorn
+        async with app.router.lifespan_context(app):
+            await wait_until_ready()
+            # Warm-up requests: pools and the first transcript fetches are not measured
+            await asyncio.gather(*[run_user(app, -1 - i, argparse.Namespace(**{**vars(args), "turns": 1}),
+                                            videos, [], [], []) for i in range(args.warmup)])
+            STAGES.clear()
+
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def bounded(user):
+                async with semaphore:
+                    await run_user(app, user, args, videos, latencies, failures, rejected)
+
+            start = time.perf_counter()
+            await asyncio.gather(*[bounded(user) for user in range(args.users)])
+            wall = time.perf_counter() - start
+
+    return {
+        "config": {key: getattr(args, key) for key in
+                   ("users", "turns", "concurrency", "videos", "endpoint", "llm_latency_ms", "answer_words",
+                    "transcript_words", "fetch_latency_ms")},
+        "requests": len(latencies),
+        "failures": len(failures),
+        "failure_samples": failures[:3],
+        "rejected": len(rejected),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "latency": summarize(latencies),
+        "stages": {name: summarize(samples) for name, samples in sorted(STAGES.items()) if samples},
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, noise_floor_ms: float) -> List[str]:
+    """Metrics that got slower than baseline by more than `tolerance` (and the noise floor)."""
+    regressions = []
+    pairs = [("request", result["latency"], baseline["latency"])]
+    pairs += [(name, stats, baseline["stages"][name])
+              for name, stats in result["stages"].items() if name in baseline.get("stages", {})]
+    for name, current, previous in pairs:
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if current[key] > previous[key] * (1 + tolerance) and current[key] - previous[key] > noise_floor_ms:
+                regressions.append(f"{name} {key}: {previous[key]} -> {current[key]}")
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput_rps: {baseline['throughput_rps']} -> {result['throughput_rps']}")
+    if baseline.get("config") != result["config"]:
+        print("warning: baseline was recorded with a different configuration")
+    return regressions
+
+
+def report(result: dict):
+    latency = result["latency"]
+    print(f"{result['requests']} requests, {result['failures']} failed, {result.get('rejected', 0)} rejected, "
+          f"{result['throughput_rps']} req/s")
+    print(f"  {'stage':<14} {'calls':>7} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}  (ms)")
+    for name, stats in [("request", latency), *result["stages"].items()]:
+        print(f"  {name:<14} {stats['count']:>7} {stats['mean_ms']:>9} {stats['p50_ms']:>9} "
+              f"{stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+    for sample in result["failure_samples"]:
+        print(f"  failure: {sample}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=50, help="simulated sessions")
+    parser.add_argument("--turns", type=int, default=4, help="chat turns per session")
+    parser.add_argument("--concurrency", type=int, default=50, help="sessions in flight at once")
+    parser.add_argument("--videos", type=int, default=10, help="distinct videos shared by the sessions")
+    parser.add_argument("--endpoint", choices=["assistant", "assistant/stream"], default="assistant")
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--answer-words", type=int, default=120)
+    parser.add_argument("--transcript-words", type=int, default=5_000)
+    parser.add_argument("--fetch-latency-ms", type=float, default=300.0)
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured single-turn sessions first")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--noise-floor-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--json", help="also write the result to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own output")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    report(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(result, json.load(f), args.tolerance, args.noise_floor_ms)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"no regressions vs {args.baseline}")
+    return 1 if regressions or result["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Startup benchmark: how long `import main` takes, and what it pulls in.
+
+Each run imports main in a fresh interpreter under `python -X importtime` and parses the
+per-module timings. Reports the median total import time and the slowest modules, fails
+if main imports any of the deferred heavy modules (they belong to the warm-up that runs
+after the server starts), and compares the total with a stored baseline so a regression
+shows up as a non-zero exit code.
+
+The database URL points at a server that doesn't exist: importing main must not connect.
+
+    python -m benchmarks.startup_bench --runs 5
+    python -m benchmarks.startup_bench --save-baseline     # record benchmarks/baselines/startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "startup.json")
+
+# Imported by the lifespan warm-up or on first use, never by `import main`
+DEFERRED_MODULES = ["langchain_core", "langchain_openai", "openai", "langchain.agents", "langchain_community", "numpy",
+                    "tiktoken", "authlib", "youtube_transcript_api", "zstandard", "app.services.agent_service",
+                    "app.services.yt_tool"]
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_main_once() -> Dict[str, dict]:
+    """module -> {"self_us", "cumulative_us", "depth"} for one fresh `import main`."""
+    env = {**os.environ,
+           "YT_DATABASE_URL": "postgresql://bench@127.0.0.1:9/unreachable",
+           "OPENAI_API_KEY": "sk-benchmark",
+           "MIDDLE_WARE_SECRET": "benchmark"}
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                               cwd=ROOT, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{completed.stderr[-2000:]}")
+    modules = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = {"self_us": int(self_us), "cumulative_us": int(cumulative_us),
+                             "depth": len(indent) // 2}
+    return modules
+
+
+def run(args) -> dict:
+    totals, cumulative = [], defaultdict(list)
+    deferred_imported = set()
+    for _ in range(args.runs):
+        modules = import_main_once()
+        totals.append(modules["main"]["cumulative_us"] / 1e3)
+        for name, stats in modules.items():
+            # main's direct imports, and app modules at any depth
+            if stats["depth"] == 1 or name.startswith("app."):
+                cumulative[name].append(stats["cumulative_us"] / 1e3)
+        deferred_imported.update(name for name in DEFERRED_MODULES if name in modules)
+
+    slowest = sorted(((name, statistics.median(values)) for name, values in cumulative.items()),
+                     key=lambda item: item[1], reverse=True)[:args.top]
+    return {
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "import_ms": {"median": round(statistics.median(totals), 2), "min": round(min(totals), 2),
+                      "max": round(max(totals), 2)},
+        "slowest_modules_ms": {name: round(ms, 2) for name, ms in slowest},
+        "deferred_imported": sorted(deferred_imported),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, noise_floor_ms: float) -> List[str]:
+    """The median import time, if it got slower than baseline by more than `tolerance`."""
+    current, previous = result["import_ms"]["median"], baseline["import_ms"]["median"]
+    if current > previous * (1 + tolerance) and current - previous > noise_floor_ms:
+        return [f"import_ms median: {previous} -> {current}"]
+    return []
+
+
+def report(result: dict):
+    stats = result["import_ms"]
+    print(f"import main: {stats['median']} ms median over {result['runs']} run(s) "
+          f"(min {stats['min']}, max {stats['max']})")
+    print(f"  {'module':<40} {'cumulative (ms)':>16}")
+    for name, ms in result["slowest_modules_ms"].items():
+        print(f"  {name:<40} {ms:>16}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to report")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--noise-floor-ms", type=float, default=50.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    report(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failed = False
+    for name in result["deferred_imported"]:
+        print(f"DEFERRED MODULE IMPORTED {name}")
+        failed = True
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 1 if failed else 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save-baseline)")
+        return 1 if failed else 0
+    with open(args.baseline) as f:
+        regressions = compare(result, json.load(f), args.tolerance, args.noise_floor_ms)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"no regressions vs {args.baseline}")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Benchmark: user/session resolution against a users table of 1M rows.
+
+Seeds a legacy-shaped users table (no indexes, mixed-case emails), times the previous
+select-then-write flows, runs the migration from app.database.migrations, then times the
+single-statement upserts in SqlService. Needs a scratch Postgres database; the users
+table in it is dropped and recreated.
+
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.user_resolution_bench [rows]
+"""
+import os
+import random
+import sys
+import time
+
+DB_URL = os.environ["BENCH_DATABASE_URL"]
+os.environ["YT_DATABASE_URL"] = DB_URL
+
+from sqlalchemy import select, text
+from uuid import uuid4
+
+from app.database.migrations import migrate_user_indexes
+from app.database.schema import User
+from app.database.setup import SessionLocal, engine
+from app.services.sql_service import SqlService
+
+SAMPLES = 50
+
+
+class NoCache:
+    """Keeps the cache out of the measurement."""
+    def get(self, session_id):
+        return None
+
+    def set(self, session_id, data):
+        pass
+
+
+def seed(rows: int):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS public.users"))
+        conn.execute(text("""
+            CREATE TABLE public.users (
+                name VARCHAR(200), email VARCHAR(100), alias_id VARCHAR(100) PRIMARY KEY,
+                session_id VARCHAR(100), created_at TIMESTAMPTZ DEFAULT now(), updated_at TIMESTAMPTZ)"""))
+        conn.execute(text("""
+            INSERT INTO public.users (name, email, alias_id, session_id)
+            SELECT 'user ' || i,
+                   CASE WHEN i % 3 = 0 THEN NULL
+                        WHEN i % 3 = 1 THEN 'User' || i || '@Example.com'
+                        ELSE 'user' || i || '@example.com' END,
+                   md5(i::text), 'sess-' || i
+            FROM generate_series(1, :rows) AS i"""), {"rows": rows})
+        conn.execute(text("ANALYZE public.users"))
+
+
+def legacy_resolve_session(db, session_id):
+    user = db.execute(select(User).where(User.session_id == session_id)).scalars().first()
+    if user:
+        return user
+    user = User(session_id=session_id, alias_id=str(uuid4()))
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def legacy_login(db, session_id, email):
+    user = db.execute(select(User).where(User.email == email.lower())).scalars().first()
+    if user is None:
+        user = db.execute(select(User).where(User.session_id == session_id)).scalars().first()
+    if user is None:
+        user = User(session_id=session_id, email=email, alias_id=str(uuid4()))
+    user.session_id = session_id
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def timed(label, fn, args_list):
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for args in args_list:
+            fn(db, *args)
+        elapsed = (time.perf_counter() - start) / len(args_list)
+    finally:
+        db.close()
+    print(f"  {label:<34} {elapsed * 1e3:9.2f} ms/op")
+
+
+def main(rows: int = 1_000_000):
+    print(f"seeding {rows:,} users ...")
+    seed(rows)
+
+    existing = [(f"sess-{random.randint(1, rows)}",) for _ in range(SAMPLES)]
+    new_sessions = [(f"new-{uuid4()}",) for _ in range(SAMPLES)]
+    logins = [(f"login-{uuid4()}", f"user{i}@example.com")
+              for i in random.sample(range(1, rows), SAMPLES) if i % 3 == 2]
+
+    print("before (no indexes, select-then-write):")
+    timed("resolve existing session", legacy_resolve_session, existing)
+    timed("first visit (new session)", legacy_resolve_session, new_sessions)
+    timed("login of existing account", legacy_login, logins)
+
+    print("migrating ...")
+    start = time.perf_counter()
+    migrate_user_indexes(engine)
+    print(f"  migration took {time.perf_counter() - start:.1f}s")
+
+    service = SqlService(cache=NoCache())
+    existing = [(f"sess-{random.randint(1, rows)}",) for _ in range(SAMPLES)]
+    new_sessions = [(f"new-{uuid4()}",) for _ in range(SAMPLES)]
+    logins = [(f"login-{uuid4()}", f"User{i}@Example.com")
+              for i in random.sample(range(1, rows), SAMPLES) if i % 3 != 0]
+
+    print("after (indexes, single-statement upserts):")
+    timed("resolve existing session", lambda db, sid: service.get_or_create(db, sid), existing)
+    timed("first visit (new session)", lambda db, sid: service.get_or_create(db, sid), new_sessions)
+    timed("login of existing account", lambda db, sid, email: service.get_or_create(db, sid, email=email), logins)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
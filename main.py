@@ -1,28 +1,66 @@
+import asyncio
 import uvicorn
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi import Request
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
-from app.database.setup import Base, engine
-from app.routers.agent_router import agent_router
+from app.database.migrations import create_schema
+from app.routers.agent_router import agent_router, get_agent, shutdown_agent
+from app.routers.batch_router import batch_router
+from app.routers.monitoring_router import health_router, metrics_router, monitoring_router
+from app.services.auth_service import get_oauth
+from app.services.batch_service import batch_runner
+from app.services.history_store import HISTORY_MAINTENANCE_ENABLED, history_maintenance
+from app.services.metrics import ServerTimingMiddleware
+from app.services.startup import startup
 
 load_dotenv()
 
-Base.metadata.create_all(bind=engine)
-
 MIDDLE_WARE_SECRET = os.getenv('MIDDLE_WARE_SECRET')
+# Off when the schema is managed separately: python -m app.database.migrations
+MIGRATE_ON_STARTUP = os.getenv('MIGRATE_ON_STARTUP', 'true') == 'true'
 
 from  app.routers.auth_router import auth_router
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing heavy happens at import; the server starts answering /healthz/live right away
+    # and reports ready once these are done
+    steps = [("schema", create_schema)] if MIGRATE_ON_STARTUP else []
+    steps += [
+        ("agent", get_agent),
+        ("auth", get_oauth),
+        # Resume any batch jobs left unfinished by the previous run
+        ("batch", batch_runner.start),
+    ]
+    if HISTORY_MAINTENANCE_ENABLED:
+        steps.append(("history", history_maintenance.start))
+    warm_up = asyncio.create_task(startup.warm_up(steps))
+    yield
+    warm_up.cancel()
+    # Requests have drained by now; stop what runs in the background so nothing is left leased
+    await startup.shut_down([
+        ("batch", batch_runner.stop),
+        ("history", history_maintenance.stop),
+        ("agent", shutdown_agent),
+    ])
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(SessionMiddleware, secret_key=MIDDLE_WARE_SECRET, max_age=3600)
+app.add_middleware(ServerTimingMiddleware)
 
 app.include_router(agent_router)
 app.include_router(auth_router)
+app.include_router(batch_router)
+app.include_router(monitoring_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
 
 templates = Jinja2Templates(directory="app/templates")
 
@@ -34,5 +72,3 @@ def serve_frontend(request: Request):
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=7000)
-
-
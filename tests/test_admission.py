@@ -0,0 +1,144 @@
+"""
+Admission control: the Redis token bucket (its Lua script run by fakeredis), the bounded
+wait queue and the status codes a rejected request gets.
+
+    python -m pytest -q tests/test_admission.py
+"""
+import asyncio
+import time
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+
+from app.services.admission import AdmissionController, RedisRateLimiter
+from app.services.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def make_limiter(server) -> RedisRateLimiter:
+    return RedisRateLimiter(redis=fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+                            breaker=CircuitBreaker("redis-test"))
+
+
+def make_controller(server, **kwargs) -> AdmissionController:
+    return AdmissionController(rate_limiter=make_limiter(server), **kwargs)
+
+
+async def rejection(awaitable) -> HTTPException:
+    with pytest.raises(HTTPException) as raised:
+        await awaitable
+    return raised.value
+
+
+def test_bucket_allows_the_burst_then_says_when_to_retry(server):
+    limiter = make_limiter(server)
+
+    async def scenario():
+        return [await limiter.acquire("session:s1", per_minute=60, burst=3) for _ in range(4)]
+
+    *allowed, retry_after = asyncio.run(scenario())
+    assert allowed == [0.0, 0.0, 0.0]
+    # One token a second: the next one is at most a second away
+    assert 0 < retry_after <= 1
+
+
+def test_bucket_refills_over_time(server):
+    limiter = make_limiter(server)
+
+    async def scenario():
+        first = await limiter.acquire("session:s1", per_minute=600, burst=1)
+        second = await limiter.acquire("session:s1", per_minute=600, burst=1)
+        await asyncio.sleep(0.15)
+        return first, second, await limiter.acquire("session:s1", per_minute=600, burst=1)
+
+    first, second, refilled = asyncio.run(scenario())
+    assert (first, refilled) == (0.0, 0.0)
+    assert 0 < second <= 0.1
+
+
+def test_bucket_is_shared_across_processes(server):
+    # Each limiter stands for one worker process; they share Redis
+    workers = [make_limiter(server), make_limiter(server)]
+
+    async def scenario():
+        return [await workers[i % 2].acquire("alias:u1", per_minute=60, burst=2) for i in range(3)]
+
+    assert asyncio.run(scenario())[2] > 0
+
+
+def test_redis_outage_fails_open(server):
+    limiter = make_limiter(server)
+    server.connected = False
+
+    assert asyncio.run(limiter.acquire("session:s1", per_minute=60, burst=1)) == 0.0
+    assert limiter.breaker.stats()["consecutive_failures"] == 1
+
+
+def test_rate_limited_request_gets_429_with_retry_after(server):
+    controller = make_controller(server)
+
+    async def scenario():
+        for _ in range(100):
+            await controller.check_session("s1")
+
+    error = asyncio.run(rejection(scenario()))
+    assert error.status_code == 429
+    assert int(error.headers["Retry-After"]) >= 1
+
+
+def test_free_slots_admit_without_queueing(server):
+    # With no queue at all, requests that find a free slot must still get in
+    controller = make_controller(server, max_concurrent=2, max_queue=0)
+
+    async def scenario():
+        await controller.acquire()
+        await controller.acquire()
+        assert controller.stats()["queued"] == 0
+        return await rejection(controller.acquire())
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert controller.stats()["in_flight"] == 2
+
+
+def test_full_queue_gets_503_with_retry_after(server):
+    controller = make_controller(server, max_concurrent=1, max_queue=1, queue_timeout=2)
+
+    async def scenario():
+        await controller.acquire()
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+        assert controller.stats()["queued"] == 1
+
+        error = await rejection(controller.acquire())
+
+        # The queued request gets the slot once it is released
+        controller.release()
+        await waiting
+        return error
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "2"
+    assert controller.stats() == {"in_flight": 1, "queued": 0, "max_concurrent": 1, "max_queue": 1}
+
+
+def test_queue_wait_times_out_with_503(server):
+    controller = make_controller(server, max_concurrent=1, max_queue=5, queue_timeout=0.05)
+
+    async def scenario():
+        await controller.acquire()
+        start = time.monotonic()
+        error = await rejection(controller.acquire())
+        return error, time.monotonic() - start
+
+    error, waited = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert waited >= 0.05
+    assert controller.stats()["queued"] == 0
@@ -0,0 +1,93 @@
+"""
+FastPathRouter decisions: which turns skip the agent, and when history is read for them.
+
+    python -m pytest -q tests/test_fast_path.py
+"""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services.fast_path import AGENT, CHAT, FastPathRouter, classify_turn
+
+HISTORY = [HumanMessage(content="hi"), AIMessage(content="Hello! Share a YouTube link to get started.")]
+
+
+class Session:
+    """Stands in for a session's history: counts reads of the flag and of the messages."""
+
+    def __init__(self, has_video: bool):
+        self.video = has_video
+        self.flag_reads = 0
+        self.history_reads = 0
+
+    def has_video(self) -> bool:
+        self.flag_reads += 1
+        return self.video
+
+    def load_history(self):
+        self.history_reads += 1
+        return HISTORY
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("hi", "greeting"),
+    ("Hello there!", "greeting"),
+    ("good morning", "greeting"),
+    ("thanks a lot", "thanks"),
+    ("ok thanks", "thanks"),
+    ("Thank you so much!!", "thanks"),
+    ("what can you do?", "capabilities"),
+    ("HELP", "capabilities"),
+    # A greeting in front of a real question is not small talk
+    ("hey what's the capital of france", None),
+    ("hi, summarize this video for me please now ok", None),
+    ("thanks, now make it shorter", None),
+    ("", None),
+    ("?!", None),
+])
+def test_classify_turn(query, expected):
+    assert classify_turn(query) == expected
+
+
+def route(query: str, session: Session, chat_enabled: bool = True):
+    return FastPathRouter(chat_enabled=chat_enabled).route(query, session.has_video, session.load_history)
+
+
+@pytest.mark.parametrize("query", [
+    "summarize https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "what does youtu.be/dQw4w9WgXcQ say about pricing",
+    "can you read a youtube video for me",
+])
+def test_youtube_turns_go_to_the_agent_without_reading_the_session(query):
+    session = Session(has_video=False)
+
+    assert route(query, session) == (AGENT, [])
+    assert (session.flag_reads, session.history_reads) == (0, 0)
+
+
+def test_follow_up_in_a_video_session_skips_the_history_read():
+    session = Session(has_video=True)
+
+    # The agent's memory wrapper loads the history itself
+    assert route("and what about the ending?", session) == (AGENT, [])
+    assert (session.flag_reads, session.history_reads) == (1, 0)
+
+
+def test_no_video_turn_gets_the_short_prompt_with_history():
+    session = Session(has_video=False)
+
+    assert route("what's a good name for a cooking channel?", session) == (CHAT, HISTORY)
+    assert (session.flag_reads, session.history_reads) == (1, 1)
+
+
+def test_small_talk_is_templated_without_reading_the_session():
+    session = Session(has_video=True)
+
+    assert route("thanks a lot!", session) == ("thanks", [])
+    assert (session.flag_reads, session.history_reads) == (0, 0)
+
+
+def test_chat_route_disabled_sends_everything_else_to_the_agent():
+    session = Session(has_video=False)
+
+    assert route("what's a good name for a cooking channel?", session, chat_enabled=False) == (AGENT, [])
+    assert session.flag_reads == 0
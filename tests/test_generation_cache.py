@@ -0,0 +1,55 @@
+"""
+Which turns may be answered from the generation cache, i.e. with an answer generated for
+someone else. Anything that could make the answer differ must stay uncached.
+
+    python -m pytest -q tests/test_generation_cache.py
+"""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.services.generation_cache import has_personalizing_context, parse_cacheable_request
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+SHORT_URL = "https://youtu.be/dQw4w9WgXcQ"
+OTHER_URL = "https://youtu.be/9bZkp7q19f0"
+
+
+@pytest.mark.parametrize("query, expected", [
+    # Bare whole-video requests
+    (f"summarize {URL}", ("dQw4w9WgXcQ", "summary")),
+    (f"Summarize {URL}", ("dQw4w9WgXcQ", "summary")),
+    (f"summary of {SHORT_URL}", ("dQw4w9WgXcQ", "summary")),
+    (f"summarize this {SHORT_URL}.", ("dQw4w9WgXcQ", "summary")),
+    (f"can you write a blog post about {URL} please", ("dQw4w9WgXcQ", "blog")),
+    (f"tl;dr {URL}", ("dQw4w9WgXcQ", "tldr")),
+    (f"key takeaways {URL}", ("dQw4w9WgXcQ", "key_points")),
+    (f"summarize {URL} {SHORT_URL}", ("dQw4w9WgXcQ", "summary")),  # the same video twice
+    # Extra instructions change the answer
+    (f"summary of {URL} in spanish", None),
+    (f"summarize {URL} in 3 bullet points", None),
+    (f"what does he say about pricing {URL}", None),
+    # More than one intent is a different answer from either
+    (f"blog post and tldr of {URL}", None),
+    (f"summary and key points {URL}", None),
+    # No intent, or not exactly one video
+    (URL, None),
+    (f"summarize {URL} and {OTHER_URL}", None),
+    ("summarize the video", None),
+])
+def test_parse_cacheable_request(query, expected):
+    assert parse_cacheable_request(query) == expected
+
+
+@pytest.mark.parametrize("messages, expected", [
+    ([], False),
+    # Earlier bare requests and their answers don't change the next one
+    ([HumanMessage(content=f"summarize {URL}"), AIMessage(content="The video covers ...")], False),
+    # Preferences stated earlier do
+    ([HumanMessage(content="always answer in spanish"), AIMessage(content="¡Claro!")], True),
+    ([HumanMessage(content=f"tl;dr {URL}"), AIMessage(content="..."),
+      HumanMessage(content="shorter please"), AIMessage(content="...")], True),
+    # So may anything in the running summary of older turns
+    ([SystemMessage(content="Summary of the earlier conversation: the user is a teacher")], True),
+])
+def test_has_personalizing_context(messages, expected):
+    assert has_personalizing_context(messages) is expected
@@ -0,0 +1,129 @@
+"""
+SessionCache against fakeredis: the Redis LRU bound, the L1 tier and cross-process
+invalidation over pub/sub. Each SessionCache stands for one worker process; they share a
+fakeredis server the way workers share Redis.
+
+    python -m pytest -q tests/test_session_cache.py
+"""
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.session_cache import INVALIDATION_CHANNEL, SESSION_LRU_KEY, LocalTTLCache, SessionCache
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out waiting for the invalidation listener")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def make_cache(server, max_keys: int = 100, pubsub: bool = False) -> SessionCache:
+    return SessionCache(redis=fakeredis.FakeRedis(server=server, decode_responses=True),
+                        async_redis=fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+                        pubsub_redis=fakeredis.FakeRedis(server=server, decode_responses=True) if pubsub else None,
+                        max_keys=max_keys, local=LocalTTLCache(), breaker=CircuitBreaker("redis-test"))
+
+
+def test_redis_tier_evicts_least_recently_used(server):
+    cache = make_cache(server, max_keys=3)
+    for sid in ("a", "b", "c"):
+        cache.set(sid, {"alias_id": sid})
+        time.sleep(0.01)
+
+    # Read "a" from Redis (not L1) so its last-access score moves past "b"
+    cache.local.clear()
+    assert cache.get("a") == {"alias_id": "a"}
+    time.sleep(0.01)
+    cache.set("d", {"alias_id": "d"})
+
+    redis = cache.redis
+    assert redis.zcard(SESSION_LRU_KEY) == 3
+    assert redis.exists("yt:session:b") == 0
+    assert sorted(redis.zrange(SESSION_LRU_KEY, 0, -1)) == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_redis_hit_fills_the_local_tier(server):
+    make_cache(server).set("s1", {"alias_id": "u1"})
+
+    other = make_cache(server)
+    assert other.get_many(["s1", "missing"]) == {"s1": {"alias_id": "u1"}}
+    assert other.get("s1") == {"alias_id": "u1"}
+
+    stats = other.stats()
+    assert (stats["hits"], stats["l1_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_write_invalidates_other_processes_local_copy(server):
+    writer = make_cache(server, pubsub=True)
+    reader = make_cache(server, pubsub=True)
+    writer.set("s1", {"alias_id": "guest"})
+    assert reader.get("s1") == {"alias_id": "guest"}
+    wait_for(lambda: writer.redis.pubsub_numsub(INVALIDATION_CHANNEL)[0][1] == 2)
+
+    # A login rebinds the session; the reader's L1 copy must not outlive it
+    writer.set("s1", {"alias_id": "user@example.com"})
+    wait_for(lambda: reader.stats()["invalidations_received"] == 1)
+    assert reader.local.get("s1") is None
+    assert reader.get("s1") == {"alias_id": "user@example.com"}
+
+    # A process ignores its own invalidations: its L1 already has the new value
+    assert writer.stats()["invalidations_received"] == 0
+    assert writer.local.get("s1") == {"alias_id": "user@example.com"}
+
+
+def test_delete_invalidates_other_processes(server):
+    writer = make_cache(server, pubsub=True)
+    reader = make_cache(server, pubsub=True)
+    writer.set("s1", {"alias_id": "u1"})
+    assert reader.get("s1") == {"alias_id": "u1"}
+    wait_for(lambda: writer.redis.pubsub_numsub(INVALIDATION_CHANNEL)[0][1] == 2)
+
+    writer.delete("s1")
+    wait_for(lambda: reader.stats()["invalidations_received"] == 1)
+    assert reader.get("s1") is None
+
+
+def test_async_methods_share_the_redis_tier(server):
+    cache = make_cache(server, max_keys=2)
+
+    async def scenario():
+        for sid in ("a", "b", "c"):
+            await cache.aset(sid, {"alias_id": sid})
+            await asyncio.sleep(0.01)
+        cache.local.clear()
+        return await cache.aget_many(["a", "b", "c"])
+
+    assert asyncio.run(scenario()) == {"b": {"alias_id": "b"}, "c": {"alias_id": "c"}}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_redis_outage_opens_the_breaker(server):
+    cache = make_cache(server)
+    cache.set("s1", {"alias_id": "u1"})
+    server.connected = False
+
+    cache.local.clear()
+    for _ in range(cache.breaker.failure_threshold):
+        assert cache.get("s1") is None
+    assert cache.breaker.state == CircuitBreaker.OPEN
+
+    # Open breaker: no Redis call at all, L1 still serves
+    cache.set("s2", {"alias_id": "u2"})
+    assert cache.get("s2") == {"alias_id": "u2"}
+    stats = cache.stats()
+    assert stats["errors"] == cache.breaker.failure_threshold
+    assert stats["short_circuited"] == 1
+    assert stats["size"] is None
+
@@ -0,0 +1,27 @@
+"""
+parse_timestamp: the start/end arguments of the transcript window tool.
+
+    python -m pytest -q tests/test_timed_transcript.py
+"""
+import pytest
+
+from app.services.timed_transcript import parse_timestamp
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("14:30", 870),
+    ("0:05", 5),
+    ("1:02:03", 3723),
+    (" 2:00.5 ", 120),
+    ("870", 870.0),
+    ("12.5", 12.5),
+    ("0", 0.0),
+])
+def test_parse_timestamp(value, expected):
+    assert parse_timestamp(value) == expected
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "-5", "1:99", "75:00", "1:60:00", "", "soon", "1:2:3:4"])
+def test_parse_timestamp_rejects_points_outside_a_video(value):
+    with pytest.raises(ValueError, match="unrecognized timestamp"):
+        parse_timestamp(value)
@@ -0,0 +1,29 @@
+"""
+allocate_token_budget: how multi-video requests share the prompt's transcript budget.
+
+    python -m pytest -q tests/test_token_budget.py
+"""
+import pytest
+
+from app.services.yt_tool import allocate_token_budget
+
+
+@pytest.mark.parametrize("sizes, budget, expected", [
+    ([], 100, []),
+    # Everything fits: each item gets what it needs
+    ([10, 20], 100, [10, 20]),
+    # Equal items share equally
+    ([100, 100], 100, [50, 50]),
+    # Small items are kept whole, the large ones split what is left
+    ([10, 1000, 1000], 110, [10, 50, 50]),
+    ([50, 200, 30], 150, [50, 70, 30]),
+    # Shares are whole tokens and never exceed the budget
+    ([100, 100, 100], 100, [33, 33, 34]),
+    ([5], 0, [0]),
+])
+def test_allocate_token_budget(sizes, budget, expected):
+    shares = allocate_token_budget(sizes, budget)
+
+    assert shares == expected
+    assert sum(shares) <= budget
+    assert all(share <= size for share, size in zip(shares, sizes))
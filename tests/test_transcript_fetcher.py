@@ -0,0 +1,211 @@
+"""
+TranscriptFetcher against a local stand-in for YouTube: retries, the rate limiter and the
+circuit breaker, over real HTTP through PooledSession's base URL (what YT_BASE_URL sets).
+
+The stand-in serves the three requests youtube_transcript_api makes per fetch: the watch
+page, the innertube player call and the caption track. Each video id can be told to answer
+the watch page with a list of status codes first.
+
+    python -m pytest -q tests/test_transcript_fetcher.py
+"""
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.services import transcript_fetcher as fetcher_module
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.rate_limiter import TokenBucket
+from app.services.transcript_fetcher import PooledSession, TranscriptFetchError, TranscriptFetcher
+
+CAPTIONS_XML = ('<?xml version="1.0" encoding="utf-8" ?><transcript>'
+                '<text start="0.0" dur="2.5">hello and welcome</text>'
+                '<text start="2.5" dur="3.0">to the channel</text></transcript>')
+
+
+class FakeYouTube(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeYouTubeHandler)
+        self.lock = threading.Lock()
+        self.hits = Counter()  # (path, video_id) -> requests
+        self.watch_statuses = defaultdict(list)  # video_id -> statuses to answer first
+        self.retry_after = None
+        self.no_captions = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def watch_hits(self, video_id: str) -> int:
+        return self.hits["/watch", video_id]
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    server: FakeYouTube
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: str, content_type: str = "text/html", headers=()):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        video_id = parse_qs(url.query).get("v", [""])[0]
+        with self.server.lock:
+            self.server.hits[url.path, video_id] += 1
+            statuses = self.server.watch_statuses[video_id]
+            status = statuses.pop(0) if url.path == "/watch" and statuses else 200
+        if status != 200:
+            headers = [("Retry-After", self.server.retry_after)] if self.server.retry_after else []
+            self._send(status, "upstream trouble", headers=headers)
+        elif url.path == "/watch":
+            self._send(200, '<html><script>var ytcfg = {"INNERTUBE_API_KEY": "standin-key"};</script></html>')
+        elif url.path == "/api/timedtext":
+            self._send(200, CAPTIONS_XML, content_type="text/xml")
+        else:
+            self._send(404, "not found")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        video_id = body["videoId"]
+        with self.server.lock:
+            self.server.hits[urlparse(self.path).path, video_id] += 1
+        player = {"playabilityStatus": {"status": "OK"}}
+        if video_id not in self.server.no_captions:
+            # Absolute youtube.com URL, as YouTube sends it; PooledSession rewrites it
+            player["captions"] = {"playerCaptionsTracklistRenderer": {"captionTracks": [{
+                "baseUrl": f"https://www.youtube.com/api/timedtext?v={video_id}&lang=en",
+                "name": {"runs": [{"text": "English"}]},
+                "languageCode": "en",
+            }]}}
+        self._send(200, json.dumps(player), content_type="application/json")
+
+
+@pytest.fixture
+def youtube():
+    server = FakeYouTube()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_fetcher(youtube: FakeYouTube, rate_limiter=None, failure_threshold: int = 5, reset_timeout: float = 60,
+                 max_retries: int = 3):
+    return TranscriptFetcher(session=PooledSession(base_url=youtube.url, timeout=(1, 2)),
+                             rate_limiter=rate_limiter or TokenBucket(1000, 1000),
+                             breaker=CircuitBreaker("youtube-test", failure_threshold=failure_threshold,
+                                                    reset_timeout=reset_timeout),
+                             max_retries=max_retries, backoff_base=0.01, backoff_max=1)
+
+
+def test_fetch_goes_through_the_stand_in(youtube):
+    segments = make_fetcher(youtube).fetch("abcdefghijk")
+
+    assert segments == [{"text": "hello and welcome", "start": 0.0, "duration": 2.5},
+                        {"text": "to the channel", "start": 2.5, "duration": 3.0}]
+    assert youtube.hits == {("/watch", "abcdefghijk"): 1, ("/youtubei/v1/player", "abcdefghijk"): 1,
+                            ("/api/timedtext", "abcdefghijk"): 1}
+
+
+def test_video_without_captions_is_none_not_an_error(youtube):
+    youtube.no_captions.add("nocaptions1")
+    fetcher = make_fetcher(youtube)
+
+    assert fetcher.fetch("nocaptions1") is None
+    assert youtube.watch_hits("nocaptions1") == 1
+    assert fetcher.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_transient_errors_are_retried(youtube):
+    youtube.watch_statuses["flakyvideo1"] = [503, 502]
+    fetcher = make_fetcher(youtube)
+
+    assert fetcher.fetch("flakyvideo1")
+    assert youtube.watch_hits("flakyvideo1") == 3
+    # The successful attempt closes the failure streak
+    assert fetcher.breaker.stats()["consecutive_failures"] == 0
+
+
+def test_retry_after_is_honoured(youtube):
+    youtube.watch_statuses["throttled01"] = [429]
+    youtube.retry_after = "0.3"
+    fetcher = make_fetcher(youtube)
+
+    start = time.monotonic()
+    assert fetcher.fetch("throttled01")
+    assert time.monotonic() - start >= 0.3
+    assert youtube.watch_hits("throttled01") == 2
+
+
+def test_client_errors_are_not_retried(youtube):
+    youtube.watch_statuses["forbidden01"] = [403]
+    fetcher = make_fetcher(youtube)
+
+    with pytest.raises(TranscriptFetchError):
+        fetcher.fetch("forbidden01")
+    assert youtube.watch_hits("forbidden01") == 1
+
+
+def test_gives_up_after_max_retries(youtube):
+    youtube.watch_statuses["brokenvideo"] = [500] * 10
+    fetcher = make_fetcher(youtube, max_retries=2)
+
+    with pytest.raises(TranscriptFetchError):
+        fetcher.fetch("brokenvideo")
+    assert youtube.watch_hits("brokenvideo") == 3
+
+
+def test_breaker_opens_and_stops_calling_youtube(youtube):
+    youtube.watch_statuses["brokenvideo"] = [500] * 10
+    fetcher = make_fetcher(youtube, failure_threshold=3, max_retries=5)
+
+    with pytest.raises(TranscriptFetchError, match="circuit open"):
+        fetcher.fetch("brokenvideo")
+    assert youtube.watch_hits("brokenvideo") == 3
+    assert fetcher.stats()["open"] == 1
+
+    # Other videos fail fast too, without a request
+    with pytest.raises(TranscriptFetchError, match="circuit open"):
+        fetcher.fetch("abcdefghijk")
+    assert youtube.watch_hits("abcdefghijk") == 0
+
+
+def test_rate_limit_fails_fast_without_calling_youtube(youtube, monkeypatch):
+    monkeypatch.setattr(fetcher_module, "YT_RATE_LIMIT_WAIT_SECONDS", 0.05)
+    fetcher = make_fetcher(youtube, rate_limiter=TokenBucket(0.5, 1))
+
+    assert fetcher.fetch("abcdefghijk")
+    with pytest.raises(TranscriptFetchError, match="rate limit"):
+        fetcher.fetch("othervideo1")
+    assert youtube.watch_hits("othervideo1") == 0
+    assert fetcher.breaker.stats()["consecutive_failures"] == 0
+
+
+def test_rate_limited_fetch_does_not_take_the_half_open_probe(youtube, monkeypatch):
+    monkeypatch.setattr(fetcher_module, "YT_RATE_LIMIT_WAIT_SECONDS", 0.05)
+    fetcher = make_fetcher(youtube, rate_limiter=TokenBucket(0.5, 1), failure_threshold=1, reset_timeout=0.05)
+    fetcher.rate_limiter.try_acquire()
+    fetcher.breaker.record_failure()
+    time.sleep(0.1)
+
+    with pytest.raises(TranscriptFetchError, match="rate limit"):
+        fetcher.fetch("abcdefghijk")
+    # Still open, not half-open with a probe nobody will report on
+    assert fetcher.breaker.state == CircuitBreaker.OPEN
+    assert fetcher.breaker.allow()
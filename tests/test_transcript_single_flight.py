@@ -0,0 +1,167 @@
+"""
+Concurrency checks for TranscriptSingleFlight: many callers, one upstream fetch.
+
+The upstream fetch is a counting stub and Redis is fakeredis, so these run offline.
+
+    python -m pytest -q tests/test_transcript_single_flight.py
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import pytest
+from redis.exceptions import ConnectionError
+
+from app.services import yt_tool
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.transcript_fetcher import TranscriptFetchError
+from app.services.yt_tool import TranscriptSingleFlight
+
+CALLERS = 16
+
+
+class StubFetcher:
+    """Stands in for the YouTube fetch; slow enough that every caller overlaps it."""
+
+    def __init__(self, result, delay: float = 0.2):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.result
+
+
+class DownRedis:
+    """Every command fails the way an unreachable Redis does."""
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            raise ConnectionError("Redis is down")
+        return command
+
+
+@pytest.fixture(autouse=True)
+def redis_breaker(monkeypatch):
+    breaker = CircuitBreaker("redis-test")
+    monkeypatch.setattr(yt_tool, "redis_breaker", breaker)
+    return breaker
+
+
+def fetch_concurrently(single_flight: TranscriptSingleFlight, video_id: str, loader):
+    start = threading.Barrier(CALLERS)
+
+    def call():
+        start.wait()
+        return single_flight.fetch(video_id, loader)
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        return list(pool.map(lambda _: call(), range(CALLERS)))
+
+
+def test_concurrent_callers_share_one_fetch():
+    single_flight = TranscriptSingleFlight(redis=fakeredis.FakeRedis())
+    loader = StubFetcher("transcript text")
+
+    results = fetch_concurrently(single_flight, "abcdefghijk", loader)
+
+    assert loader.calls == 1
+    assert results == ["transcript text"] * CALLERS
+
+
+def test_slow_leader_times_out_followers_with_fetch_error(monkeypatch):
+    monkeypatch.setattr(yt_tool, "FETCH_WAIT_TIMEOUT_SECONDS", 0.1)
+    single_flight = TranscriptSingleFlight(redis=fakeredis.FakeRedis())
+    loader = StubFetcher("transcript text", delay=0.5)
+
+    leader = threading.Thread(target=single_flight.fetch, args=("abcdefghijk", loader))
+    leader.start()
+    time.sleep(0.05)
+    with pytest.raises(TranscriptFetchError, match="timed out"):
+        single_flight.fetch("abcdefghijk", loader)
+    leader.join()
+    assert loader.calls == 1
+
+
+def test_missing_transcript_is_fetched_once_then_negative_cached():
+    redis = fakeredis.FakeRedis()
+    single_flight = TranscriptSingleFlight(negative_ttl=60, redis=redis)
+    loader = StubFetcher(None)
+
+    results = fetch_concurrently(single_flight, "missingvid0", loader)
+
+    assert loader.calls == 1
+    assert results == [None] * CALLERS
+    assert redis.exists("yt:transcript:missing:missingvid0")
+    assert redis.ttl("yt:transcript:missing:missingvid0") > 0
+
+    # Later callers in this process fail fast
+    assert single_flight.fetch("missingvid0", loader) is None
+    assert loader.calls == 1
+
+
+def test_negative_cache_is_shared_across_processes():
+    server = fakeredis.FakeServer()
+    loader = StubFetcher(None, delay=0)
+
+    first = TranscriptSingleFlight(redis=fakeredis.FakeRedis(server=server))
+    assert first.fetch("missingvid0", loader) is None
+
+    # A second worker process sees the same Redis but not the first one's memory
+    second = TranscriptSingleFlight(redis=fakeredis.FakeRedis(server=server))
+    assert second.fetch("missingvid0", loader) is None
+    assert loader.calls == 1
+
+
+def test_upstream_error_is_not_negative_cached():
+    single_flight = TranscriptSingleFlight(redis=fakeredis.FakeRedis())
+
+    def failing_loader():
+        raise RuntimeError("YouTube returned 503")
+
+    with pytest.raises(RuntimeError):
+        single_flight.fetch("flakyvideo1", failing_loader)
+
+    loader = StubFetcher("transcript text", delay=0)
+    assert single_flight.fetch("flakyvideo1", loader) == "transcript text"
+    assert loader.calls == 1
+
+
+def test_redis_outage_falls_back_to_in_process_lock():
+    single_flight = TranscriptSingleFlight(redis=DownRedis())
+    loader = StubFetcher("transcript text")
+
+    results = fetch_concurrently(single_flight, "abcdefghijk", loader)
+
+    assert loader.calls == 1
+    assert results == ["transcript text"] * CALLERS
+
+    # Missing transcripts are still remembered locally while Redis is down
+    missing = StubFetcher(None)
+    assert fetch_concurrently(single_flight, "missingvid0", missing) == [None] * CALLERS
+    assert single_flight.fetch("missingvid0", missing) is None
+    assert missing.calls == 1
+
+
+def test_store_failure_is_served_uncached_not_negative_cached(monkeypatch):
+    class FullStore:
+        def get(self, video_id):
+            return None
+
+        def put(self, video_id, transcript_text):
+            raise OSError("No space left on device")
+
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(yt_tool, "transcript_single_flight", TranscriptSingleFlight(redis=redis))
+    monkeypatch.setattr(yt_tool, "get_transcript_store", FullStore)
+    monkeypatch.setattr(yt_tool, "get_transcript_segments",
+                        lambda video_id: [{"text": "hello and welcome", "start": 0.0, "duration": 2.5}])
+
+    assert yt_tool.get_or_fetch_transcript("abcdefghijk")
+    assert not redis.exists("yt:transcript:missing:abcdefghijk")
+    assert yt_tool.get_or_fetch_transcript("abcdefghijk")